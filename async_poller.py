@@ -0,0 +1,90 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bot as core
+from fairness import FairLimiter
+
+
+class AsyncPoller:
+    """Опрашивает подписки в asyncio с ограничением числа запросов.
+
+    Запросы `get_api_answer` выполняются в пуле потоков, размер
+    которого совпадает с числом слотов `FairLimiter`, поэтому
+    одновременно в работе не больше `concurrency` запросов, а
+    подписка с медленными ответами API не задерживает остальные.
+    Сообщения отправляет поток очереди `OutboundQueue`.
+    """
+
+    def __init__(self, queue, subscriptions, store, scheduler, concurrency):
+        """Сохраняет очередь отправки, подписки и параметры опроса."""
+        self.queue = queue
+        self.subscriptions = subscriptions
+        self.store = store
+        self.scheduler = scheduler
+        self.concurrency = concurrency
+        self.limiter = None
+        self.executor = None
+
+    async def call(self, key, func, *args):
+        """Выполняет блокирующий сетевой вызов в слоте подписки `key`."""
+        loop = asyncio.get_running_loop()
+        return await self.limiter.run(
+            key, lambda: loop.run_in_executor(self.executor, func, *args)
+        )
+
+    async def poll_subscription(self, subscription):
+        """Опрашивает API по подписке и ставит новые статусы в очередь.
+
+        Возвращает список изменений или исключение, которым
+        завершился опрос, в том числе сбой хранилища состояния.
+        """
+        store = self.store
+        try:
+            timestamp = store.get_cursor(subscription.key, int(time.time()))
+            core.check_ownership(subscription)
+            answer = await self.call(
+                subscription.key, core.circuit_breaker.call,
+                core.request_answer, timestamp, subscription
+            )
+            transitions = core.find_transitions(subscription, answer, store)
+            core.LAST_POLL.set(time.time())
+            core.report_recovery(self.queue, subscription)
+            core.notify_transitions(
+                self.queue, subscription, answer, transitions, store,
+                answer.get('current_date', timestamp)
+            )
+        except core.SKIPPED as error:
+            return error
+        except Exception as error:
+            core.report_error(self.queue, subscription, error)
+            return error
+        return transitions
+
+    async def poll_forever(self, subscription, delay):
+        """Собственный таймер подписки вместо общего `time.sleep`."""
+        await asyncio.sleep(delay)
+        while True:
+            result = await self.poll_subscription(subscription)
+            await asyncio.sleep(
+                self.scheduler.next_delay(subscription, result)
+            )
+
+    async def run(self):
+        """Запускает по задаче на каждую подписку.
+
+        Старт задач равномерно растянут на базовый интервал опроса,
+        чтобы опросы не приходили в API одновременно.
+        """
+        self.limiter = FairLimiter(
+            self.concurrency, core.SLOW_REQUEST_TIME, core.SLOW_REQUEST_SHARE
+        )
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        step = self.scheduler.base_delay / max(len(self.subscriptions), 1)
+        try:
+            await asyncio.gather(*(
+                self.poll_forever(subscription, index * step)
+                for index, subscription in enumerate(self.subscriptions)
+            ))
+        finally:
+            self.executor.shutdown(wait=False)
@@ -0,0 +1,79 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import REGISTRY
+
+logger = logging.getLogger('bot.backfill')
+
+BACKFILL_RETRY = 'Подписка {key}: {error}. Повтор через {delay} с'
+BACKFILL_ERROR = 'Подписка {key} не загружена: {error}'
+
+BACKFILLED = REGISTRY.counter(
+    'backfill_subscriptions_total', 'Подписки, загруженные задним числом',
+    ['outcome']
+)
+
+
+class Backfill:
+    """Загружает состояние подписок с заданной даты без уведомлений.
+
+    API по `from_date` отдаёт последние статусы всех работ,
+    изменившихся с этой даты, поэтому на подписку хватает одного
+    запроса. Подписки загружаются параллельно, не больше
+    `concurrency` запросов одновременно; ошибки из `retry_on`
+    повторяются до `retries` раз с паузой `retry_after` исключения
+    или растущей паузой. Ответ передаётся в `merge(subscription,
+    answer)`, который возвращает число сохранённых работ.
+    """
+
+    def __init__(self, fetch, merge, concurrency, retries=3, retry_on=(),
+                 sleep=time.sleep):
+        """Сохраняет функции запроса к API и сохранения ответа."""
+        self.fetch = fetch
+        self.merge = merge
+        self.concurrency = concurrency
+        self.retries = retries
+        self.retry_on = retry_on
+        self.sleep = sleep
+
+    def load(self, subscription, since):
+        """Загружает одну подписку; возвращает число работ."""
+        for attempt in range(self.retries + 1):
+            try:
+                answer = self.fetch(since, subscription.token)
+                break
+            except self.retry_on as error:
+                if attempt == self.retries:
+                    raise
+                delay = getattr(error, 'retry_after', None) or 2 ** attempt
+                logger.warning(BACKFILL_RETRY.format(
+                    key=subscription.key, error=error, delay=delay
+                ))
+                self.sleep(delay)
+        return self.merge(subscription, answer)
+
+    def load_or_error(self, subscription, since):
+        """Загружает подписку; вместо исключения возвращает его."""
+        try:
+            count = self.load(subscription, since)
+        except Exception as error:
+            logger.error(BACKFILL_ERROR.format(
+                key=subscription.key, error=error
+            ))
+            BACKFILLED.inc('error')
+            return error
+        BACKFILLED.inc('ok')
+        return count
+
+    def run(self, subscriptions, since):
+        """Загружает подписки с даты `since` (Unix time).
+
+        Возвращает для каждой подписки число работ или исключение.
+        """
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            results = executor.map(
+                lambda subscription: self.load_or_error(subscription, since),
+                subscriptions
+            )
+            return dict(zip(subscriptions, results))
@@ -0,0 +1,103 @@
+"""Нагрузочный тест разбора и проверки ответа API.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_decoding --homeworks 1 20 100
+
+Сравнивает прежний путь (`response.json()` и проверка каждой работы
+через `parse_status`) с декодерами из `decoding` и однопроходной
+проверкой `parse_homeworks`. Результат печатается в stdout в JSON.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+
+import bot
+from decoding import DECODERS
+
+DEFAULT_HOMEWORKS = (1, 20, 100)
+STATUSES = ('approved', 'reviewing', 'rejected')
+
+
+def make_body(size):
+    """Тело ответа API с `size` работами, похожими на настоящие."""
+    return json.dumps({
+        'homeworks': [
+            {
+                'id': 100000 + index,
+                'status': STATUSES[index % len(STATUSES)],
+                'homework_name': f'student__hw{index:02d}_project.zip',
+                'reviewer_comment': 'Код аккуратный, тесты проходят.',
+                'date_updated': '2021-10-01T10:00:00Z',
+                'lesson_name': f'Проект спринта {index}',
+            }
+            for index in range(size)
+        ],
+        'current_date': 1633082400,
+    }, ensure_ascii=False).encode('utf-8')
+
+
+def legacy(body):
+    """Прежний путь: строка из байтов, `json.loads`, проверка по ключам."""
+    answer = json.loads(body.decode('utf-8'))
+    for homework in answer['homeworks']:
+        bot.parse_status(homework)
+    return answer
+
+
+def per_call(func, body, number):
+    """Микросекунд на вызов: лучший из пяти замеров."""
+    return round(
+        min(timeit.repeat(lambda: func(body), number=number, repeat=5))
+        / number * 10 ** 6, 2
+    )
+
+
+def run(sizes, number):
+    """Прогоняет тест для каждого числа работ и возвращает отчёт."""
+    results = []
+    for size in sizes:
+        body = make_body(size)
+        result = {
+            'homeworks': size,
+            'body_bytes': len(body),
+            'legacy_us': per_call(legacy, body, number),
+        }
+        for name, decoder in sorted(DECODERS.items()):
+            result[f'{name}_decode_us'] = per_call(decoder, body, number)
+            result[f'{name}_total_us'] = per_call(
+                lambda body: bot.parse_homeworks(decoder(body)),
+                body, number
+            )
+        results.append(result)
+    return {
+        'benchmark': 'decoding',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': int(time.time()),
+        'results': results,
+    }
+
+
+def main(argv=None):
+    """Разбирает аргументы командной строки и печатает отчёт."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--homeworks', type=int, nargs='+', default=DEFAULT_HOMEWORKS,
+        help='число работ в ответе API'
+    )
+    parser.add_argument(
+        '--number', type=int, default=2000,
+        help='число вызовов в одном замере'
+    )
+    args = parser.parse_args(argv)
+    sys.stdout.write(
+        json.dumps(run(args.homeworks, args.number), indent=2) + '\n'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Память на одну отслеживаемую работу.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_memory --homeworks 1000000
+
+Сравнивает ответы API в виде словарей (как их отдаёт декодер JSON)
+с компактными `HomeworkStates`. Результат печатается в stdout в JSON.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import bot
+from benchmarks.bench_decoding import make_body
+
+DEFAULT_HOMEWORKS = 1000000
+PER_SUBSCRIPTION = 10
+
+
+def measure(build, size):
+    """Байт памяти Python на работу для структуры, построенной `build`."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build(size)
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return allocated / size
+
+
+def bodies(size):
+    """Тела ответов: по `PER_SUBSCRIPTION` работ на подписку."""
+    template = make_body(PER_SUBSCRIPTION)
+    for index in range(size // PER_SUBSCRIPTION):
+        # У каждого студента свои названия работ.
+        yield template.replace(b'student__', f'student{index}__'.encode())
+
+
+def build_dicts(size):
+    """Ответы API так, как их возвращает декодер."""
+    return [bot.decode(body) for body in bodies(size)]
+
+
+def build_compact(size):
+    """Ответы API после проверки: только компактные статусы работ."""
+    return [bot.parse_homeworks(bot.decode(body)) for body in bodies(size)]
+
+
+def run(homeworks, dict_sample):
+    """Меряет обе структуры и возвращает отчёт."""
+    dict_size = min(homeworks, dict_sample)
+    compact = measure(build_compact, homeworks)
+    dicts = measure(build_dicts, dict_size)
+    return {
+        'benchmark': 'memory',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': int(time.time()),
+        'homeworks': homeworks,
+        'homeworks_per_subscription': PER_SUBSCRIPTION,
+        'dict_bytes_per_homework': round(dicts),
+        'dict_sample': dict_size,
+        'compact_bytes_per_homework': round(compact),
+        'compact_total_mb': round(compact * homeworks / 2 ** 20, 1),
+    }
+
+
+def main(argv=None):
+    """Разбирает аргументы командной строки и печатает отчёт."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--homeworks', type=int, default=DEFAULT_HOMEWORKS,
+        help='сколько работ отслеживать'
+    )
+    parser.add_argument(
+        '--dict-sample', type=int, default=100000,
+        help='на скольких работах мерить словари'
+    )
+    args = parser.parse_args(argv)
+    sys.stdout.write(
+        json.dumps(run(args.homeworks, args.dict_sample), indent=2) + '\n'
+    )
+
+
+if __name__ == '__main__':
+    main()
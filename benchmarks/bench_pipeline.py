@@ -0,0 +1,240 @@
+"""Нагрузочный тест цепочки опрос → разбор → уведомление.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_pipeline --sizes 1 100 10000 100000
+
+Результат печатается в stdout в JSON (или пишется в `--output`).
+"""
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import telegram
+
+import bot
+import http_client
+from async_poller import AsyncPoller
+from benchmarks.stand_ins import (PracticumHandler, TelegramHandler, serve,
+                                  url)
+from fairness import FairLimiter, RequestBudget
+from state_store import StateStore
+from subscriptions import Subscription
+from telegram_queue import OutboundQueue
+
+DEFAULT_SIZES = (1, 100, 10000, 100000)
+TELEGRAM_TOKEN = '123456:benchmark'
+
+
+class TimedStore(StateStore):
+    """Хранилище, запоминающее момент сохранения после доставки."""
+
+    def __init__(self, path):
+        """Открывает базу и готовит журнал доставок."""
+        super().__init__(path)
+        self.delivered = {}
+        self.done = threading.Event()
+        self.expected = 0
+
+    def save(self, subscription, statuses, current_date):
+        """Сохраняет состояние и отмечает время доставки."""
+        super().save(subscription, statuses, current_date)
+        self.delivered[subscription] = time.perf_counter()
+        if len(self.delivered) >= self.expected:
+            self.done.set()
+
+
+def percentile(values, fraction):
+    """Перцентиль по отсортированному списку."""
+    if not values:
+        return None
+    index = min(int(len(values) * fraction), len(values) - 1)
+    return round(values[index], 3)
+
+
+def make_subscriptions(size):
+    """Создаёт `size` подписок с разными токенами и чатами."""
+    return [
+        Subscription(token=f'OAuth bench-{index}', chat_id=str(index))
+        for index in range(size)
+    ]
+
+
+def create_queue(telegram_url):
+    """Очередь отправки в заглушку Telegram без ограничения частоты."""
+    telegram_bot = telegram.Bot(TELEGRAM_TOKEN, base_url=telegram_url)
+    return OutboundQueue(
+        lambda message, chat_id: bot.send_message(
+            telegram_bot, message, chat_id
+        ),
+        bot.combine_messages, 10 ** 9, 10 ** 9
+    ).start()
+
+
+def reset_caches():
+    """Очищает общие кеши бота между прогонами."""
+    bot.response_cache.clear()
+    bot.renderer.cache.clear()
+    bot.error_throttle.scopes.clear()
+
+
+async def poll_all(poller):
+    """Один раз опрашивает все подписки, как это делает `run()`."""
+    poller.limiter = FairLimiter(
+        poller.concurrency, bot.SLOW_REQUEST_TIME, bot.SLOW_REQUEST_SHARE
+    )
+    poller.executor = ThreadPoolExecutor(poller.concurrency)
+    try:
+        results = await asyncio.gather(*(
+            poller.poll_subscription(subscription)
+            for subscription in poller.subscriptions
+        ))
+    finally:
+        poller.executor.shutdown()
+    for subscription, result in zip(poller.subscriptions, results):
+        poller.scheduler.next_delay(subscription, result)
+
+
+def measure_memory(size, telegram_url, concurrency):
+    """Память на подписку после опроса всех `size` подписок.
+
+    Опрос идёт через `AsyncPoller` с бюджетом запросов, поэтому в
+    замер попадают сами подписки, таймеры расписания, кеши ответов и
+    сообщений, очередь отправки, ограничитель и бюджет. tracemalloc
+    видит только кучу Python: страницы SQLite считаются отдельно.
+    Возвращает (байт кучи, байт SQLite) на подписку.
+    """
+    budget = bot.budget
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    try:
+        bot.budget = RequestBudget(10 ** 9, bot.BUDGET_WINDOW)
+        subscriptions = make_subscriptions(size)
+        store = TimedStore(':memory:')
+        store.expected = size
+        queue = create_queue(telegram_url)
+        poller = AsyncPoller(
+            queue, subscriptions, store, bot.create_scheduler(), concurrency
+        )
+        asyncio.run(poll_all(poller))
+        store.done.wait(timeout=max(60, size / 10))
+        queue.stop()
+        store.delivered = {}
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+        bot.budget = budget
+    allocated = sum(
+        stat.size_diff for stat in after.compare_to(before, 'filename')
+    )
+    page_count, = store.connection.execute('PRAGMA page_count').fetchone()
+    page_size, = store.connection.execute('PRAGMA page_size').fetchone()
+    store.close()
+    return allocated / size, page_count * page_size / size
+
+
+def measure_pipeline(size, telegram_url):
+    """Опрашивает `size` подписок и ждёт доставки всех уведомлений."""
+    subscriptions = make_subscriptions(size)
+    store = TimedStore(':memory:')
+    store.expected = size
+    queue = create_queue(telegram_url)
+    started = {}
+    begin = time.perf_counter()
+    for subscription in subscriptions:
+        started[subscription.key] = time.perf_counter()
+        bot.poll_cycle(queue, [subscription], store)
+    store.done.wait(timeout=max(60, size / 10))
+    elapsed = time.perf_counter() - begin
+    queue.stop()
+    latencies = sorted(
+        (store.delivered[key] - started[key]) * 1000
+        for key in store.delivered
+    )
+    return {
+        'polled': size,
+        'delivered': len(latencies),
+        'seconds': round(elapsed, 3),
+        'polls_per_sec': round(size / elapsed, 1),
+        'latency_p50_ms': percentile(latencies, 0.5),
+        'latency_p99_ms': percentile(latencies, 0.99),
+    }
+
+
+def run(sizes, poll_sample=None, concurrency=bot.POLLING_CONCURRENCY):
+    """Прогоняет тест для каждого размера и возвращает отчёт.
+
+    Скорость и задержка меряются на всех подписках или на первых
+    `poll_sample`; сколько подписок опрошено, видно в поле `polled`.
+    """
+    bot.logger.disabled = True
+    practicum = serve(PracticumHandler)
+    telegram_server = serve(TelegramHandler)
+    bot.ENDPOINT = url(practicum)
+    http_client.close_session()
+    results = []
+    try:
+        for size in sizes:
+            reset_caches()
+            result = {'subscriptions': size}
+            result.update(measure_pipeline(
+                min(size, poll_sample or size), url(telegram_server, 'bot')
+            ))
+            reset_caches()
+            heap, state = measure_memory(
+                size, url(telegram_server, 'bot'), concurrency
+            )
+            result['bytes_per_subscription'] = round(heap)
+            result['state_bytes_per_subscription'] = round(state)
+            results.append(result)
+    finally:
+        practicum.shutdown()
+        telegram_server.shutdown()
+        http_client.close_session()
+    return {
+        'benchmark': 'pipeline',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': int(time.time()),
+        'results': results,
+    }
+
+
+def main(argv=None):
+    """Разбирает аргументы командной строки и печатает отчёт."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+        help='число подписок в каждом прогоне'
+    )
+    parser.add_argument(
+        '--poll-sample', type=int,
+        help='опрашивать для замера скорости и задержки только столько '
+             'подписок (по умолчанию все)'
+    )
+    parser.add_argument(
+        '--concurrency', type=int, default=bot.POLLING_CONCURRENCY,
+        help='одновременных запросов при замере памяти'
+    )
+    parser.add_argument('--output', help='файл для JSON-отчёта')
+    args = parser.parse_args(argv)
+    report = json.dumps(
+        run(args.sizes, args.poll_sample, args.concurrency), indent=2
+    )
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(report)
+    else:
+        sys.stdout.write(report + '\n')
+
+
+if __name__ == '__main__':
+    main()
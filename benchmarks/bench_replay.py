@@ -0,0 +1,262 @@
+r"""Проигрывание журнала смен статусов на локальных заглушках.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_replay --subscriptions 10000 \
+        --speedup 60 --duration 120 --latency-ms 5 20 \
+        --server-errors 0.02 --body-errors 0.01 --telegram-errors 0.01
+
+Бот опрашивает `ReplayPracticumHandler` в асинхронном режиме и шлёт
+уведомления в `FaultyTelegramHandler`; интервалы опроса и повторов
+сжаты в `--speedup` раз, как и время журнала. Журнал берётся из
+`--trace` (JSON Lines) или создаётся случайно. Отчёт — скорость
+опроса, число сбоев, повторные и недоставленные уведомления — в
+stdout в JSON.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import sys
+import time
+from collections import Counter
+
+import telegram
+
+import bot
+import http_client
+from async_poller import AsyncPoller
+from benchmarks.stand_ins import (FaultInjector, FaultyTelegramHandler,
+                                  ReplayPracticumHandler, Trace, serve, url)
+from outbox import Outbox
+from scheduler import AdaptiveScheduler
+from state_store import StateStore
+from subscriptions import Subscription
+from telegram_queue import OutboundQueue
+
+TELEGRAM_TOKEN = '123456:replay'
+DRAIN_TIMEOUT = 30
+
+
+def create_scheduler(speedup):
+    """Расписание бота с интервалами, сжатыми в `speedup` раз."""
+    return AdaptiveScheduler(
+        bot.RETRY_TIME / speedup,
+        bot.REVIEWING_RETRY_TIME / speedup,
+        bot.MAX_RETRY_TIME / speedup,
+        bot.IDLE_AFTER / speedup,
+        bot.POLL_JITTER,
+        {
+            error: delay / speedup
+            for error, delay in bot.ERROR_DELAYS.items()
+        },
+    )
+
+
+def check_deliveries(trace, subscriptions, messages):
+    """Считает повторные и недоставленные уведомления.
+
+    Повтор — уведомление о статусе работы, пришедшее чаще, чем работа
+    получала этот статус по журналу. Недоставленное — последний
+    статус работы, о котором в чат так и не сообщили.
+    """
+    render = bot.renderer.status_message
+    entered = Counter(
+        (token, render(name, status))
+        for _, token, name, status in trace.events
+    )
+    names = {
+        (token, render(name, status)): name
+        for _, token, name, status in trace.events
+    }
+    duplicates = undelivered = 0
+    last = {}
+    for subscription in subscriptions:
+        token = subscription.token
+        delivered = Counter()
+        for message in messages.get(subscription.chat_id, ()):
+            for text in message.split('\n\n'):
+                # Сообщения об ошибках опроса не проверяются.
+                if (token, text) in names:
+                    delivered[text] += 1
+                    last[token, names[token, text]] = text
+        duplicates += sum(
+            max(0, count - entered[token, text])
+            for text, count in delivered.items()
+        )
+    for (token, name), status in trace.final_statuses().items():
+        undelivered += last.get((token, name)) != render(name, status)
+    return duplicates, undelivered
+
+
+async def poll_for(poller, duration):
+    """Опрашивает подписки `duration` секунд."""
+    try:
+        await asyncio.wait_for(poller.run(), duration)
+    except asyncio.TimeoutError:
+        pass
+
+
+def drain(queue, outbox):
+    """Ждёт, пока очередь и журнал исходящих опустеют."""
+    deadline = time.monotonic() + DRAIN_TIMEOUT
+    while time.monotonic() < deadline:
+        if not queue.depth() and (outbox is None or not outbox.inflight):
+            return
+        time.sleep(0.1)
+
+
+def run(trace, args):
+    """Проигрывает журнал и возвращает отчёт."""
+    logging.disable(logging.CRITICAL)
+    bot.circuit_breaker.reset_timeout /= args.speedup
+    latency = tuple(value / 1000 for value in args.latency_ms)
+    practicum_faults = FaultInjector(
+        latency if len(latency) > 1 else latency[0], seed=args.seed,
+        server_error=args.server_errors / 2,
+        unavailable=args.server_errors / 2,
+        code_body=args.body_errors / 2,
+        error_body=args.body_errors / 2,
+    )
+    telegram_faults = FaultInjector(
+        seed=args.seed, server_error=args.telegram_errors / 2,
+        flood=args.telegram_errors / 2,
+    )
+    practicum_handler = ReplayPracticumHandler.configure(
+        trace, args.speedup, practicum_faults,
+        retry_after=max(1, round(bot.RETRY_TIME / args.speedup)),
+    )
+    telegram_handler = FaultyTelegramHandler.configure(telegram_faults)
+    practicum = serve(practicum_handler)
+    telegram_server = serve(telegram_handler)
+    bot.ENDPOINT = url(practicum)
+    http_client.close_session()
+    subscriptions = [
+        Subscription(token=token, chat_id=str(index))
+        for index, token in enumerate(trace.tokens)
+    ]
+    telegram_bot = telegram.Bot(
+        TELEGRAM_TOKEN, base_url=url(telegram_server, 'bot')
+    )
+    queue = OutboundQueue(
+        lambda message, chat_id: bot.send_message(
+            telegram_bot, message, chat_id
+        ),
+        bot.combine_messages, 10 ** 9, 10 ** 9
+    ).start()
+    store = StateStore(':memory:')
+    if args.outbox:
+        bot.outbox = Outbox(
+            store, queue, retry_after=bot.OUTBOX_RETRY_AFTER / args.speedup
+        ).start()
+    poller = AsyncPoller(
+        queue, subscriptions, store, create_scheduler(args.speedup),
+        args.concurrency
+    )
+    try:
+        asyncio.run(poll_for(poller, args.duration))
+        simulated = practicum_handler.trace_time()
+        drain(queue, bot.outbox)
+    finally:
+        queue.stop()
+        if bot.outbox is not None:
+            bot.outbox.stop()
+        practicum.shutdown()
+        telegram_server.shutdown()
+        http_client.close_session()
+    duplicates, undelivered = check_deliveries(
+        trace, subscriptions, telegram_handler.messages
+    )
+    faults = Counter(practicum_faults.counts)
+    requests = faults.pop('requests', 0)
+    return {
+        'benchmark': 'replay',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': int(time.time()),
+        'subscriptions': len(subscriptions),
+        'trace_events': len(trace.events),
+        'trace_seconds': round(trace.duration()),
+        'simulated_seconds': round(simulated),
+        'outbox': args.outbox,
+        'api_requests': requests,
+        'api_requests_per_sec': round(requests / args.duration, 1),
+        'api_faults': dict(faults),
+        'telegram_requests': telegram_faults.counts['requests'],
+        'telegram_faults': {
+            fault: count for fault, count in telegram_faults.counts.items()
+            if fault != 'requests'
+        },
+        'duplicate_notifications': duplicates,
+        'undelivered_final_statuses': undelivered,
+    }
+
+
+def main(argv=None):
+    """Разбирает аргументы командной строки и печатает отчёт."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trace', help='журнал смен статусов (JSON Lines)')
+    parser.add_argument(
+        '--save-trace', help='куда записать созданный случайный журнал'
+    )
+    parser.add_argument(
+        '--subscriptions', type=int, default=10000,
+        help='число подписок в случайном журнале'
+    )
+    parser.add_argument(
+        '--homeworks', type=int, default=2,
+        help='работ на подписку в случайном журнале'
+    )
+    parser.add_argument(
+        '--span', type=float, default=4 * 3600,
+        help='за сколько секунд журнала работы сдаются и проверяются'
+    )
+    parser.add_argument(
+        '--speedup', type=float, default=60,
+        help='во сколько раз время журнала быстрее настоящего'
+    )
+    parser.add_argument(
+        '--duration', type=float, default=300,
+        help='сколько секунд опрашивать'
+    )
+    parser.add_argument(
+        '--concurrency', type=int, default=bot.POLLING_CONCURRENCY,
+        help='сколько запросов к API выполнять одновременно'
+    )
+    parser.add_argument(
+        '--latency-ms', type=float, nargs='+', default=[0],
+        help='задержка ответа API: число или диапазон "от до"'
+    )
+    parser.add_argument(
+        '--server-errors', type=float, default=0,
+        help='доля ответов API с кодом 500 или 503'
+    )
+    parser.add_argument(
+        '--body-errors', type=float, default=0,
+        help='доля ответов API с полями code или error'
+    )
+    parser.add_argument(
+        '--telegram-errors', type=float, default=0,
+        help='доля ответов Telegram с кодом 500 или 429'
+    )
+    parser.add_argument(
+        '--no-outbox', dest='outbox', action='store_false',
+        help='сохранять статусы после отправки, без журнала исходящих'
+    )
+    parser.add_argument('--seed', type=int, help='зерно случайных чисел')
+    args = parser.parse_args(argv)
+    if args.trace:
+        trace = Trace.load(args.trace)
+    else:
+        trace = Trace.synthetic(
+            [f'OAuth replay-{index}' for index in range(args.subscriptions)],
+            args.homeworks, args.span, args.seed
+        )
+    if args.save_trace:
+        trace.save(args.save_trace)
+    sys.stdout.write(json.dumps(run(trace, args), indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
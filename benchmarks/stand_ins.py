@@ -0,0 +1,358 @@
+"""Локальные заглушки API Практикума и Telegram Bot API.
+
+`PracticumHandler` и `TelegramHandler` просто отвечают успехом.
+`ReplayPracticumHandler` проигрывает записанный или синтетический
+журнал смен статусов в ускоренном времени, а вместе с
+`FaultyTelegramHandler` умеет добавлять задержку и сбои.
+"""
+import bisect
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class JsonHandler(BaseHTTPRequestHandler):
+    """Обработчик с постоянными соединениями и JSON-ответами."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def send_json(self, data, status=200):
+        """Отправляет JSON-ответ."""
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Не засоряет вывод журналом запросов."""
+
+
+class PracticumHandler(JsonHandler):
+    """Отвечает на каждый запрос одной работой со статусом `approved`.
+
+    Название работы строится из токена, так что у каждой подписки
+    своя работа.
+    """
+
+    def do_GET(self):
+        """Отдаёт статус работы для токена из `Authorization`."""
+        token = self.headers.get('Authorization', '')
+        query = parse_qs(urlparse(self.path).query)
+        self.send_json({
+            'homeworks': [{
+                'homework_name': f'hw-{token}',
+                'status': 'approved',
+                'reviewer_comment': 'Всё нравится',
+                'date_updated': '2021-10-01T10:00:00Z',
+            }],
+            'current_date': int(query.get('from_date', [0])[0]) + 1,
+        })
+
+
+class TelegramHandler(JsonHandler):
+    """Принимает `sendMessage` и отвечает как Telegram Bot API."""
+
+    sent = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        """Читает запрос и возвращает отправленное сообщение."""
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        handler = type(self)
+        with handler.lock:
+            handler.sent += 1
+            message_id = handler.sent
+        self.send_json({'ok': True, 'result': {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(payload.get('chat_id', 0)), 'type': 'private'},
+            'text': payload.get('text', ''),
+        }})
+
+
+class Trace:
+    """Журнал смен статусов: кортежи (секунда, токен, работа, статус).
+
+    Секунды отсчитываются от начала проигрывания. Для каждой
+    работы события хранятся по времени, так что статус на любой
+    момент находится двоичным поиском.
+    """
+
+    def __init__(self, events):
+        """Раскладывает события по токенам и работам."""
+        self.events = sorted(events)
+        self.homeworks = defaultdict(dict)
+        for at, token, name, status in self.events:
+            times, statuses = self.homeworks[token].setdefault(
+                name, ([], [])
+            )
+            times.append(at)
+            statuses.append(status)
+
+    @classmethod
+    def load(cls, path):
+        """Читает журнал из файла JSON Lines."""
+        with open(path, encoding='utf-8') as file:
+            return cls(
+                (item['at'], item['token'], item['homework_name'],
+                 item['status'])
+                for item in map(json.loads, file) if item
+            )
+
+    def save(self, path):
+        """Записывает журнал в файл JSON Lines."""
+        with open(path, 'w', encoding='utf-8') as file:
+            for at, token, name, status in self.events:
+                file.write(json.dumps({
+                    'at': at, 'token': token,
+                    'homework_name': name, 'status': status,
+                }) + '\n')
+
+    @classmethod
+    def synthetic(cls, tokens, homeworks=2, span=3600, seed=None):
+        """Случайный журнал: работы сдаются в течение `span` секунд.
+
+        Каждую работу берут на проверку, иногда возвращают на
+        доработку, снова проверяют и в конце принимают.
+        """
+        rng = random.Random(seed)
+        events = []
+        for token in tokens:
+            for index in range(homeworks):
+                name = f'hw{index}-{token}'
+                at = rng.uniform(0, span / 2)
+                while True:
+                    events.append((at, token, name, 'reviewing'))
+                    at += rng.uniform(0, span / 8)
+                    if rng.random() < 0.3:
+                        events.append((at, token, name, 'rejected'))
+                        at += rng.uniform(0, span / 8)
+                        continue
+                    events.append((at, token, name, 'approved'))
+                    break
+        return cls(events)
+
+    @property
+    def tokens(self):
+        """Токены всех подписок журнала."""
+        return list(self.homeworks)
+
+    def duration(self):
+        """Секунда последнего события."""
+        return self.events[-1][0] if self.events else 0
+
+    def changed(self, token, since, until):
+        """Работы токена, изменившиеся в (`since`, `until`].
+
+        Возвращает пары (работа, статус на момент `until`), начиная
+        с самой свежей, как в ответе API.
+        """
+        changed = []
+        for name, (times, statuses) in self.homeworks[token].items():
+            index = bisect.bisect_right(times, until) - 1
+            if index >= 0 and times[index] > since:
+                changed.append((times[index], name, statuses[index]))
+        return [(name, status) for _, name, status in sorted(
+            changed, reverse=True
+        )]
+
+    def final_statuses(self, until=None):
+        """Статусы всех работ на момент `until` (по умолчанию в конце)."""
+        return {
+            (token, name): statuses[
+                bisect.bisect_right(times, until) - 1
+                if until is not None else -1
+            ]
+            for token, homeworks in self.homeworks.items()
+            for name, (times, statuses) in homeworks.items()
+            if until is None or times[0] <= until
+        }
+
+
+class FaultInjector:
+    """Задержка и случайные сбои ответа заглушки.
+
+    `latency` — задержка в секундах или пара (от, до); `rates` —
+    вероятность каждого вида сбоя.
+    """
+
+    def __init__(self, latency=0, seed=None, **rates):
+        """Сохраняет задержку и вероятности сбоев."""
+        self.latency = latency
+        self.rates = rates
+        self.random = random.Random(seed)
+        self.counts = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def delay(self):
+        """Ждёт заданную задержку."""
+        latency = self.latency
+        if isinstance(latency, tuple):
+            with self.lock:
+                latency = self.random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+
+    def pick(self):
+        """Вид сбоя для очередного запроса или None."""
+        with self.lock:
+            self.counts['requests'] += 1
+            roll = self.random.random()
+            for fault, rate in self.rates.items():
+                if roll < rate:
+                    self.counts[fault] += 1
+                    return fault
+                roll -= rate
+        return None
+
+
+class ReplayPracticumHandler(JsonHandler):
+    """API Практикума, проигрывающий журнал `trace` в ускоренном времени.
+
+    Секунда работы заглушки — `speedup` секунд журнала. Ответ
+    содержит работы токена, изменившиеся после `from_date`, а
+    `current_date` — текущее время журнала. Сбои из `faults`:
+    `server_error` (ответ 500), `unavailable` (503 с `Retry-After`),
+    `code_body` и `error_body` (200 с полями `code` или `error`,
+    которые бот считает ошибкой сервера). Настройки задаются через
+    `configure`.
+    """
+
+    trace = Trace([])
+    speedup = 1
+    epoch = 0
+    started = 0
+    faults = FaultInjector()
+    retry_after = 60
+
+    @classmethod
+    def configure(cls, trace, speedup=1, faults=None, retry_after=60):
+        """Подкласс с журналом и сбоями; время журнала идёт с вызова."""
+        return type(cls.__name__, (cls,), {
+            'trace': trace,
+            'speedup': speedup,
+            'faults': faults or FaultInjector(),
+            'retry_after': retry_after,
+            'epoch': int(time.time()),
+            'started': time.monotonic(),
+        })
+
+    @classmethod
+    def trace_time(cls):
+        """Сколько секунд журнала прошло с начала проигрывания."""
+        return (time.monotonic() - cls.started) * cls.speedup
+
+    def do_GET(self):
+        """Отдаёт изменения работ для токена из `Authorization`."""
+        handler = type(self)
+        handler.faults.delay()
+        fault = handler.faults.pick()
+        if fault == 'server_error':
+            self.send_json({'message': 'Internal Server Error'}, 500)
+            return
+        if fault == 'unavailable':
+            self.send_response(503)
+            self.send_header('Retry-After', str(handler.retry_after))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if fault == 'code_body':
+            self.send_json({
+                'code': 'not_authenticated',
+                'message': 'Учетные данные не были предоставлены.',
+            })
+            return
+        if fault == 'error_body':
+            self.send_json({'error': {'error': 'Wrong from_date format'}})
+            return
+        query = parse_qs(urlparse(self.path).query)
+        since = int(query.get('from_date', [0])[0]) - handler.epoch
+        now = handler.trace_time()
+        token = self.headers.get('Authorization', '')
+        self.send_json({
+            'homeworks': [
+                {'homework_name': name, 'status': status}
+                for name, status in handler.trace.changed(token, since, now)
+            ],
+            'current_date': handler.epoch + int(now),
+        })
+
+
+class FaultyTelegramHandler(TelegramHandler):
+    """Telegram Bot API с задержкой и сбоями, запоминающий сообщения.
+
+    Сбои из `faults`: `server_error` (ответ 500) и `flood` (429 с
+    `retry_after`, как при превышении лимита Telegram).
+    """
+
+    faults = FaultInjector()
+    retry_after = 1
+    messages = None
+
+    @classmethod
+    def configure(cls, faults=None, retry_after=1):
+        """Подкласс со своими сбоями и журналом сообщений."""
+        return type(cls.__name__, (cls,), {
+            'faults': faults or FaultInjector(),
+            'retry_after': retry_after,
+            'messages': defaultdict(list),
+            'sent': 0,
+            'lock': threading.Lock(),
+        })
+
+    def do_POST(self):
+        """Отвечает сбоем или запоминает сообщение по чату."""
+        handler = type(self)
+        handler.faults.delay()
+        fault = handler.faults.pick()
+        if fault is not None:
+            length = int(self.headers.get('Content-Length', 0))
+            self.rfile.read(length)
+        if fault == 'server_error':
+            self.send_json({
+                'ok': False, 'error_code': 500,
+                'description': 'Internal Server Error',
+            }, 500)
+            return
+        if fault == 'flood':
+            self.send_json({
+                'ok': False, 'error_code': 429,
+                'description': 'Too Many Requests',
+                'parameters': {'retry_after': handler.retry_after},
+            }, 429)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        with handler.lock:
+            handler.sent += 1
+            message_id = handler.sent
+            handler.messages[str(payload.get('chat_id'))].append(
+                payload.get('text', '')
+            )
+        self.send_json({'ok': True, 'result': {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(payload.get('chat_id', 0)), 'type': 'private'},
+            'text': payload.get('text', ''),
+        }})
+
+
+def serve(handler_class):
+    """Запускает сервер на свободном порту в фоновом потоке."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def url(server, path=''):
+    """Адрес запущенного сервера."""
+    return f'http://127.0.0.1:{server.server_port}/{path}'
@@ -1,19 +1,57 @@
 import logging
 import os
+import sys
 import time
-from logging.handlers import RotatingFileHandler
+from functools import partial
+from http import HTTPStatus
 
-import requests
-import telegram
-from dotenv import load_dotenv
-from requests.exceptions import RequestException
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from decoding import get_decoder
+from error_throttle import ErrorThrottle
+from fairness import BudgetExceededError, RequestBudget
+from homework_state import STATUS_CODES, HomeworkStates
+import metrics
+from http_client import get_session
+from leases import NotOwnedError, ShardOwnership, SqliteLeaseStore
+from log_config import setup_logging
+from messages import EN, Renderer
+from response_cache import ResponseCache, fingerprint
+from scheduler import AdaptiveScheduler, parse_retry_after
+from state_store import StateStore
+from subscriptions import Subscription, load_subscriptions
+from telegram_queue import OutboundQueue
 
-load_dotenv()
+# Модули режимов импортируют `bot`; при запуске `python bot.py` они
+# должны получить этот же модуль, а не его вторую копию.
+sys.modules.setdefault('bot', sys.modules[__name__])
+
+# Файл .env читается только при запуске бота: импорт модуля в тестах
+# и инструментах не должен менять окружение процесса. Дочерние
+# процессы получают уже загруженное окружение от родителя.
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    load_dotenv()
 
 
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('CHAT_ID')
-RETRY_TIME = 60 * 10
+RETRY_TIME = int(os.getenv('RETRY_TIME', 60 * 10))
+REVIEWING_RETRY_TIME = int(os.getenv('REVIEWING_RETRY_TIME', 60 * 2))
+MAX_RETRY_TIME = int(os.getenv('MAX_RETRY_TIME', 60 * 60))
+IDLE_AFTER = int(os.getenv('IDLE_AFTER', 60 * 60 * 3))
+POLL_JITTER = float(os.getenv('POLL_JITTER', 0.1))
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 25))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+ERROR_TTL = int(os.getenv('ERROR_TTL', 60 * 60 * 6))
+ERROR_SUMMARY_INTERVAL = int(os.getenv('ERROR_SUMMARY_INTERVAL', 60 * 60))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = os.getenv('METRICS_PORT')
+LOG_QUEUE = os.getenv('LOG_QUEUE', '').lower() in ('1', 'true', 'yes')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_INFO_SAMPLE_RATE = int(os.getenv('LOG_INFO_SAMPLE_RATE', 1))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))
+CIRCUIT_RESET_TIMEOUT = int(os.getenv('CIRCUIT_RESET_TIMEOUT', 60 * 5))
+MESSAGE_LIMIT = 4096
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 VERDICTS = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
@@ -22,6 +60,44 @@ VERDICTS = {
 }
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 HEADERS = {'Authorization': PRACTICUM_TOKEN}
+SUBSCRIPTIONS_FILE = os.getenv('SUBSCRIPTIONS_FILE')
+POLLING_MODES = ('sync', 'async')
+POLLING_MODE = os.getenv('POLLING_MODE', 'sync')
+POLLING_CONCURRENCY = int(os.getenv('POLLING_CONCURRENCY', 100))
+WORKERS = int(os.getenv('WORKERS', 1))
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', POLLING_CONCURRENCY))
+HTTP_TIMEOUT = (
+    float(os.getenv('HTTP_CONNECT_TIMEOUT', 5)),
+    float(os.getenv('HTTP_READ_TIMEOUT', 30)),
+)
+JSON_DECODER = os.getenv('JSON_DECODER', 'auto')
+LOCALE = os.getenv('LOCALE', 'ru')
+INGEST_HOST = os.getenv('INGEST_HOST', '127.0.0.1')
+INGEST_PORT = os.getenv('INGEST_PORT')
+INGEST_FILE = os.getenv('INGEST_FILE')
+INGEST_SECRET = os.getenv('INGEST_SECRET')
+RECONCILE_TIME = int(os.getenv('RECONCILE_TIME', 60 * 60))
+MESSAGE_CACHE_SIZE = int(os.getenv('MESSAGE_CACHE_SIZE', 10000))
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 10000))
+HISTORY_DB = os.getenv('HISTORY_DB')
+REQUEST_BUDGET = int(os.getenv('REQUEST_BUDGET', 0))
+BUDGET_WINDOW = int(os.getenv('BUDGET_WINDOW', 60 * 60))
+SLOW_REQUEST_TIME = float(os.getenv('SLOW_REQUEST_TIME', 5))
+SLOW_REQUEST_SHARE = float(os.getenv('SLOW_REQUEST_SHARE', 0.25))
+OUTBOX = os.getenv('OUTBOX', '1').lower() in ('1', 'true', 'yes')
+OUTBOX_INTERVAL = float(os.getenv('OUTBOX_INTERVAL', 0.05))
+OUTBOX_RETRY_AFTER = int(os.getenv('OUTBOX_RETRY_AFTER', 300))
+LEASE_DB = os.getenv('LEASE_DB')
+# Шард переходит к другому экземпляру вместе с курсорами и статусами,
+# только если база состояния общая, поэтому по умолчанию она та же,
+# что и база аренд.
+STATE_DB = os.getenv('STATE_DB', LEASE_DB or 'bot_state.sqlite3')
+LEASE_SHARDS = int(os.getenv('LEASE_SHARDS', 16))
+LEASE_TTL = int(os.getenv('LEASE_TTL', 30))
+INSTANCE_ID = os.getenv('INSTANCE_ID')
+BACKFILL_DONE = (
+    'Загружено подписок: {done}, работ: {homeworks}, с ошибкой: {failed}'
+)
 MISSING_ENV_VARS = (
     "Отсутствует одна из обязательных переменных окружения: "
     "{variable}"
@@ -45,30 +121,98 @@ SERVER_ERROR = (
     'Параметры запроса: {headers}, {params}'
 
 )
+TOO_MANY_REQUESTS = (
+    'API ограничивает частоту запросов. '
+    'Повтор не раньше чем через {retry_after} с. '
+    'Эндпоинт: {url} '
+    'Код ответа API: {code}'
+)
+UNAVAILABLE = (
+    'API недоступен. '
+    'Эндпоинт: {url} '
+    'Код ответа API: {code}'
+)
 NEW_STATUS = 'Изменился статус проверки работы "{homework_name}". {verdict}'
 ERROR_MESSAGE = 'Сбой в работе программы: {error}'
-SEND_ERROR = 'Боту не удалось отправить сообщение. Ошибка: {error}'
+STILL_FAILING = 'Сбой продолжается: {error}. Повторений: {count}'
+RECOVERED = 'Работа программы восстановлена. Сбоев за период: {count}'
 MESSAGE_SENT = 'Бот отправил сообщение: {message}'
 UNEXPECTED_STATUS = 'Неожиданный статус: {status}'
 NO_KEY = 'Отсутствует ключ: {key}'
 RESPONSE_NOT_DICT = 'Ответ не является словарём'
+HOMEWORKS_NOT_LIST = 'Работы в ответе API пришли не списком'
 MISSING_VAR = 'Отсутствует одна из обязательных переменных окружения.'
+STATE_NOT_SHARED = (
+    'STATE_DB ({state_db}) не совпадает с LEASE_DB ({lease_db}). '
+    'Курсоры и отправленные статусы переходят к новому владельцу шарда, '
+    'только если STATE_DB общий для всех экземпляров'
+)
+UNKNOWN_MODE = 'Неизвестный режим опроса: {mode}'
+UNKNOWN_SUBSCRIPTION = 'Неизвестная подписка: {key}'
+EVENT_NOT_DICT = 'Событие не является словарём'
+STALE_EVENT = 'Устаревшие изменения подписки {key} пропущены: {names}'
+# Формат `date_updated` в ответе API.
+DATE_UPDATED_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+MESSAGE_BUNDLES = {
+    'ru': {
+        'new_status': NEW_STATUS,
+        'error': ERROR_MESSAGE,
+        'still_failing': STILL_FAILING,
+        'recovered': RECOVERED,
+        **{f'verdict.{status}': text for status, text in VERDICTS.items()},
+    },
+    'en': EN,
+}
+
+logger = logging.getLogger('bot')
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-handler = RotatingFileHandler(
-    f'{__file__}.log',
-    maxBytes=50000000,
-    backupCount=5,
-    encoding='utf-8'
+
+API_LATENCY = metrics.REGISTRY.histogram(
+    'practicum_request_seconds',
+    'Длительность get_api_answer по исходу', ['outcome']
+)
+API_CACHE_HITS = metrics.REGISTRY.counter(
+    'practicum_cache_hits_total',
+    'Ответы API, взятые из кеша', ['kind']
+)
+JSON_DECODE = metrics.REGISTRY.histogram(
+    'practicum_json_decode_seconds', 'Время разбора JSON-ответа API'
+)
+PARSE_ERRORS = metrics.REGISTRY.counter(
+    'parse_status_errors_total',
+    'Ошибки разбора работ из ответа API по классу исключения', ['error']
+)
+TELEGRAM_LATENCY = metrics.REGISTRY.histogram(
+    'telegram_send_seconds',
+    'Длительность отправки сообщения в Telegram по исходу', ['outcome']
 )
-console_out = logging.StreamHandler()
-formatter = logging.Formatter(
-    '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s - %(message)s'
+QUEUE_DEPTH = metrics.REGISTRY.gauge(
+    'telegram_queue_depth', 'Чаты, ожидающие отправки сообщений'
+)
+LAST_POLL = metrics.REGISTRY.gauge(
+    'bot_last_successful_poll_timestamp_seconds',
+    'Время последнего успешного опроса API'
+)
+SINCE_LAST_POLL = metrics.REGISTRY.gauge(
+    'bot_seconds_since_last_successful_poll',
+    'Секунд с последнего успешного опроса API'
+)
+SINCE_LAST_POLL.set_function(
+    lambda: None if LAST_POLL.get() is None else time.time() - LAST_POLL.get()
 )
-handler.setFormatter(formatter)
-logger.addHandler(handler)
-logger.addHandler(console_out)
+
+decode = get_decoder(JSON_DECODER)
+renderer = Renderer(MESSAGE_BUNDLES, LOCALE, MESSAGE_CACHE_SIZE)
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE)
+error_throttle = ErrorThrottle(ERROR_TTL, ERROR_SUMMARY_INTERVAL)
+# Аренды шардов; None — экземпляр опрашивает все свои подписки.
+ownership = None
+# Журнал исходящих; None — статусы сохраняются после отправки.
+outbox = None
+# Журнал всех смен статусов (`history.EventLog`); None — не ведётся.
+history = None
+# Бюджет запросов к API на токен; None — без ограничения.
+budget = None
 
 
 class AnswerIsNot200Error(Exception):
@@ -79,21 +223,93 @@ class ServerError(Exception):
     """Сервер отправил сообщение об ошибке."""
 
 
-def send_message(bot, message):
+class UnavailableError(AnswerIsNot200Error):
+    """API не справляется с запросом: код ответа 5xx."""
+
+
+class TooManyRequestsError(AnswerIsNot200Error):
+    """API просит повторить запрос позже."""
+
+    def __init__(self, message, retry_after):
+        """Сохраняет время, через которое можно повторить запрос."""
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# Начальные интервалы повтора после сбоя; с каждым следующим сбоем
+# того же класса интервал удваивается.
+ERROR_DELAYS = {
+    CircuitOpenError: 0,
+    NotOwnedError: 0,
+    BudgetExceededError: 0,
+    TooManyRequestsError: RETRY_TIME,
+    UnavailableError: 60,
+    ServerError: 60,
+    AnswerIsNot200Error: 60,
+    ConnectionError: 30,
+}
+# Общий предохранитель срабатывает только на сбои самого API. Ответы
+# 4xx и тела с `code`/`error` вызывает неверный токен одной подписки:
+# для них хватает её собственного интервала из `ERROR_DELAYS`.
+circuit_breaker = CircuitBreaker(
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    (ConnectionError, UnavailableError, TooManyRequestsError),
+)
+# Опрос пропущен без сбоя: о таких исключениях пользователю не сообщают.
+SKIPPED = (CircuitOpenError, NotOwnedError, BudgetExceededError)
+
+
+@metrics.timed(TELEGRAM_LATENCY)
+def send_message(bot, message, chat_id=None):
     """Отправляет сообщение пользователю в Telegram."""
-    bot.send_message(TELEGRAM_CHAT_ID, message)
+    if chat_id is None:
+        chat_id = TELEGRAM_CHAT_ID
+    bot.send_message(chat_id, message)
     logger.info(MESSAGE_SENT.format(message=message))
 
 
-def get_api_answer(current_timestamp):
+def check_availability(response):
+    """Проверяет, справляется ли API с запросами.
+
+    Бросает `TooManyRequestsError`, если API просит повторить запрос
+    позже, и `UnavailableError` при любом другом ответе 5xx.
+    """
+    if response.status_code == HTTPStatus.TOO_MANY_REQUESTS or (
+        response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+        and 'Retry-After' in response.headers
+    ):
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        raise TooManyRequestsError(
+            TOO_MANY_REQUESTS.format(
+                retry_after=retry_after,
+                url=response.url,
+                code=response.status_code,
+            ),
+            retry_after,
+        )
+    if response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+        raise UnavailableError(UNAVAILABLE.format(
+            url=response.url, code=response.status_code
+        ))
+
+
+@metrics.timed(API_LATENCY)
+def get_api_answer(current_timestamp, token=None):
     """Получает ответ от API Практикума."""
+    from requests.exceptions import RequestException
+
+    headers = HEADERS if token is None else {'Authorization': token}
+    cache_key = headers['Authorization']
     request_parameters = dict(
         url=ENDPOINT,
-        headers=HEADERS,
+        headers={**headers, **response_cache.validators(cache_key)},
         params={'from_date': current_timestamp}
     )
     try:
-        response = requests.get(**request_parameters)
+        response = get_session(HTTP_POOL_SIZE).get(
+            **request_parameters, timeout=HTTP_TIMEOUT
+        )
     except RequestException as error:
         raise ConnectionError(
             REQUEST_ERROR.format(
@@ -101,8 +317,24 @@ def get_api_answer(current_timestamp):
                 **request_parameters,
             )
         )
-    answer = response.json()
+    check_availability(response)
+    cached = response_cache.get(cache_key)
+    if cached is not None and response.status_code == HTTPStatus.NOT_MODIFIED:
+        API_CACHE_HITS.inc('not_modified')
+        return cached.answer
+    digest, current_date = fingerprint(response.content)
+    if (
+        cached is not None and cached.digest == digest
+        and response.status_code == HTTPStatus.OK
+    ):
+        if current_date is not None:
+            cached.answer['current_date'] = current_date
+        API_CACHE_HITS.inc('same_body')
+        return cached.answer
+    with JSON_DECODE.time():
+        answer = decode(response.content)
     if isinstance(answer, dict):
+        answer = ApiAnswer(answer)
         for key in ['code', 'error']:
             if key in answer:
                 raise ServerError(
@@ -120,9 +352,22 @@ def get_api_answer(current_timestamp):
                 **request_parameters
             )
         )
+    response_cache.store(cache_key, response, digest, answer)
     return answer
 
 
+class ApiAnswer(dict):
+    """Разобранный ответ API.
+
+    Проверенные записи о работах сохраняются в самом ответе, поэтому
+    повторный ответ из кеша не проверяется заново. После проверки
+    список работ в ответе заменяется компактным `HomeworkStates`,
+    и кеш ответов не хранит полные словари работ.
+    """
+
+    __slots__ = ('records', 'comments')
+
+
 def check_response(response):
     """Анализирует ответ API и возвращает последнюю домашнюю работу."""
     homeworks = response['homeworks']
@@ -130,6 +375,7 @@ def check_response(response):
     return homework
 
 
+@metrics.count_errors(PARSE_ERRORS)
 def parse_status(homework):
     """Получает последнюю работу и формирует сообщение пользователю."""
     for key in ['status', 'homework_name']:
@@ -138,44 +384,636 @@ def parse_status(homework):
     status = homework['status']
     if status not in VERDICTS:
         raise ValueError(UNEXPECTED_STATUS.format(status=status))
-    return NEW_STATUS.format(
-        homework_name=homework['homework_name'],
-        verdict=VERDICTS[status]
-    )
+    return renderer.status_message(homework['homework_name'], status)
 
 
 def check_tokens():
     """Проверяет наличие основных токенов."""
-    for name in ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN', 'TELEGRAM_CHAT_ID'):
+    names = ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN', 'TELEGRAM_CHAT_ID')
+    if SUBSCRIPTIONS_FILE:
+        names = ('TELEGRAM_TOKEN',)
+    for name in names:
         if globals()[name] is None:
             message = MISSING_ENV_VARS.format(variable=name)
             logger.critical(message)
             return False
-        return True
+    return True
 
 
-def main():
-    """Основная логика работы бота."""
-    if not check_tokens() is True:
-        raise NameError(MISSING_VAR)
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    timestamp = int(time.time())
-    while True:
+def check_ownership(subscription):
+    """Пропускает подписки, которые опрашивает другой экземпляр бота."""
+    if ownership is not None:
+        ownership.check(subscription.key)
+
+
+def check_budget(subscription):
+    """Расходует запрос из бюджета токена подписки, если бюджет задан.
+
+    Бюджет общий у подписок с одним токеном. Токен, исчерпавший
+    `REQUEST_BUDGET` запросов за `BUDGET_WINDOW` секунд, пропускается
+    до пополнения бюджета.
+    """
+    if budget is not None:
+        budget.check(subscription.token_key)
+
+
+def request_answer(timestamp, subscription):
+    """Запрашивает API по подписке, расходуя бюджет её токена.
+
+    Вызывается через `circuit_breaker`: пока он открыт, запрос не
+    отправляется и бюджет не тратится.
+    """
+    check_budget(subscription)
+    return get_api_answer(timestamp, subscription.token)
+
+
+def start_budget():
+    """Включает бюджет запросов, если задан `REQUEST_BUDGET`."""
+    global budget
+    if REQUEST_BUDGET:
+        budget = RequestBudget(REQUEST_BUDGET, BUDGET_WINDOW)
+
+
+def start_ownership(group=''):
+    """Начинает арендовать шарды подписок, если задан `LEASE_DB`.
+
+    Несколько экземпляров бота с общей базой аренд делят подписки
+    и не опрашивают одну подписку дважды. Состояние подписок
+    (`STATE_DB`) тоже должно быть общим, иначе новый владелец шарда
+    начнёт опрос без курсора и пропустит изменения.
+    """
+    global ownership
+    if not LEASE_DB:
+        return
+    import socket
+
+    if os.path.abspath(STATE_DB) != os.path.abspath(LEASE_DB):
+        logger.warning(STATE_NOT_SHARED.format(
+            state_db=STATE_DB, lease_db=LEASE_DB
+        ))
+
+    owner = INSTANCE_ID or f'{socket.gethostname()}-{os.getpid()}'
+    ownership = ShardOwnership(
+        SqliteLeaseStore(LEASE_DB), owner, LEASE_SHARDS, LEASE_TTL, group
+    ).start()
+
+
+def start_history():
+    """Открывает журнал смен статусов, если задан `HISTORY_DB`."""
+    global history
+    if not HISTORY_DB:
+        return
+    from history import EventLog
+
+    history = EventLog(HISTORY_DB)
+
+
+def replay_shards(shards):
+    """Ставит в очередь неотправленные уведомления полученных шардов."""
+    outbox.replay(select=lambda key: ownership.shard_of(key) in shards)
+
+
+def start_outbox(queue, subscriptions, store):
+    """Включает журнал исходящих и повторно ставит в очередь его записи.
+
+    Уведомления своих подписок, не подтверждённые отправкой до прошлой
+    остановки, отправляются сразу после запуска. При арендах шардов
+    (`start_ownership` вызывается раньше) повторяются только
+    уведомления своих шардов, а уведомления шарда, полученного позже,
+    — при его получении.
+    """
+    global outbox
+    if not OUTBOX:
+        return
+    from outbox import Outbox
+
+    outbox = Outbox(
+        store, queue, OUTBOX_INTERVAL, OUTBOX_RETRY_AFTER,
+        {subscription.key for subscription in subscriptions},
+        None if ownership is None else ownership.owns,
+    )
+    if ownership is not None:
+        ownership.on_acquire = replay_shards
+    outbox.replay()
+    outbox.start()
+
+
+def get_subscriptions():
+    """Возвращает подписки, за которыми следит бот."""
+    if SUBSCRIPTIONS_FILE:
+        return load_subscriptions(SUBSCRIPTIONS_FILE)
+    return [Subscription(token=PRACTICUM_TOKEN, chat_id=TELEGRAM_CHAT_ID)]
+
+
+@metrics.count_errors(PARSE_ERRORS)
+def parse_homeworks(answer):
+    """Проверяет работы из ответа API за один проход.
+
+    Возвращает `HomeworkStates`. Если работа встречается в ответе
+    несколько раз, берётся первая, самая свежая запись. Пока ведётся
+    журнал `history`, комментарии ревьюеров сохраняются в ответе
+    отдельно (`comments`).
+    """
+    records = getattr(answer, 'records', None)
+    if records is not None:
+        return records
+    if not isinstance(answer, dict):
+        raise TypeError(RESPONSE_NOT_DICT)
+    if 'homeworks' not in answer:
+        raise KeyError(NO_KEY.format(key='homeworks'))
+    homeworks = answer['homeworks']
+    if not isinstance(homeworks, list):
+        raise TypeError(HOMEWORKS_NOT_LIST)
+    codes = {}
+    comments = {}
+    for homework in homeworks:
+        status = homework.get('status')
+        name = homework.get('homework_name')
+        if status is None or name is None:
+            raise KeyError(NO_KEY.format(
+                key='status' if status is None else 'homework_name'
+            ))
+        if status not in VERDICTS:
+            raise ValueError(UNEXPECTED_STATUS.format(status=status))
+        codes.setdefault(name, STATUS_CODES[status])
+        if history is not None and homework.get('reviewer_comment'):
+            comments.setdefault(name, homework['reviewer_comment'])
+    records = HomeworkStates(codes.keys(), codes.values())
+    if isinstance(answer, ApiAnswer):
+        answer.records = records
+        answer.comments = comments
+        answer['homeworks'] = records
+    return records
+
+
+def find_transitions(subscription, answer, store):
+    """Возвращает изменившиеся статусы работ: (название, статус, текст).
+
+    Сохранённые статусы всех работ из ответа читаются одним запросом.
+    Текст сообщения на языке подписки формируется только для
+    изменившихся работ.
+    """
+    records = parse_homeworks(answer)
+    known = store.get_statuses(subscription.key, records.names)
+    transitions = []
+    for name, status in records.items():
+        label = status.label
+        if known.get(name) != label:
+            transitions.append((name, label, renderer.status_message(
+                name, label, subscription.locale
+            )))
+    return transitions
+
+
+def save_transitions(subscription, answer, transitions, store,
+                     current_date):
+    """Запоминает отправленные статусы и сдвигает курсор подписки.
+
+    При `current_date` None (событие) курсор не меняется. В журнал
+    `history` попадают только статусы, которых ещё не было в базе,
+    поэтому изменение, замеченное несколько раз до доставки,
+    записывается один раз.
+    """
+    known = store.get_statuses(
+        subscription.key, [name for name, _, _ in transitions]
+    )
+    store.save(
+        subscription.key,
+        [(name, status) for name, status, _ in transitions],
+        current_date,
+    )
+    record_history(subscription, answer, [
+        transition for transition in transitions
+        if known.get(transition[0]) != transition[1]
+    ])
+
+
+def notify_transitions(queue, subscription, answer, transitions, store,
+                       current_date):
+    """Ставит уведомления об изменениях в очередь отправки.
+
+    `current_date` — новый курсор подписки, None не сдвигает курсор.
+    С журналом исходящих (`outbox`) изменения сначала фиксируются в
+    базе, а в очередь их ставит журнал. Без него статусы и курсор
+    сохраняются после доставки сообщения. Изменения попадают в журнал
+    `history` там же, где сохраняются статусы.
+    """
+    if outbox is not None:
+        outbox.add(
+            subscription, transitions, current_date,
+            partial(record_history, subscription, answer),
+        )
+        return
+    queue.put(
+        subscription.chat_id,
+        [verdict for _, _, verdict in transitions],
+        partial(
+            save_transitions,
+            subscription, answer, transitions, store, current_date
+        ),
+    )
+
+
+def reviewer_comments(answer):
+    """Комментарии ревьюеров из ответа API или события: {работа: текст}."""
+    comments = getattr(answer, 'comments', None)
+    if comments is not None:
+        return comments
+    return {
+        homework.get('homework_name'): homework.get('reviewer_comment')
+        for homework in answer.get('homeworks', ())
+        if isinstance(homework, dict)
+    }
+
+
+def record_history(subscription, answer, transitions):
+    """Дописывает сохранённые изменения в журнал `history`, если он ведётся.
+
+    Время события — `current_date` ответа или текущее время.
+    """
+    if history is None or not transitions:
+        return
+    current_date = answer.get('current_date') or int(time.time())
+    comments = reviewer_comments(answer)
+    history.append(subscription.key, [
+        (name, status, current_date, comments.get(name))
+        for name, status, _ in transitions
+    ])
+
+
+def combine_messages(messages):
+    """Склеивает сообщения в как можно меньшее число сообщений Telegram."""
+    chunk = ''
+    for message in messages:
+        if chunk and len(chunk) + len(message) + 2 > MESSAGE_LIMIT:
+            yield chunk
+            chunk = ''
+        chunk = f'{chunk}\n\n{message}' if chunk else message
+    if chunk:
+        yield chunk
+
+
+def report_error(queue, subscription, error):
+    """Логирует ошибку и при необходимости сообщает о ней в чат.
+
+    Повторы той же ошибки не отправляются: вместо них периодически
+    уходит сводка с числом повторений.
+    """
+    logger.error(ERROR_MESSAGE.format(error=error))
+    count = error_throttle.observe(subscription.key, error)
+    if count == 1:
+        queue.put(subscription.chat_id, [
+            renderer.render('error', subscription.locale, error=error)
+        ])
+    elif count is not None:
+        queue.put(subscription.chat_id, [renderer.render(
+            'still_failing', subscription.locale, error=error, count=count
+        )])
+
+
+def report_recovery(queue, subscription):
+    """Сообщает в чат, что опрос снова работает после сбоя."""
+    count = error_throttle.recover(subscription.key)
+    if count:
+        queue.put(subscription.chat_id, [
+            renderer.render('recovered', subscription.locale, count=count)
+        ])
+
+
+def poll_cycle(queue, subscriptions, store):
+    """Опрашивает подписки и ставит новые статусы в очередь отправки.
+
+    Статусы и курсор подписки сохраняются только после того, как
+    очередь доставит сообщение, поэтому при сбое отправки они будут
+    отправлены в следующем цикле. Пока предохранитель API открыт,
+    подписки пропускаются без уведомлений; так же пропускаются
+    подписки чужих шардов (см. `start_ownership`). Сбой хранилища
+    состояния обрабатывается как сбой опроса этой подписки. Возвращает
+    для каждой подписки список изменений или исключение.
+    """
+    results = {}
+    for subscription in subscriptions:
         try:
-            answer = get_api_answer(ENDPOINT, timestamp)
-            homework = check_response(answer)
-            verdict = parse_status(homework)
-            send_message(bot, verdict)
-            timestamp = answer.get('current_date', timestamp)
+            timestamp = store.get_cursor(subscription.key, int(time.time()))
+            check_ownership(subscription)
+            answer = circuit_breaker.call(
+                request_answer, timestamp, subscription
+            )
+            transitions = find_transitions(subscription, answer, store)
+            LAST_POLL.set(time.time())
+            report_recovery(queue, subscription)
+            notify_transitions(
+                queue, subscription, answer, transitions, store,
+                answer.get('current_date', timestamp)
+            )
+        except SKIPPED as error:
+            results[subscription] = error
+            continue
         except Exception as error:
-            message = ERROR_MESSAGE.format(error=error)
-            logger.error(message)
-            try:
-                send_message(bot, message)
-            except Exception as error:
-                logger.error(SEND_ERROR.format(error=error))
-        time.sleep(RETRY_TIME)
+            results[subscription] = error
+            report_error(queue, subscription, error)
+            continue
+        results[subscription] = transitions
+    return results
+
+
+def event_times(event):
+    """Время изменения работ события: {название: unix time}.
+
+    Берётся `date_updated` работы, а без него — `current_date`
+    события. Работы, время которых неизвестно, не попадают в словарь.
+    """
+    import calendar
+
+    homeworks = event.get('homeworks')
+    if not isinstance(homeworks, list):
+        return {}
+    times = {}
+    for homework in homeworks:
+        if not isinstance(homework, dict) or 'homework_name' not in homework:
+            continue
+        updated = homework.get('date_updated')
+        if updated is not None:
+            updated = calendar.timegm(
+                time.strptime(updated, DATE_UPDATED_FORMAT)
+            )
+        else:
+            updated = event.get('current_date')
+        if updated is not None:
+            times.setdefault(homework['homework_name'], updated)
+    return times
+
+
+def drop_stale(subscription, event, store):
+    """Убирает из события изменения, которые старше известных.
+
+    Изменение устарело, если оно раньше курсора опроса (опрос его
+    уже учёл) или раньше изменения той же работы из другого события:
+    события могут прийти не по порядку или повториться, например,
+    при повторном чтении файла. Возвращает событие без устаревших
+    работ.
+    """
+    times = event_times(event)
+    if not times:
+        return event
+    cursor = store.get_cursor(subscription.key, None)
+    fresh = store.record_event_times(subscription.key, {
+        name: updated for name, updated in times.items()
+        if cursor is None or updated >= cursor
+    })
+    stale = times.keys() - fresh
+    if not stale:
+        return event
+    logger.info(STALE_EVENT.format(
+        key=subscription.key, names=', '.join(sorted(stale))
+    ))
+    return {**event, 'homeworks': [
+        homework for homework in event['homeworks']
+        if homework.get('homework_name') not in stale
+    ]}
+
+
+def ingest(queue, subscriptions, store, event, strict=True):
+    """Обрабатывает событие о смене статусов так же, как ответ API.
+
+    Событие — словарь с ключом подписки `subscription` и списком
+    `homeworks` в формате ответа API. Курсор подписки не сдвигается:
+    его двигает только опрос. Устаревшие изменения пропускаются (см.
+    `drop_stale`). Возвращает список изменений. Событие неизвестной
+    подписки или подписки чужого шарда (см. `start_ownership`) при
+    `strict=False` пропускается без ошибки, иначе вызывает
+    `KeyError` или `NotOwnedError`.
+    """
+    if not isinstance(event, dict):
+        raise TypeError(EVENT_NOT_DICT)
+    key = event.get('subscription')
+    if key not in subscriptions:
+        if not strict:
+            return []
+        raise KeyError(UNKNOWN_SUBSCRIPTION.format(key=key))
+    subscription = subscriptions[key]
+    try:
+        check_ownership(subscription)
+    except NotOwnedError:
+        if not strict:
+            return []
+        raise
+    event = drop_stale(subscription, event, store)
+    transitions = find_transitions(subscription, event, store)
+    notify_transitions(queue, subscription, event, transitions, store, None)
+    return transitions
+
+
+def start_ingestion(queue, subscriptions, store, port, group=''):
+    """Запускает приём событий, если он включён в окружении.
+
+    События принимаются по HTTP на порту `port` и (или) читаются из
+    файла `INGEST_FILE`. Позиция чтения файла хранится в `STATE_DB`
+    отдельно для каждого экземпляра (`INSTANCE_ID`) и воркера
+    (`group`). Возвращает True, если приём запущен.
+    """
+    if not port and not INGEST_FILE:
+        return False
+    from ingestion import FileFollower, start_ingest_server
+
+    sink = partial(
+        ingest, queue,
+        {subscription.key: subscription for subscription in subscriptions},
+        store,
+    )
+    if port:
+        start_ingest_server(
+            INGEST_HOST, int(port), sink, INGEST_SECRET, (NotOwnedError,)
+        )
+    if INGEST_FILE:
+        # Файл читают все воркеры, каждый берёт только свои подписки.
+        FileFollower(
+            INGEST_FILE, partial(sink, strict=False), store=store,
+            reader=':'.join(filter(None, (INSTANCE_ID, group))),
+        ).start()
+    return True
+
+
+def create_queue(bot):
+    """Создаёт очередь отправки сообщений с лимитами из окружения."""
+    return OutboundQueue(
+        partial(send_message, bot), combine_messages,
+        TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE
+    )
+
+
+def create_scheduler(reconcile=False):
+    """Создаёт расписание опросов с настройками из окружения.
+
+    При `reconcile` изменения приходят событиями, а опрос лишь
+    сверяет состояние раз в `RECONCILE_TIME` секунд.
+    """
+    base_delay, reviewing_delay = RETRY_TIME, REVIEWING_RETRY_TIME
+    if reconcile:
+        base_delay = reviewing_delay = RECONCILE_TIME
+    return AdaptiveScheduler(
+        base_delay, reviewing_delay, max(MAX_RETRY_TIME, base_delay),
+        IDLE_AFTER, POLL_JITTER, ERROR_DELAYS
+    )
+
+
+def configure_logging(suffix=''):
+    """Подключает обработчики журнала с настройками из окружения.
+
+    Воркеры пишут каждый в свой файл (`suffix`), чтобы не мешать
+    друг другу при ротации.
+    """
+    return setup_logging(
+        logger,
+        f'{__file__}{suffix}.log',
+        queued=LOG_QUEUE,
+        json_format=LOG_FORMAT == 'json',
+        info_sample_rate=LOG_INFO_SAMPLE_RATE,
+    )
+
+
+def serve(subscriptions, metrics_port=None, group='', ingest_port=None):
+    """Опрашивает подписки и отправляет уведомления до остановки процесса.
+
+    Тяжёлые зависимости (`telegram`, `asyncio`) импортируются здесь,
+    а не при импорте модуля, чтобы перезапуск воркера был быстрым.
+    """
+    import telegram
+
+    bot = telegram.Bot(token=TELEGRAM_TOKEN)
+    queue = create_queue(bot).start()
+    QUEUE_DEPTH.set_function(queue.depth)
+    if metrics_port:
+        metrics.start_metrics_server(METRICS_HOST, int(metrics_port))
+    store = StateStore(STATE_DB)
+    start_history()
+    start_budget()
+    start_ownership(group)
+    start_outbox(queue, subscriptions, store)
+    scheduler = create_scheduler(
+        start_ingestion(queue, subscriptions, store, ingest_port, group)
+    )
+    if POLLING_MODE == 'async':
+        import asyncio
+
+        from async_poller import AsyncPoller
+        poller = AsyncPoller(
+            queue, subscriptions, store, scheduler, POLLING_CONCURRENCY
+        )
+        asyncio.run(poller.run())
+        return
+    step = scheduler.base_delay / len(subscriptions)
+    for index, subscription in enumerate(subscriptions):
+        scheduler.add(subscription, index * step)
+    while True:
+        due = scheduler.pop_due()
+        if due:
+            results = poll_cycle(queue, due, store)
+            for subscription, result in results.items():
+                scheduler.reschedule(subscription, result)
+        time.sleep(scheduler.seconds_until_next())
+
+
+def run_worker(node, subscriptions):
+    """Точка входа процесса-воркера в режиме нескольких процессов.
+
+    Метрики воркера отдаются на порту `METRICS_PORT + 1 + node`,
+    события принимаются на порту `INGEST_PORT + 1 + node`.
+    """
+    configure_logging(f'.worker-{node}')
+    serve(
+        subscriptions,
+        int(METRICS_PORT) + 1 + node if METRICS_PORT else None,
+        f'worker-{node}',
+        int(INGEST_PORT) + 1 + node if INGEST_PORT else None,
+    )
+
+
+def seed_state(store, subscription, answer):
+    """Сохраняет статусы работ из ответа API, не отправляя уведомлений.
+
+    Курсор подписки сдвигается, только если он старее ответа.
+    Возвращает число сохранённых работ.
+    """
+    records = parse_homeworks(answer)
+    current_date = answer.get('current_date', int(time.time()))
+    cursor = store.get_cursor(subscription.key, None)
+    store.save(
+        subscription.key,
+        [(name, status.label) for name, status in records.items()],
+        current_date if cursor is None else max(cursor, current_date),
+    )
+    return len(records)
+
+
+def parse_date(text):
+    """Unix time полуночи UTC для даты `ГГГГ-ММ-ДД`."""
+    import calendar
+
+    return calendar.timegm(time.strptime(text, '%Y-%m-%d'))
+
+
+def backfill(argv):
+    """Команда `backfill`: загружает историю подписок до запуска бота.
+
+    Статусы всех работ, изменившихся с `--since`, сохраняются в
+    `STATE_DB` как уже отправленные, поэтому бот не присылает
+    уведомления о старых событиях. Возвращает код завершения.
+    """
+    import argparse
+
+    from backfill import Backfill
+
+    parser = argparse.ArgumentParser(prog='bot.py backfill')
+    parser.add_argument(
+        '--since', type=parse_date, required=True,
+        help='дата ГГГГ-ММ-ДД, с которой загружать статусы'
+    )
+    parser.add_argument(
+        '--concurrency', type=int, default=POLLING_CONCURRENCY,
+        help='сколько запросов к API выполнять одновременно'
+    )
+    args = parser.parse_args(argv)
+    configure_logging('.backfill')
+    subscriptions = get_subscriptions()
+    store = StateStore(STATE_DB)
+    results = Backfill(
+        get_api_answer, partial(seed_state, store), args.concurrency,
+        retry_on=(ConnectionError, AnswerIsNot200Error, ServerError),
+    ).run(subscriptions, args.since)
+    failed = sum(isinstance(result, Exception) for result in results.values())
+    logger.info(BACKFILL_DONE.format(
+        done=len(results) - failed, failed=failed,
+        homeworks=sum(
+            result for result in results.values()
+            if not isinstance(result, Exception)
+        ),
+    ))
+    store.close()
+    return 1 if failed else 0
+
+
+def main(argv=()):
+    """Основная логика работы бота.
+
+    `backfill` первым аргументом запускает одноимённую команду.
+    """
+    if argv[:1] == ['backfill']:
+        return backfill(argv[1:])
+    configure_logging()
+    if not check_tokens() is True:
+        raise NameError(MISSING_VAR)
+    if POLLING_MODE not in POLLING_MODES:
+        raise ValueError(UNKNOWN_MODE.format(mode=POLLING_MODE))
+    subscriptions = get_subscriptions()
+    if WORKERS <= 1:
+        serve(subscriptions, METRICS_PORT, ingest_port=INGEST_PORT)
+        return
+    from supervisor import Supervisor
+    if METRICS_PORT:
+        metrics.start_metrics_server(METRICS_HOST, int(METRICS_PORT))
+    Supervisor(subscriptions, WORKERS, run_worker).run()
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,105 @@
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+CIRCUIT_OPEN = (
+    'Запросы к API приостановлены после серии сбоев. '
+    'Повтор через {retry_after:.0f} с.'
+)
+
+
+class CircuitOpenError(Exception):
+    """Запросы к API приостановлены: сервис недоступен."""
+
+    def __init__(self, message, retry_after):
+        """Сохраняет время, через которое можно повторить запрос."""
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Общий для всех подписок предохранитель перед API.
+
+    В состоянии `closed` запросы проходят, а сбои подряд считаются.
+    После `failure_threshold` сбоев предохранитель переходит в `open`
+    и `reset_timeout` секунд отклоняет запросы, не отправляя их.
+    Затем он переходит в `half_open` и пропускает один пробный
+    запрос: успех закрывает предохранитель, сбой снова открывает.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout, failures,
+                 clock=time.monotonic):
+        """Сохраняет пороги и классы исключений, считающихся сбоями."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = failures
+        self.clock = clock
+        self.state = CLOSED
+        self.failure_count = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Решает, можно ли выполнить запрос прямо сейчас."""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+            if self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def retry_after(self):
+        """Через сколько секунд имеет смысл повторить запрос."""
+        with self.lock:
+            if self.state == OPEN:
+                return max(
+                    self.opened_at + self.reset_timeout - self.clock(), 0
+                )
+            return self.reset_timeout
+
+    def record_success(self):
+        """Отмечает успешный запрос и закрывает предохранитель."""
+        with self.lock:
+            self.state = CLOSED
+            self.failure_count = 0
+            self.probing = False
+
+    def record_failure(self):
+        """Отмечает сбой и при необходимости открывает предохранитель."""
+        with self.lock:
+            self.failure_count += 1
+            self.probing = False
+            if (
+                self.state == HALF_OPEN
+                or self.failure_count >= self.failure_threshold
+            ):
+                self.state = OPEN
+                self.opened_at = self.clock()
+
+    def call(self, func, *args, **kwargs):
+        """Выполняет запрос через предохранитель."""
+        if not self.allow():
+            retry_after = self.retry_after()
+            raise CircuitOpenError(
+                CIRCUIT_OPEN.format(retry_after=retry_after), retry_after
+            )
+        try:
+            result = func(*args, **kwargs)
+        except self.failures:
+            self.record_failure()
+            raise
+        except BaseException:
+            with self.lock:
+                self.probing = False
+            raise
+        self.record_success()
+        return result
@@ -0,0 +1,38 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+UNKNOWN_DECODER = 'Неизвестный декодер JSON: {name}'
+ORJSON_MISSING = 'Декодер orjson выбран, но пакет orjson не установлен'
+
+
+def json_loads(content):
+    """Разбирает тело ответа стандартным модулем `json`.
+
+    `json.loads` сам определяет кодировку UTF-8/16/32 по байтам, поэтому
+    тело не нужно заранее переводить в строку.
+    """
+    return json.loads(content)
+
+
+DECODERS = {'json': json_loads}
+if orjson is not None:
+    DECODERS['orjson'] = orjson.loads
+
+
+def get_decoder(name='auto'):
+    """Возвращает функцию, разбирающую байты тела ответа в объект.
+
+    `auto` выбирает orjson, если он установлен, иначе `json`.
+    Обе функции при ошибке выбрасывают `ValueError`.
+    """
+    if name == 'auto':
+        return DECODERS.get('orjson', json_loads)
+    if name == 'orjson' and orjson is None:
+        raise ValueError(ORJSON_MISSING)
+    if name not in DECODERS:
+        raise ValueError(UNKNOWN_DECODER.format(name=name))
+    return DECODERS[name]
@@ -0,0 +1,79 @@
+import re
+import threading
+import time
+
+# Числа в тексте ошибки (время, коды, порты) не делают её новой.
+VOLATILE = re.compile(r'0x[0-9a-fA-F]+|\d+')
+
+
+def fingerprint(error):
+    """Отпечаток ошибки: класс исключения и текст без изменчивых частей."""
+    return type(error).__name__, VOLATILE.sub('#', str(error))
+
+
+class ErrorRecord:
+    """Сколько раз повторилась ошибка и когда о ней сообщали."""
+
+    __slots__ = ('count', 'last_seen', 'last_sent')
+
+    def __init__(self, now):
+        """Создаёт запись о первом появлении ошибки."""
+        self.count = 1
+        self.last_seen = now
+        self.last_sent = now
+
+
+class ErrorThrottle:
+    """Решает, о каких ошибках сообщать пользователю.
+
+    О новой ошибке сообщается сразу. Повторы той же ошибки (по
+    отпечатку) не отправляются, но не чаще раза в `summary_interval`
+    уходит сводка с числом повторений. Отпечаток забывается, если
+    ошибка не повторялась `ttl` секунд. После успешного опроса
+    отправляется одно сообщение о восстановлении.
+    """
+
+    def __init__(self, ttl, summary_interval, clock=time.monotonic):
+        """Сохраняет сроки хранения отпечатков и интервал сводок."""
+        self.ttl = ttl
+        self.summary_interval = summary_interval
+        self.clock = clock
+        self.scopes = {}
+        self.lock = threading.Lock()
+
+    def observe(self, scope, error):
+        """Учитывает ошибку и возвращает число повторений для сообщения.
+
+        Возвращает 1 для новой ошибки, число повторений для сводки
+        и None, если сообщение отправлять не нужно.
+        """
+        now = self.clock()
+        key = fingerprint(error)
+        with self.lock:
+            records = self.scopes.setdefault(scope, {})
+            for stale in [
+                stale for stale, record in records.items()
+                if now - record.last_seen > self.ttl
+            ]:
+                del records[stale]
+            record = records.get(key)
+            if record is None:
+                records[key] = ErrorRecord(now)
+                return 1
+            record.count += 1
+            record.last_seen = now
+            if now - record.last_sent < self.summary_interval:
+                return None
+            record.last_sent = now
+            return record.count
+
+    def recover(self, scope):
+        """Забывает ошибки области и возвращает число их повторений.
+
+        Возвращает 0, если ошибок не было и сообщать не о чем.
+        """
+        with self.lock:
+            records = self.scopes.pop(scope, None)
+        if not records:
+            return 0
+        return sum(record.count for record in records.values())
@@ -0,0 +1,165 @@
+import heapq
+import itertools
+import threading
+import time
+
+from metrics import REGISTRY
+from telegram_queue import TokenBucket
+
+BUDGET_EXCEEDED = (
+    'Подписка {key} исчерпала бюджет запросов, следующий через {wait:.0f} с'
+)
+
+FAIR_WAIT = REGISTRY.histogram(
+    'fair_queue_wait_seconds',
+    'Ожидание свободного слота для запроса к API по типу подписки',
+    ['lane']
+)
+
+
+class BudgetExceededError(Exception):
+    """Подписка исчерпала бюджет запросов к API."""
+
+    def __init__(self, message, retry_after):
+        """Сохраняет время, через которое бюджет пополнится."""
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RequestBudget:
+    """Не больше `limit` запросов за `window` секунд на каждый ключ.
+
+    Бюджет пополняется равномерно, поэтому ключ может сделать серию
+    запросов после простоя, но не больше `limit` подряд. `check`
+    можно вызывать из потоков пула запросов.
+    """
+
+    def __init__(self, limit, window, clock=time.monotonic):
+        """Сохраняет размер бюджета и окно."""
+        self.rate = limit / window
+        self.limit = limit
+        self.clock = clock
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def check(self, key):
+        """Расходует запрос из бюджета или бросает `BudgetExceededError`."""
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = TokenBucket(
+                    self.rate, self.limit, self.clock
+                )
+            wait = bucket.wait_time()
+            if not wait:
+                bucket.consume()
+                return
+        raise BudgetExceededError(
+            BUDGET_EXCEEDED.format(key=key, wait=wait), wait
+        )
+
+
+class FairLimiter:
+    """Справедливо делит `slots` одновременных запросов между ключами.
+
+    Ожидающие запросы упорядочены как в справедливой очереди по
+    времени начала (start-time fair queuing): стоимость запроса
+    ключа — его средняя длительность. Следующий запрос ключа, чей
+    прошлый запрос шёл 30 секунд, встаёт в очередь на 30 секунд
+    виртуального времени позже, поэтому, пока слотов не хватает на
+    всех, быстрые подписки его не ждут. Свободный слот отдаётся сразу.
+    Ключи, средний запрос которых дольше `slow_after` секунд
+    (таймауты, зависший сервер), занимают не больше доли `slow_share`
+    слотов. Работает в одном цикле asyncio.
+    """
+
+    def __init__(self, slots, slow_after=5, slow_share=0.25,
+                 default_cost=0.5, clock=time.monotonic):
+        """Сохраняет число слотов и параметры изоляции медленных ключей."""
+        self.free = slots
+        self.slow_slots = max(1, int(slots * slow_share))
+        self.slow_busy = 0
+        self.slow_after = slow_after
+        self.default_cost = default_cost
+        self.clock = clock
+        self.costs = {}
+        self.finish = {}
+        self.virtual_time = 0
+        self.queues = {False: [], True: []}
+        self.counter = itertools.count()
+
+    def cost(self, key):
+        """Средняя длительность запроса ключа в секундах."""
+        return self.costs.get(key, self.default_cost)
+
+    def is_slow(self, key):
+        """Запросы ключа настолько долгие, что их нужно изолировать."""
+        return self.cost(key) >= self.slow_after
+
+    async def acquire(self, key):
+        """Ждёт слота для запроса ключа; возвращает признак медленного."""
+        import asyncio
+
+        slow = self.is_slow(key)
+        start = max(self.virtual_time, self.finish.get(key, 0))
+        self.finish[key] = start + self.cost(key)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self.queues[slow], (start, next(self.counter), key, future)
+        )
+        waited = self.clock()
+        self.dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(key, slow)
+            raise
+        FAIR_WAIT.observe(self.clock() - waited, 'slow' if slow else 'normal')
+        return slow
+
+    def release(self, key, slow, elapsed=None):
+        """Освобождает слот и учитывает длительность запроса."""
+        self.free += 1
+        if slow:
+            self.slow_busy -= 1
+        if elapsed is not None:
+            cost = self.costs.get(key)
+            self.costs[key] = (
+                elapsed if cost is None else 0.7 * cost + 0.3 * elapsed
+            )
+        self.dispatch()
+
+    def next_waiting(self):
+        """Очередь, где первым стоит запрос, который пора запустить."""
+        best = None
+        for slow, queue in self.queues.items():
+            while queue and queue[0][3].done():
+                heapq.heappop(queue)
+            if not queue or slow and self.slow_busy >= self.slow_slots:
+                continue
+            if best is None or queue[0] < best[0]:
+                best = queue
+        return best
+
+    def dispatch(self):
+        """Раздаёт свободные слоты ожидающим запросам."""
+        while self.free:
+            queue = self.next_waiting()
+            if queue is None:
+                return
+            start, _, key, future = heapq.heappop(queue)
+            self.virtual_time = start
+            self.free -= 1
+            if queue is self.queues[True]:
+                self.slow_busy += 1
+            future.set_result(None)
+
+    async def run(self, key, call):
+        """Выполняет корутину `call()` в слоте ключа `key`."""
+        slow = await self.acquire(key)
+        started = self.clock()
+        try:
+            return await call()
+        finally:
+            self.release(key, slow, self.clock() - started)
@@ -0,0 +1,185 @@
+import math
+import sqlite3
+import threading
+import time
+
+from homework_state import STATUS_CODES, Status
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    subscription TEXT NOT NULL,
+    homework_name TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    "current_date" INTEGER NOT NULL,
+    comment TEXT
+);
+CREATE INDEX IF NOT EXISTS events_by_date ON events ("current_date");
+CREATE TABLE IF NOT EXISTS open_reviews (
+    subscription TEXT NOT NULL,
+    homework_name TEXT NOT NULL,
+    started INTEGER NOT NULL,
+    PRIMARY KEY (subscription, homework_name)
+);
+CREATE TABLE IF NOT EXISTS turnaround_buckets (
+    homework_name TEXT NOT NULL,
+    period TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (homework_name, period, bucket)
+);
+CREATE INDEX IF NOT EXISTS turnaround_by_period
+    ON turnaround_buckets (period, bucket);
+'''
+# Границы корзин растут в `GROWTH` раз: погрешность перцентиля до 5%.
+GROWTH = 1.05
+QUANTILES = (0.5, 0.9, 0.99)
+GROUPS = ('homework_name', 'period')
+UNKNOWN_GROUP = 'Группировать можно только по {groups}: {by!r}'
+
+
+def bucket_of(seconds):
+    """Номер корзины гистограммы для длительности в секундах."""
+    if seconds <= 0:
+        return 0
+    return max(1, math.ceil(math.log(seconds) / math.log(GROWTH)))
+
+
+def bucket_bound(bucket):
+    """Верхняя граница корзины в секундах."""
+    return 0 if bucket == 0 else round(GROWTH ** bucket)
+
+
+def period_of(timestamp):
+    """Период (месяц UTC, `ГГГГ-ММ`), к которому относится проверка."""
+    return time.strftime('%Y-%m', time.gmtime(timestamp))
+
+
+def summarize(buckets, quantiles):
+    """Число проверок и перцентили по парам (корзина, число)."""
+    buckets = sorted(buckets)
+    total = sum(count for _, count in buckets)
+    stats = {'count': total}
+    for quantile in quantiles:
+        rank = max(1, math.ceil(quantile * total))
+        seen = 0
+        for bucket, count in buckets:
+            seen += count
+            if seen >= rank:
+                stats[f'p{quantile * 100:g}'] = bucket_bound(bucket)
+                break
+        else:
+            stats[f'p{quantile * 100:g}'] = None
+    return stats
+
+
+class EventLog:
+    """Журнал всех замеченных смен статусов и статистика проверок.
+
+    События только дописываются в таблицу `events` с простыми
+    колонками (статус хранится кодом `Status`), так что журнал легко
+    выгрузить в колоночный формат. Время проверки — от статуса
+    `reviewing` до `approved` или `rejected` — считается при записи
+    и сразу попадает в гистограмму по работе и месяцу. Поэтому
+    перцентили читаются из нескольких сотен строк агрегатов, а не из
+    всего журнала.
+    """
+
+    def __init__(self, path):
+        """Открывает (и при необходимости создаёт) базу по пути `path`."""
+        self.connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def append(self, subscription, events):
+        """Одной транзакцией дописывает события подписки.
+
+        `events` — кортежи (работа, статус, current_date, комментарий).
+        """
+        with self.lock, self.connection:
+            self.connection.execute('BEGIN')
+            for name, status, current_date, comment in events:
+                code = STATUS_CODES[status]
+                self.connection.execute(
+                    'INSERT INTO events (subscription, homework_name, '
+                    'status, "current_date", comment) VALUES (?, ?, ?, ?, ?)',
+                    (subscription, name, code, current_date, comment)
+                )
+                self.track_review(subscription, name, code, current_date)
+
+    def track_review(self, subscription, name, code, current_date):
+        """Открывает или закрывает проверку работы и учитывает её время."""
+        key = (subscription, name)
+        if code == Status.REVIEWING:
+            # Повторно замеченный `reviewing` не сдвигает начало проверки.
+            self.connection.execute(
+                'INSERT OR IGNORE INTO open_reviews VALUES (?, ?, ?)',
+                (*key, current_date)
+            )
+            return
+        row = self.connection.execute(
+            'SELECT started FROM open_reviews '
+            'WHERE subscription = ? AND homework_name = ?', key
+        ).fetchone()
+        if row is None:
+            return
+        self.connection.execute(
+            'DELETE FROM open_reviews '
+            'WHERE subscription = ? AND homework_name = ?', key
+        )
+        self.connection.execute(
+            'INSERT INTO turnaround_buckets VALUES (?, ?, ?, 1) '
+            'ON CONFLICT (homework_name, period, bucket) '
+            'DO UPDATE SET count = count + 1',
+            (
+                name, period_of(current_date),
+                bucket_of(max(0, current_date - row[0])),
+            )
+        )
+
+    def turnaround(self, homework_name=None, period=None,
+                   quantiles=QUANTILES):
+        """Перцентили времени проверки в секундах.
+
+        Без фильтров — по всем работам за всё время. Возвращает
+        словарь вида {'count': n, 'p50': секунды, ...}.
+        """
+        conditions, params = [], []
+        if homework_name is not None:
+            conditions.append('homework_name = ?')
+            params.append(homework_name)
+        if period is not None:
+            conditions.append('period = ?')
+            params.append(period)
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        with self.lock:
+            buckets = self.connection.execute(
+                f'SELECT bucket, SUM(count) FROM turnaround_buckets {where} '
+                'GROUP BY bucket', params
+            ).fetchall()
+        return summarize(buckets, quantiles)
+
+    def turnaround_by(self, by='homework_name', quantiles=QUANTILES):
+        """Перцентили времени проверки для каждой работы или месяца."""
+        if by not in GROUPS:
+            raise ValueError(UNKNOWN_GROUP.format(groups=GROUPS, by=by))
+        with self.lock:
+            rows = self.connection.execute(
+                f'SELECT {by}, bucket, SUM(count) FROM turnaround_buckets '
+                f'GROUP BY {by}, bucket'
+            ).fetchall()
+        groups = {}
+        for key, bucket, count in rows:
+            groups.setdefault(key, []).append((bucket, count))
+        return {
+            key: summarize(buckets, quantiles)
+            for key, buckets in groups.items()
+        }
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        with self.lock:
+            self.connection.close()
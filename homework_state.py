@@ -0,0 +1,54 @@
+import sys
+from collections.abc import Sequence
+from enum import IntEnum
+
+
+class Status(IntEnum):
+    """Код статуса работы; `label` — статус в ответе API."""
+
+    APPROVED = 1
+    REVIEWING = 2
+    REJECTED = 3
+
+    @property
+    def label(self):
+        """Статус так, как его называет API."""
+        return self.name.lower()
+
+
+STATUS_CODES = {status.label: status for status in Status}
+# Статус по коду без вызова конструктора перечисления.
+BY_CODE = (None,) + tuple(Status)
+
+
+class HomeworkStates(Sequence):
+    """Статусы работ из одного ответа API в компактном виде.
+
+    Названия работ интернированы, а статусы лежат в `bytes` по
+    одному байту на работу, так что запись о работе занимает
+    указатель на строку и один байт вместо словаря со всеми полями
+    ответа. Для совместимости с кодом, который ждёт список словарей,
+    элемент по индексу возвращается как `{'homework_name', 'status'}`.
+    """
+
+    __slots__ = ('names', 'codes')
+
+    def __init__(self, names, codes):
+        """Сохраняет названия и коды статусов в одном порядке."""
+        self.names = tuple(sys.intern(name) for name in names)
+        self.codes = bytes(codes)
+
+    def __len__(self):
+        """Число работ."""
+        return len(self.names)
+
+    def __getitem__(self, index):
+        """Работа в виде словаря, как в ответе API."""
+        return {
+            'homework_name': self.names[index],
+            'status': BY_CODE[self.codes[index]].label,
+        }
+
+    def items(self):
+        """Пары (название, статус) без создания словарей."""
+        return zip(self.names, map(BY_CODE.__getitem__, self.codes))
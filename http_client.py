@@ -0,0 +1,40 @@
+import threading
+
+_session = None
+_lock = threading.Lock()
+
+
+def create_session(pool_size):
+    """Создаёт сессию с пулом постоянных соединений."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(pool_size):
+    """Возвращает общую для процесса сессию, создавая её при первом вызове.
+
+    Соединения с API остаются открытыми между опросами (keep-alive),
+    поэтому TCP- и TLS-рукопожатие выполняется один раз на соединение
+    пула, а не на каждый запрос.
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = create_session(pool_size)
+    return _session
+
+
+def close_session():
+    """Закрывает общую сессию и все соединения её пула."""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,173 @@
+import hmac
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from metrics import REGISTRY
+
+logger = logging.getLogger('bot.ingestion')
+
+BAD_EVENT = 'Событие не обработано: {error}'
+FILE_EVENT_ERROR = 'Строка {line} файла событий {path} не обработана: {error}'
+
+EVENTS = REGISTRY.counter(
+    'ingest_events_total', 'Полученные события о смене статусов по исходу',
+    ['outcome']
+)
+
+
+def handle(sink, event):
+    """Передаёт событие в обработчик и учитывает исход в метриках."""
+    try:
+        result = sink(event)
+    except Exception:
+        EVENTS.inc('error')
+        raise
+    EVENTS.inc('ok')
+    return result
+
+
+def create_handler(sink, secret=None, conflicts=()):
+    """Создаёт обработчик `POST /events` для событий в формате JSON.
+
+    Если задан `secret`, запрос должен содержать его в заголовке
+    `X-Ingest-Secret`. Событие, на котором обработчик вызвал
+    исключение из `conflicts` (например, подписку ведёт другой
+    экземпляр), отклоняется с кодом 409, остальные ошибки — с 400.
+    """
+
+    class IngestHandler(BaseHTTPRequestHandler):
+        """Принимает события о смене статусов работ."""
+
+        protocol_version = 'HTTP/1.1'
+
+        def reply(self, status, data):
+            """Отправляет JSON-ответ."""
+            body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            """Обрабатывает одно событие."""
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length)
+            if self.path.split('?')[0] != '/events':
+                self.reply(404, {'error': 'not found'})
+                return
+            if secret and not hmac.compare_digest(
+                self.headers.get('X-Ingest-Secret', ''), secret
+            ):
+                self.reply(403, {'error': 'forbidden'})
+                return
+            try:
+                transitions = handle(sink, json.loads(body))
+            except conflicts as error:
+                self.reply(409, {'error': str(error)})
+                return
+            except Exception as error:
+                logger.warning(BAD_EVENT.format(error=error))
+                self.reply(400, {'error': str(error)})
+                return
+            self.reply(200, {'transitions': len(transitions)})
+
+        def log_message(self, format, *args):
+            """Не пишет каждый запрос в журнал."""
+
+    return IngestHandler
+
+
+def start_ingest_server(host, port, sink, secret=None, conflicts=()):
+    """Запускает HTTP-приёмник событий в фоновом потоке."""
+    server = ThreadingHTTPServer(
+        (host, port), create_handler(sink, secret, conflicts)
+    )
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name='ingest', daemon=True
+    ).start()
+    return server
+
+
+class FileFollower:
+    """Читает события из файла JSON Lines по мере их дописывания.
+
+    Замена очереди сообщений: каждая новая строка файла — одно
+    событие. Недописанная последняя строка ждёт следующей проверки.
+    Если файл усекли или заменили, чтение начинается с начала.
+    С хранилищем `store` позиция чтения сохраняется под именем
+    `reader` после каждой проверки, поэтому после перезапуска файл
+    читается с того же места, а не с начала.
+    """
+
+    def __init__(self, path, sink, interval=0.5, store=None, reader=''):
+        """Сохраняет путь к файлу, обработчик и период проверки."""
+        self.path = path
+        self.sink = sink
+        self.interval = interval
+        self.store = store
+        self.reader = reader
+        self.offset = 0
+        self.line = 0
+        self.inode = None
+        if store is not None:
+            saved = store.get_file_offset(reader, path)
+            if saved is not None:
+                self.inode, self.offset, self.line = saved
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def poll(self):
+        """Обрабатывает строки, дописанные с прошлой проверки."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.inode, self.offset, self.line = stat.st_ino, 0, 0
+        start = self.offset
+        with open(self.path, 'rb') as file:
+            file.seek(self.offset)
+            for raw in file:
+                if not raw.endswith(b'\n'):
+                    break
+                self.offset += len(raw)
+                self.line += 1
+                if raw.strip():
+                    self.process(raw)
+        if self.store is not None and self.offset != start:
+            self.store.set_file_offset(
+                self.reader, self.path, self.inode, self.offset, self.line
+            )
+
+    def process(self, raw):
+        """Передаёт событие из строки файла в обработчик."""
+        try:
+            handle(self.sink, json.loads(raw))
+        except Exception as error:
+            logger.warning(FILE_EVENT_ERROR.format(
+                line=self.line, path=self.path, error=error
+            ))
+
+    def run(self):
+        """Цикл потока чтения файла."""
+        while not self.stopped.wait(self.interval):
+            self.poll()
+
+    def start(self):
+        """Запускает поток чтения файла."""
+        self.thread = threading.Thread(
+            target=self.run, name='ingest-file', daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает поток чтения файла."""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
@@ -0,0 +1,229 @@
+import logging
+import math
+import sqlite3
+import threading
+import time
+
+from metrics import REGISTRY
+from sharding import HashRing
+
+logger = logging.getLogger('bot.leases')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS leases (
+    shard TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    grp TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (grp, owner)
+);
+'''
+NOT_OWNED = 'Подписку {key} опрашивает другой экземпляр бота'
+SHARDS_CHANGED = 'Экземпляр {owner} опрашивает шарды: {shards}'
+REFRESH_ERROR = 'Не удалось продлить аренду шардов: {error}'
+
+OWNED_SHARDS = REGISTRY.gauge(
+    'lease_owned_shards', 'Шарды подписок, арендованные этим экземпляром'
+)
+
+
+class NotOwnedError(Exception):
+    """Подписку опрашивает другой экземпляр бота."""
+
+    def __init__(self, message, retry_after):
+        """Сохраняет время, через которое стоит проверить аренду снова."""
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SqliteLeaseStore:
+    """Аренды шардов в локальной базе SQLite.
+
+    Кроме аренд хранится список живых участников каждой группы,
+    по которому экземпляры делят шарды поровну. Те же пять методов
+    (`heartbeat`, `members`, `leave`, `acquire`, `release`) можно
+    реализовать поверх сетевого хранилища.
+    """
+
+    def __init__(self, path, clock=time.time):
+        """Открывает (и при необходимости создаёт) базу по пути `path`."""
+        self.connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+        self.clock = clock
+        self.lock = threading.Lock()
+
+    def heartbeat(self, group, owner, ttl):
+        """Отмечает участника группы живым ещё на `ttl` секунд."""
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO members (grp, owner, expires) '
+                'VALUES (?, ?, ?)',
+                (group, owner, self.clock() + ttl)
+            )
+
+    def members(self, group):
+        """Число живых участников группы."""
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT COUNT(*) FROM members WHERE grp = ? AND expires > ?',
+                (group, self.clock())
+            ).fetchone()
+        return row[0]
+
+    def leave(self, group, owner):
+        """Убирает участника из группы."""
+        with self.lock:
+            self.connection.execute(
+                'DELETE FROM members WHERE grp = ? AND owner = ?',
+                (group, owner)
+            )
+
+    def acquire(self, shard, owner, ttl):
+        """Берёт или продлевает аренду шарда на `ttl` секунд.
+
+        Аренда выдаётся, если шард свободен, уже принадлежит `owner`
+        или срок чужой аренды истёк. Проверка и запись выполняются
+        одним запросом, поэтому два экземпляра не получат шард
+        одновременно.
+        """
+        now = self.clock()
+        with self.lock:
+            cursor = self.connection.execute(
+                'INSERT INTO leases (shard, owner, expires) VALUES (?, ?, ?) '
+                'ON CONFLICT (shard) DO UPDATE SET '
+                'owner = excluded.owner, expires = excluded.expires '
+                'WHERE leases.owner = excluded.owner OR leases.expires <= ?',
+                (shard, owner, now + ttl, now)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, shard, owner):
+        """Освобождает шард, если он принадлежит `owner`."""
+        with self.lock:
+            self.connection.execute(
+                'DELETE FROM leases WHERE shard = ? AND owner = ?',
+                (shard, owner)
+            )
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        with self.lock:
+            self.connection.close()
+
+
+class ShardOwnership:
+    """Какие шарды подписок опрашивает этот экземпляр бота.
+
+    Подписки раскладываются на `shards` шардов консистентным
+    хешированием. Экземпляр продлевает свои аренды каждые `ttl / 3`
+    секунд и берёт свободные или просроченные шарды, но не больше
+    своей доли среди живых участников группы: лишние шарды он
+    отпускает, чтобы их забрал новый экземпляр. Если продлить аренды
+    не удалось, через `ttl` секунд экземпляр перестаёт считать шарды
+    своими. Шарды, полученные при продлении, передаются в
+    `on_acquire(шарды)`.
+    """
+
+    def __init__(self, store, owner, shards, ttl, group='',
+                 on_acquire=None, clock=time.monotonic):
+        """Сохраняет хранилище аренд, имя экземпляра и число шардов."""
+        self.store = store
+        self.owner = owner
+        self.ttl = ttl
+        self.group = group
+        self.on_acquire = on_acquire
+        self.clock = clock
+        self.ring = HashRing(range(shards))
+        self.shards = list(range(shards))
+        self.owned = frozenset()
+        self.valid_until = 0
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def shard_name(self, shard):
+        """Имя шарда в хранилище аренд."""
+        return f'{self.group}/{shard}'
+
+    def shard_of(self, key):
+        """Шард подписки с ключом `key`."""
+        return self.ring.node_for(key)
+
+    def owns(self, key):
+        """Принадлежит ли подписка с ключом `key` этому экземпляру."""
+        if self.clock() >= self.valid_until:
+            return False
+        return self.shard_of(key) in self.owned
+
+    def check(self, key):
+        """Выбрасывает NotOwnedError, если подписка принадлежит другому."""
+        if not self.owns(key):
+            raise NotOwnedError(NOT_OWNED.format(key=key), self.ttl / 3)
+
+    def refresh(self):
+        """Продлевает свои аренды и забирает свободные шарды до своей доли."""
+        started = self.clock()
+        store = self.store
+        store.heartbeat(self.group, self.owner, self.ttl)
+        limit = math.ceil(
+            len(self.shards) / max(store.members(self.group), 1)
+        )
+        owned = []
+        for shard in sorted(self.owned):
+            name = self.shard_name(shard)
+            if len(owned) >= limit:
+                store.release(name, self.owner)
+            elif store.acquire(name, self.owner, self.ttl):
+                owned.append(shard)
+        for shard in self.shards:
+            if len(owned) >= limit:
+                break
+            if shard not in owned and store.acquire(
+                self.shard_name(shard), self.owner, self.ttl
+            ):
+                owned.append(shard)
+        if set(owned) != self.owned:
+            logger.info(SHARDS_CHANGED.format(
+                owner=self.owner, shards=sorted(owned)
+            ))
+        # Шарды просроченной аренды считаются полученными заново.
+        previous = self.owned if started < self.valid_until else frozenset()
+        acquired = frozenset(owned) - previous
+        self.owned = frozenset(owned)
+        self.valid_until = started + self.ttl
+        OWNED_SHARDS.set(len(owned))
+        if acquired and self.on_acquire is not None:
+            self.on_acquire(acquired)
+
+    def run(self):
+        """Цикл потока продления аренд."""
+        while not self.stopped.wait(self.ttl / 3):
+            try:
+                self.refresh()
+            except Exception as error:
+                logger.error(REFRESH_ERROR.format(error=error))
+
+    def start(self):
+        """Берёт первые аренды и запускает поток их продления."""
+        self.refresh()
+        self.thread = threading.Thread(
+            target=self.run, name='leases', daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает продление и отпускает все шарды."""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        for shard in self.owned:
+            self.store.release(self.shard_name(shard), self.owner)
+        self.store.leave(self.group, self.owner)
+        self.owned = frozenset()
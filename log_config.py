@@ -0,0 +1,110 @@
+import atexit
+import itertools
+import json
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+TEXT_FORMAT = (
+    '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s - %(message)s'
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись журнала как одну строку JSON."""
+
+    def format(self, record):
+        """Возвращает запись в формате JSON Lines."""
+        entry = {
+            'time': self.formatTime(record),
+            'name': record.name,
+            'level': record.levelname,
+            'func': record.funcName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает каждую `rate`-ю запись уровня INFO и ниже.
+
+    Счёт ведётся отдельно для каждой функции, поэтому редкие события
+    не теряются из-за частых. Предупреждения и ошибки проходят всегда.
+    """
+
+    def __init__(self, rate):
+        """Сохраняет частоту выборки."""
+        super().__init__()
+        self.rate = rate
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        """Решает, пропускать ли запись."""
+        if self.rate <= 1 or record.levelno > logging.INFO:
+            return True
+        key = (record.name, record.funcName)
+        with self.lock:
+            counter = self.counters.get(key)
+            if counter is None:
+                counter = self.counters[key] = itertools.count()
+            return next(counter) % self.rate == 0
+
+
+class QueueRecordHandler(QueueHandler):
+    """QueueHandler, который не форматирует запись в потоке опроса.
+
+    Стандартный `prepare` форматирует сообщение сразу; здесь запись
+    только очищается от аргументов, а форматирование выполняет
+    фоновый поток `QueueListener`.
+    """
+
+    def prepare(self, record):
+        """Готовит запись к передаче в очередь."""
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def create_handlers(path, json_format):
+    """Создаёт обработчики файла с ротацией и консоли."""
+    formatter = (
+        JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+    )
+    file_handler = RotatingFileHandler(
+        path,
+        maxBytes=50000000,
+        backupCount=5,
+        encoding='utf-8'
+    )
+    console_out = logging.StreamHandler()
+    for handler in (file_handler, console_out):
+        handler.setFormatter(formatter)
+    return [file_handler, console_out]
+
+
+def setup_logging(logger, path, queued=False, json_format=False,
+                  info_sample_rate=1):
+    """Настраивает журнал бота.
+
+    В режиме `queued` записи попадают в очередь, а в файл и консоль
+    их пишет фоновый поток, так что опрос не ждёт дискового ввода-
+    вывода и ротации файла.
+    """
+    logger.setLevel(logging.INFO)
+    handlers = create_handlers(path, json_format)
+    if info_sample_rate > 1:
+        logger.addFilter(SamplingFilter(info_sample_rate))
+    if not queued:
+        for handler in handlers:
+            logger.addHandler(handler)
+        return None
+    records = queue.SimpleQueue()
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    logger.addHandler(QueueRecordHandler(records))
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict
+from string import Formatter
+
+UNSUPPORTED_FIELD = (
+    'В шаблоне {key!r} поддерживаются только поля вида {{name}}: {field!r}'
+)
+UNKNOWN_LOCALE = (
+    'Нет шаблонов для языка по умолчанию {locale!r}, есть: {known}'
+)
+
+# Шаблоны на английском; русские шаблоны собираются из констант `bot`.
+EN = {
+    'new_status': 'Review status of "{homework_name}" changed. {verdict}',
+    'verdict.approved': 'The reviewer approved the work. Hooray!',
+    'verdict.reviewing': 'A reviewer has started checking the work.',
+    'verdict.rejected': 'The reviewer has comments on the work.',
+    'error': 'The bot ran into a problem: {error}',
+    'still_failing': 'The problem persists: {error}. Repeats: {count}',
+    'recovered': 'The bot is working again. Failures in the period: {count}',
+}
+
+
+class Template:
+    """Шаблон сообщения, разобранный один раз.
+
+    Текст хранится как чередование готовых кусков и имён полей,
+    поэтому при выводе строка шаблона заново не разбирается.
+    """
+
+    __slots__ = ('parts',)
+
+    def __init__(self, key, text):
+        """Разбирает шаблон `text`; `key` нужен для сообщения об ошибке."""
+        parts = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if literal:
+                parts.append((True, literal))
+            if field is None:
+                continue
+            if not field.isidentifier() or spec or conversion:
+                raise ValueError(
+                    UNSUPPORTED_FIELD.format(key=key, field=field)
+                )
+            parts.append((False, field))
+        self.parts = tuple(parts)
+
+    def render(self, values):
+        """Подставляет значения полей."""
+        return ''.join(
+            text if literal else str(values[text])
+            for literal, text in self.parts
+        )
+
+
+class Renderer:
+    """Выводит сообщения бота на языке чата.
+
+    Шаблоны каждого языка компилируются один раз при создании.
+    Если в наборе языка нет шаблона, берётся шаблон языка по
+    умолчанию. Сообщения о смене статуса запоминаются в LRU-кеше
+    на `cache_size` записей по ключу (название, статус, язык), так что
+    один и тот же текст для многих чатов создаётся один раз.
+    """
+
+    def __init__(self, bundles, default_locale, cache_size):
+        """Компилирует наборы шаблонов {язык: {ключ: шаблон}}."""
+        if default_locale not in bundles:
+            raise ValueError(UNKNOWN_LOCALE.format(
+                locale=default_locale, known=', '.join(sorted(bundles))
+            ))
+        self.default_locale = default_locale
+        self.templates = {
+            locale: {
+                key: Template(key, text) for key, text in bundle.items()
+            }
+            for locale, bundle in bundles.items()
+        }
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def template(self, key, locale):
+        """Шаблон на языке `locale` или на языке по умолчанию."""
+        bundle = self.templates.get(locale or self.default_locale)
+        if bundle is None or key not in bundle:
+            bundle = self.templates[self.default_locale]
+        return bundle[key]
+
+    def render(self, key, locale=None, **values):
+        """Сообщение по шаблону `key` без кеширования."""
+        return self.template(key, locale).render(values)
+
+    def status_message(self, homework_name, status, locale=None):
+        """Сообщение о новом статусе работы, из кеша, если оно уже было."""
+        locale = locale or self.default_locale
+        cache_key = (homework_name, status, locale)
+        with self.lock:
+            message = self.cache.get(cache_key)
+            if message is not None:
+                self.cache.move_to_end(cache_key)
+                return message
+        message = self.template('new_status', locale).render({
+            'homework_name': homework_name,
+            'verdict': self.render(f'verdict.{status}', locale),
+        })
+        with self.lock:
+            self.cache[cache_key] = message
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return message
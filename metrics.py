@@ -0,0 +1,281 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf')
+)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_labels(names, values, extra=()):
+    """Форматирует метки в виде `{name="value",...}`."""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for name, value in pairs
+    ) + '}'
+
+
+def format_value(value):
+    """Форматирует число так, как его ожидает Prometheus."""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Общая часть метрик: имя, описание, метки и блокировка."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        """Создаёт метрику без значений."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def header(self):
+        """Строки `# HELP` и `# TYPE`."""
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик."""
+
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        """Увеличивает счётчик для набора меток."""
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        """Строки метрики в текстовом формате Prometheus."""
+        with self.lock:
+            items = sorted(self.values.items())
+        return self.header() + [
+            f'{self.name}{format_labels(self.labelnames, labels)} '
+            f'{format_value(value)}'
+            for labels, value in items
+        ]
+
+
+class Gauge(Metric):
+    """Значение, которое может расти и убывать.
+
+    Вместо значения можно задать функцию, которая вызывается
+    при каждом чтении метрики.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        """Создаёт метрику без значения."""
+        super().__init__(name, documentation, labelnames)
+        self.function = None
+
+    def set(self, value, *labels):
+        """Устанавливает значение."""
+        with self.lock:
+            self.values[labels] = value
+
+    def get(self, *labels):
+        """Текущее значение или None."""
+        with self.lock:
+            return self.values.get(labels)
+
+    def set_function(self, function):
+        """Вычислять значение функцией при чтении."""
+        self.function = function
+
+    def render(self):
+        """Строки метрики в текстовом формате Prometheus."""
+        if self.function is not None:
+            value = self.function()
+            items = [] if value is None else [((), value)]
+        else:
+            with self.lock:
+                items = sorted(self.values.items())
+        return self.header() + [
+            f'{self.name}{format_labels(self.labelnames, labels)} '
+            f'{format_value(value)}'
+            for labels, value in items
+        ]
+
+
+class Histogram(Metric):
+    """Распределение значений по корзинам."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        """Создаёт гистограмму с заданными верхними границами корзин."""
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        """Добавляет наблюдение."""
+        with self.lock:
+            counts = self.values.get(labels)
+            if counts is None:
+                counts = self.values[labels] = [0] * len(self.buckets) + [0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        """Замеряет длительность блока `with`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self):
+        """Строки метрики в текстовом формате Prometheus."""
+        with self.lock:
+            items = sorted(
+                (labels, list(counts))
+                for labels, counts in self.values.items()
+            )
+        lines = self.header()
+        for labels, counts in items:
+            for bound, count in zip(self.buckets, counts):
+                bucket = format_labels(
+                    self.labelnames, labels, [('le', format_value(bound))]
+                )
+                lines.append(f'{self.name}_bucket{bucket} {count}')
+            total = format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{total} {format_value(counts[-1])}')
+            # Корзина +Inf содержит все наблюдения.
+            lines.append(f'{self.name}_count{total} {counts[-2]}')
+        return lines
+
+
+class Registry:
+    """Набор метрик процесса."""
+
+    def __init__(self):
+        """Создаёт пустой реестр."""
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        """Добавляет метрику в реестр и возвращает её."""
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        """Создаёт и регистрирует счётчик."""
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        """Создаёт и регистрирует показатель."""
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        """Создаёт и регистрирует гистограмму."""
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        with self.lock:
+            metrics = list(self.metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def timed(histogram):
+    """Декоратор: замеряет длительность вызова с меткой исхода.
+
+    Исход — `ok` или имя класса исключения.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = 'ok'
+            try:
+                return func(*args, **kwargs)
+            except Exception as error:
+                outcome = type(error).__name__
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start, outcome)
+        return wrapper
+    return decorator
+
+
+def count_errors(counter):
+    """Декоратор: считает исключения функции по классу."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except Exception as error:
+                counter.inc(type(error).__name__)
+                raise
+        return wrapper
+    return decorator
+
+
+def create_handler(registry):
+    """Создаёт обработчик запросов, отдающий метрики по адресу `/metrics`.
+
+    `http.server` импортируется только здесь: без сервера метрик он
+    боту не нужен, а его импорт заметно замедляет запуск.
+    """
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Отдаёт метрики реестра по адресу `/metrics`."""
+
+        def do_GET(self):
+            """Отвечает текстом метрик или 404."""
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            """Не пишет обращения к метрикам в журнал."""
+
+    return MetricsHandler
+
+
+def start_metrics_server(host, port, registry=REGISTRY):
+    """Запускает HTTP-сервер метрик в фоновом потоке."""
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer((host, port), create_handler(registry))
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name='metrics', daemon=True
+    ).start()
+    return server
@@ -0,0 +1,239 @@
+import logging
+import threading
+import time
+from functools import partial
+
+from metrics import REGISTRY
+
+logger = logging.getLogger('bot.outbox')
+
+FLUSH_ERROR = 'Не удалось записать журнал исходящих: {error}'
+REPLAYED = 'Из журнала исходящих повторно поставлено уведомлений: {count}'
+
+OUTBOX_COMMITS = REGISTRY.counter(
+    'outbox_commits_total', 'Групповые фиксации журнала исходящих'
+)
+OUTBOX_PENDING = REGISTRY.gauge(
+    'outbox_unacked', 'Уведомления, ещё не подтверждённые отправкой'
+)
+
+
+class Outbox:
+    """Журнал исходящих уведомлений с записью до отправки.
+
+    Новые статусы сначала фиксируются в базе вместе с уведомлениями
+    и курсором подписки и только потом попадают в очередь отправки.
+    Изменения от всех опросов за `interval` секунд фиксируются одной
+    транзакцией; отправленные уведомления удаляются из журнала тоже
+    пачкой. Поэтому после сбоя уведомление не теряется, а повторно
+    может уйти только то, что было отправлено в последние `interval`
+    секунд перед сбоем. Неподтверждённые уведомления снова ставятся
+    в очередь при запуске (`replay`) и через `retry_after` секунд
+    после неудачной отправки. База может быть общей для нескольких
+    воркеров и экземпляров, поэтому повторно ставятся только
+    уведомления подписок из `keys`, для которых `owns(ключ)` истинно.
+    """
+
+    def __init__(self, store, queue, interval=0.05, retry_after=300,
+                 keys=None, owns=None, clock=time.monotonic):
+        """Сохраняет хранилище, очередь отправки и период фиксации."""
+        self.store = store
+        self.queue = queue
+        self.keys = keys
+        self.owns = owns
+        self.interval = interval
+        self.retry_after = retry_after
+        self.clock = clock
+        self.entries = []
+        self.hooks = []
+        self.cursors = {}
+        self.acks = []
+        self.inflight = set()
+        self.failed = {}
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.thread = None
+
+    def add(self, subscription, transitions, current_date=None,
+            on_commit=None):
+        """Добавляет изменения подписки в следующую групповую фиксацию.
+
+        `current_date` — новый курсор подписки; None оставляет курсор
+        прежним. После фиксации `on_commit` получает те из
+        `transitions`, которые действительно записаны в базу.
+        """
+        with self.condition:
+            self.entries.extend(
+                (subscription.key, name, status, subscription.chat_id, text)
+                for name, status, text in transitions
+            )
+            if on_commit is not None and transitions:
+                self.hooks.append((subscription.key, transitions, on_commit))
+            if current_date is not None:
+                self.cursors[subscription.key] = current_date
+            self.condition.notify()
+
+    def ack(self, ids):
+        """Отмечает уведомления отправленными."""
+        with self.condition:
+            self.acks.extend(ids)
+            for id in ids:
+                self.inflight.discard(id)
+                self.failed.pop(id, None)
+
+    def fail(self, id):
+        """Отмечает, что уведомление отправить не удалось."""
+        with self.condition:
+            if id in self.inflight:
+                self.failed[id] = self.clock()
+
+    def enqueue(self, rows, resend=False):
+        """Ставит записи журнала в очередь отправки.
+
+        При `resend` пропускаются записи, подтверждённые, пока их
+        читали из базы, иначе — записи, которые уже в очереди.
+        Возвращает число поставленных записей.
+        """
+        count = 0
+        with self.condition:
+            for id, chat_id, message in rows:
+                if resend != (id in self.inflight):
+                    continue
+                self.inflight.add(id)
+                self.queue.put(
+                    chat_id, [message],
+                    partial(self.ack, [id]), partial(self.fail, id)
+                )
+                count += 1
+        return count
+
+    def flush(self):
+        """Фиксирует накопленные изменения и подтверждения отправки."""
+        with self.condition:
+            entries, self.entries = self.entries, []
+            hooks, self.hooks = self.hooks, []
+            cursors, self.cursors = self.cursors, {}
+            acks, self.acks = self.acks, []
+        if acks:
+            self.store.ack_outbox(acks)
+        if entries or cursors:
+            added = self.store.commit_outbox(entries, cursors)
+            self.enqueue(
+                (id, chat_id, message)
+                for id, _, _, _, chat_id, message in added
+            )
+            OUTBOX_COMMITS.inc()
+            self.run_hooks(hooks, added)
+        OUTBOX_PENDING.set(len(self.inflight))
+
+    @staticmethod
+    def run_hooks(hooks, added):
+        """Передаёт каждому `on_commit` его записанные изменения.
+
+        Изменение, добавленное дважды (опросом и событием), записано
+        один раз и достаётся только первому.
+        """
+        committed = {(key, name, status) for _, key, name, status, _, _
+                     in added}
+        for key, transitions, on_commit in hooks:
+            done = []
+            for transition in transitions:
+                if (key, *transition[:2]) in committed:
+                    committed.discard((key, *transition[:2]))
+                    done.append(transition)
+            if done:
+                on_commit(done)
+
+    def resend_failed(self):
+        """Снова ставит в очередь уведомления, которые не удалось отправить.
+
+        Уведомления, которых уже нет в журнале (их заменил более
+        новый статус работы) или которые теперь отправляет другой
+        экземпляр, больше не ждут подтверждения.
+        """
+        deadline = self.clock() - self.retry_after
+        with self.condition:
+            due = {id for id, failed_at in self.failed.items()
+                   if failed_at <= deadline}
+            for id in due:
+                del self.failed[id]
+        if not due:
+            return
+        rows = [row for row in self.read_all() if row[0] in due]
+        with self.condition:
+            self.inflight.difference_update(
+                due.difference(row[0] for row in rows)
+            )
+        self.enqueue(rows, resend=True)
+
+    def is_own(self, key):
+        """Отправляет ли этот журнал уведомления подписки `key`."""
+        return (self.keys is None or key in self.keys) and (
+            self.owns is None or self.owns(key)
+        )
+
+    def read_all(self, chunk=1000, select=None):
+        """Перебирает свои записи журнала страницами по `chunk` записей.
+
+        Записи — (id, чат, текст) по возрастанию id; `select(ключ)`
+        дополнительно отбирает подписки.
+        """
+        after_id = 0
+        while True:
+            rows = self.store.read_outbox(after_id, chunk)
+            if not rows:
+                return
+            for id, key, chat_id, message in rows:
+                if self.is_own(key) and (select is None or select(key)):
+                    yield id, chat_id, message
+            after_id = rows[-1][0]
+
+    def replay(self, chunk=1000, select=None):
+        """Ставит в очередь неподтверждённые уведомления журнала.
+
+        `select(ключ)` ограничивает повтор частью подписок, например
+        только что полученными шардами.
+        """
+        count = 0
+        rows = []
+        for row in self.read_all(chunk, select):
+            rows.append(row)
+            if len(rows) >= chunk:
+                count += self.enqueue(rows)
+                rows = []
+        count += self.enqueue(rows)
+        if count:
+            logger.info(REPLAYED.format(count=count))
+        return count
+
+    def run(self):
+        """Цикл потока групповой фиксации."""
+        while True:
+            with self.condition:
+                if not (self.entries or self.cursors or self.acks):
+                    self.condition.wait(self.interval)
+                stopped = self.stopped
+            try:
+                self.flush()
+                self.resend_failed()
+            except Exception as error:
+                logger.error(FLUSH_ERROR.format(error=error))
+            if stopped:
+                return
+            time.sleep(self.interval)
+
+    def start(self):
+        """Запускает поток групповой фиксации."""
+        self.thread = threading.Thread(
+            target=self.run, name='outbox', daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Фиксирует оставшиеся изменения и останавливает поток."""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
@@ -0,0 +1,89 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+# Сервер всегда возвращает своё текущее время, поэтому при сравнении
+# тел ответов это поле не учитывается.
+CURRENT_DATE = re.compile(rb'"current_date"\s*:\s*(\d+)')
+
+
+class CacheEntry:
+    """Сохранённый ответ API и его валидаторы."""
+
+    __slots__ = ('etag', 'last_modified', 'digest', 'answer')
+
+    def __init__(self, etag, last_modified, digest, answer):
+        """Создаёт запись кеша."""
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.answer = answer
+
+
+def fingerprint(content):
+    """Возвращает хеш тела ответа без поля `current_date` и само поле."""
+    match = CURRENT_DATE.search(content)
+    digest = hashlib.blake2b(digest_size=16)
+    if match is None:
+        digest.update(content)
+        return digest.digest(), None
+    digest.update(content[:match.start()])
+    digest.update(content[match.end():])
+    return digest.digest(), int(match.group(1))
+
+
+class ResponseCache:
+    """LRU-кеш последних ответов API по токену.
+
+    Курсор подписки сдвигается после каждого опроса, поэтому `from_date`
+    в ключ не входит: иначе кеш бы никогда не срабатывал. Если сервер
+    отдаёт `ETag` или `Last-Modified`, кеш подставляет их в условный
+    запрос. Если нет — повторное тело с тем же хешем (например, «нет
+    изменений») не разбирается заново, а берётся из кеша.
+    """
+
+    def __init__(self, max_entries):
+        """Создаёт пустой кеш на `max_entries` записей."""
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Возвращает запись по ключу или None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def validators(self, key):
+        """Заголовки условного запроса для ключа."""
+        entry = self.get(key)
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def store(self, key, response, digest, answer):
+        """Сохраняет разобранный ответ вместе с его валидаторами."""
+        entry = CacheEntry(
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified'),
+            digest,
+            answer,
+        )
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """Очищает кеш."""
+        with self.lock:
+            self.entries.clear()
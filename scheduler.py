@@ -0,0 +1,150 @@
+import heapq
+import itertools
+import random
+import time
+
+REVIEWING = 'reviewing'
+FINAL_STATUSES = ('approved', 'rejected')
+
+
+class PollTimer:
+    """Состояние расписания одной подписки."""
+
+    __slots__ = ('reviewing', 'last_change', 'idle_delay', 'failures')
+
+    def __init__(self, now):
+        """Создаёт таймер подписки, у которой ничего не происходило."""
+        self.reviewing = set()
+        self.last_change = now
+        self.idle_delay = None
+        self.failures = {}
+
+
+class AdaptiveScheduler:
+    """Выбирает момент следующего опроса для каждой подписки.
+
+    Пока хотя бы одна работа на проверке, подписка опрашивается раз
+    в `reviewing_delay`. После `idle_after` секунд без изменений
+    интервал удваивается с каждым опросом до `max_delay`.
+
+    После сбоя интервал берётся из `error_delays` по классу исключения
+    и удваивается с каждым следующим сбоем того же класса. Исключение
+    с атрибутом `retry_after` откладывает опрос не меньше чем на
+    указанное время.
+    Ко всем интервалам добавляется случайный разброс ±`jitter`, чтобы
+    подписки не опрашивались в одну и ту же секунду.
+    """
+
+    def __init__(self, base_delay, reviewing_delay, max_delay, idle_after,
+                 jitter, error_delays=None, clock=time.monotonic,
+                 random=random.random):
+        """Сохраняет параметры расписания и источники времени."""
+        self.base_delay = base_delay
+        self.error_delays = error_delays or {}
+        self.reviewing_delay = reviewing_delay
+        self.max_delay = max_delay
+        self.idle_after = idle_after
+        self.jitter = jitter
+        self.clock = clock
+        self.random = random
+        self.timers = {}
+        self.queue = []
+        self.counter = itertools.count()
+
+    def timer(self, subscription):
+        """Возвращает таймер подписки, создавая его при первом обращении."""
+        if subscription not in self.timers:
+            self.timers[subscription] = PollTimer(self.clock())
+        return self.timers[subscription]
+
+    def spread(self, delay):
+        """Добавляет к интервалу случайный разброс."""
+        return delay * (1 + self.jitter * (2 * self.random() - 1))
+
+    def backoff(self, timer, error):
+        """Экспоненциальный интервал после сбоя данного класса."""
+        for error_class, delay in self.error_delays.items():
+            if isinstance(error, error_class):
+                break
+        else:
+            error_class, delay = type(error), self.base_delay
+        count = timer.failures.get(error_class, 0) + 1
+        timer.failures[error_class] = count
+        return min(delay * 2 ** (count - 1), self.max_delay)
+
+    def next_delay(self, subscription, result):
+        """Вычисляет интервал до следующего опроса по результату текущего.
+
+        `result` — список изменений `(название, статус, текст)` или
+        исключение, которым завершился опрос.
+        """
+        timer = self.timer(subscription)
+        now = self.clock()
+        if isinstance(result, Exception):
+            delay = self.spread(self.backoff(timer, result))
+            retry_after = getattr(result, 'retry_after', None)
+            if retry_after is None:
+                return delay
+            return max(delay, retry_after * (1 + self.jitter * self.random()))
+        timer.failures.clear()
+        if result:
+            timer.last_change = now
+            timer.idle_delay = None
+            for name, status, _ in result:
+                if status == REVIEWING:
+                    timer.reviewing.add(name)
+                elif status in FINAL_STATUSES:
+                    timer.reviewing.discard(name)
+        if timer.reviewing:
+            delay = self.reviewing_delay
+        elif now - timer.last_change >= self.idle_after:
+            timer.idle_delay = min(
+                2 * (timer.idle_delay or self.base_delay), self.max_delay
+            )
+            delay = timer.idle_delay
+        else:
+            delay = self.base_delay
+        return self.spread(delay)
+
+    def add(self, subscription, delay=0):
+        """Ставит опрос подписки в очередь через `delay` секунд."""
+        heapq.heappush(
+            self.queue,
+            (self.clock() + delay, next(self.counter), subscription)
+        )
+
+    def reschedule(self, subscription, result):
+        """Ставит следующий опрос подписки по результату текущего."""
+        self.add(subscription, self.next_delay(subscription, result))
+
+    def pop_due(self):
+        """Забирает из очереди все подписки, которые пора опросить."""
+        now = self.clock()
+        due = []
+        while self.queue and self.queue[0][0] <= now:
+            due.append(heapq.heappop(self.queue)[2])
+        return due
+
+    def seconds_until_next(self):
+        """Сколько секунд ждать до ближайшего опроса."""
+        if not self.queue:
+            return self.base_delay
+        return max(self.queue[0][0] - self.clock(), 0)
+
+
+def parse_retry_after(value):
+    """Переводит заголовок `Retry-After` в секунды ожидания."""
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    # Дата в заголовке встречается редко, а `email` импортируется долго.
+    from email.utils import parsedate_to_datetime
+
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(moment.timestamp() - time.time(), 0)
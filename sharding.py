@@ -0,0 +1,69 @@
+import bisect
+import hashlib
+
+DEFAULT_REPLICAS = 100
+
+
+def ring_hash(value):
+    """Позиция строки на кольце: 64-битное число из её хеша."""
+    digest = hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class HashRing:
+    """Консистентное хеширование ключей подписок по узлам.
+
+    Каждый узел занимает на кольце `replicas` точек, а ключ достаётся
+    узлу с ближайшей точкой по часовой стрелке. При добавлении или
+    удалении узла переезжает только доля ключей этого узла.
+    """
+
+    def __init__(self, nodes=(), replicas=DEFAULT_REPLICAS):
+        """Создаёт кольцо с узлами `nodes`."""
+        self.replicas = replicas
+        self.nodes = set()
+        self.points = []
+        self.owners = []
+        for node in nodes:
+            self.add(node)
+
+    def rebuild(self, points):
+        """Пересобирает отсортированные точки кольца."""
+        points.sort()
+        self.points = [point for point, _ in points]
+        self.owners = [node for _, node in points]
+
+    def add(self, node):
+        """Добавляет узел на кольцо."""
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        self.rebuild(list(zip(self.points, self.owners)) + [
+            (ring_hash(f'{node}#{replica}'), node)
+            for replica in range(self.replicas)
+        ])
+
+    def remove(self, node):
+        """Убирает узел с кольца."""
+        self.nodes.discard(node)
+        self.rebuild([
+            (point, owner)
+            for point, owner in zip(self.points, self.owners)
+            if owner != node
+        ])
+
+    def node_for(self, key):
+        """Узел, которому принадлежит ключ, или None для пустого кольца."""
+        if not self.points:
+            return None
+        index = bisect.bisect(self.points, ring_hash(key))
+        return self.owners[index % len(self.points)]
+
+    def assign(self, subscriptions):
+        """Раскладывает подписки по узлам: {узел: [подписки]}."""
+        shards = {node: [] for node in self.nodes}
+        for subscription in subscriptions:
+            node = self.node_for(subscription.key)
+            if node is not None:
+                shards[node].append(subscription)
+        return shards
@@ -0,0 +1,253 @@
+import sqlite3
+import threading
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS statuses (
+    subscription TEXT NOT NULL,
+    homework_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (subscription, homework_name)
+);
+CREATE TABLE IF NOT EXISTS cursors (
+    subscription TEXT PRIMARY KEY,
+    from_date INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    -- AUTOINCREMENT: id удалённой записи не достаётся новой.
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    subscription TEXT NOT NULL,
+    homework_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    message TEXT NOT NULL,
+    UNIQUE (subscription, homework_name, status)
+);
+CREATE TABLE IF NOT EXISTS event_times (
+    subscription TEXT NOT NULL,
+    homework_name TEXT NOT NULL,
+    updated INTEGER NOT NULL,
+    PRIMARY KEY (subscription, homework_name)
+);
+CREATE TABLE IF NOT EXISTS file_offsets (
+    reader TEXT NOT NULL,
+    path TEXT NOT NULL,
+    inode INTEGER NOT NULL,
+    "offset" INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    PRIMARY KEY (reader, path)
+);
+'''
+# Не больше параметров в одном запросе, чем разрешает SQLite.
+QUERY_CHUNK = 500
+
+
+class StateStore:
+    """Хранит последние отправленные статусы и курсор `current_date`.
+
+    Данные лежат в SQLite, поэтому после перезапуска бот продолжает
+    опрос с сохранённого курсора и не повторяет уже отправленные
+    статусы.
+    """
+
+    def __init__(self, path):
+        """Открывает (и при необходимости создаёт) базу по пути `path`."""
+        self.connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def get_cursor(self, subscription, default):
+        """Возвращает курсор подписки или `default`, если его ещё нет."""
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT from_date FROM cursors WHERE subscription = ?',
+                (subscription,)
+            ).fetchone()
+        return default if row is None else row[0]
+
+    def set_cursor(self, subscription, current_date):
+        """Сохраняет курсор подписки."""
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO cursors VALUES (?, ?)',
+                (subscription, current_date)
+            )
+
+    def get_status(self, subscription, homework_name):
+        """Возвращает последний отправленный статус работы или None."""
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT status FROM statuses '
+                'WHERE subscription = ? AND homework_name = ?',
+                (subscription, homework_name)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def set_status(self, subscription, homework_name, status):
+        """Запоминает отправленный статус работы."""
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO statuses VALUES (?, ?, ?)',
+                (subscription, homework_name, status)
+            )
+
+    def get_statuses(self, subscription, homework_names):
+        """Возвращает словарь сохранённых статусов для списка работ."""
+        statuses = {}
+        with self.lock:
+            for start in range(0, len(homework_names), QUERY_CHUNK):
+                chunk = homework_names[start:start + QUERY_CHUNK]
+                statuses.update(self.connection.execute(
+                    'SELECT homework_name, status FROM statuses '
+                    'WHERE subscription = ? AND homework_name IN ({})'.format(
+                        ', '.join('?' * len(chunk))
+                    ),
+                    (subscription, *chunk)
+                ))
+        return statuses
+
+    def save(self, subscription, statuses, current_date):
+        """Одной транзакцией сохраняет статусы работ и курсор подписки.
+
+        При `current_date` None курсор остаётся прежним.
+        """
+        with self.lock, self.connection:
+            self.connection.execute('BEGIN')
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO statuses VALUES (?, ?, ?)',
+                [(subscription, name, status) for name, status in statuses]
+            )
+            if current_date is not None:
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO cursors VALUES (?, ?)',
+                    (subscription, current_date)
+                )
+
+    def commit_outbox(self, entries, cursors):
+        """Одной транзакцией пишет уведомления в журнал исходящих.
+
+        `entries` — кортежи (подписка, работа, статус, чат, текст);
+        вместе с ними сохраняются статусы работ и курсоры `cursors`
+        ({подписка: from_date}). Изменение, которое уже сохранено или
+        ожидает отправки, повторно не добавляется: ключ идемпотентности
+        — (подписка, работа, статус). Неотправленные уведомления о
+        прежних статусах работы удаляются: они уже устарели.
+        Возвращает новые записи [(id, подписка, работа, статус, чат,
+        текст)].
+        """
+        added = []
+        with self.lock, self.connection:
+            self.connection.execute('BEGIN')
+            for subscription, name, status, chat_id, message in entries:
+                row = self.connection.execute(
+                    'SELECT status FROM statuses '
+                    'WHERE subscription = ? AND homework_name = ?',
+                    (subscription, name)
+                ).fetchone()
+                if row is not None and row[0] == status:
+                    continue
+                self.connection.execute(
+                    'DELETE FROM outbox WHERE subscription = ? '
+                    'AND homework_name = ? AND status != ?',
+                    (subscription, name, status)
+                )
+                cursor = self.connection.execute(
+                    'INSERT OR IGNORE INTO outbox (subscription, '
+                    'homework_name, status, chat_id, message) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (subscription, name, status, chat_id, message)
+                )
+                if cursor.rowcount:
+                    added.append((
+                        cursor.lastrowid, subscription, name, status,
+                        chat_id, message
+                    ))
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO statuses VALUES (?, ?, ?)',
+                    (subscription, name, status)
+                )
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO cursors VALUES (?, ?)',
+                cursors.items()
+            )
+        return added
+
+    def ack_outbox(self, ids):
+        """Удаляет отправленные уведомления из журнала."""
+        ids = list(ids)
+        with self.lock, self.connection:
+            self.connection.execute('BEGIN')
+            for start in range(0, len(ids), QUERY_CHUNK):
+                chunk = ids[start:start + QUERY_CHUNK]
+                self.connection.execute(
+                    'DELETE FROM outbox WHERE id IN ({})'.format(
+                        ', '.join('?' * len(chunk))
+                    ),
+                    chunk
+                )
+
+    def read_outbox(self, after_id, limit):
+        """Неотправленные уведомления с id больше `after_id` по порядку.
+
+        Возвращает [(id, подписка, чат, текст)].
+        """
+        with self.lock:
+            return self.connection.execute(
+                'SELECT id, subscription, chat_id, message FROM outbox '
+                'WHERE id > ? ORDER BY id LIMIT ?',
+                (after_id, limit)
+            ).fetchall()
+
+    def record_event_times(self, subscription, times):
+        """Запоминает время изменения работ из события.
+
+        `times` — {работа: unix time}. Возвращает множество работ, для
+        которых не было сохранено более позднего времени; для них
+        время сохраняется, остальные изменения устарели.
+        """
+        fresh = set()
+        names = list(times)
+        with self.lock, self.connection:
+            self.connection.execute('BEGIN')
+            known = {}
+            for start in range(0, len(names), QUERY_CHUNK):
+                chunk = names[start:start + QUERY_CHUNK]
+                known.update(self.connection.execute(
+                    'SELECT homework_name, updated FROM event_times '
+                    'WHERE subscription = ? AND homework_name IN ({})'.format(
+                        ', '.join('?' * len(chunk))
+                    ),
+                    (subscription, *chunk)
+                ))
+            for name, updated in times.items():
+                if known.get(name, updated) <= updated:
+                    fresh.add(name)
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO event_times VALUES (?, ?, ?)',
+                [(subscription, name, times[name]) for name in fresh]
+            )
+        return fresh
+
+    def get_file_offset(self, reader, path):
+        """Позиция чтения файла событий: (inode, смещение, строка) или None."""
+        with self.lock:
+            return self.connection.execute(
+                'SELECT inode, "offset", line FROM file_offsets '
+                'WHERE reader = ? AND path = ?',
+                (reader, path)
+            ).fetchone()
+
+    def set_file_offset(self, reader, path, inode, offset, line):
+        """Сохраняет позицию чтения файла событий."""
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO file_offsets VALUES (?, ?, ?, ?, ?)',
+                (reader, path, inode, offset, line)
+            )
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,76 @@
+import hashlib
+import json
+from dataclasses import dataclass
+
+NOT_A_LIST = 'Файл подписок {path} должен содержать JSON-список'
+NO_SUBSCRIPTIONS = 'В файле подписок {path} нет ни одной подписки'
+BAD_SUBSCRIPTION = (
+    'Подписка №{index} в файле {path} не содержит ключ {key}'
+)
+DUPLICATE_SUBSCRIPTION = (
+    'Подписка №{index} в файле {path} повторяет ключ {key}: '
+    'задайте подпискам с одним токеном разные `name`'
+)
+
+
+@dataclass(frozen=True)
+class Subscription:
+    """Пара «токен Практикума — чат Telegram», за которой следит бот.
+
+    `locale` — язык сообщений в чате; пустая строка означает язык
+    по умолчанию.
+    """
+
+    token: str
+    chat_id: str
+    name: str = ''
+    locale: str = ''
+
+    @property
+    def token_key(self):
+        """Идентификатор токена: общий у подписок с одним токеном."""
+        return hashlib.sha1(self.token.encode('utf-8')).hexdigest()[:12]
+
+    @property
+    def key(self):
+        """Стабильный идентификатор подписки, не раскрывающий токен."""
+        if self.name:
+            return self.name
+        return self.token_key
+
+
+def load_subscriptions(path):
+    """Загружает список подписок из JSON-файла.
+
+    Файл содержит список объектов с ключами `token`, `chat_id`
+    и необязательными `name` и `locale`. Ключи подписок (`key`) не
+    должны повторяться: по ключу хранятся курсор и отправленные
+    статусы, и подписки с одним ключом делили бы их.
+    """
+    with open(path, encoding='utf-8') as file:
+        entries = json.load(file)
+    if not isinstance(entries, list):
+        raise ValueError(NOT_A_LIST.format(path=path))
+    if not entries:
+        raise ValueError(NO_SUBSCRIPTIONS.format(path=path))
+    subscriptions = []
+    keys = set()
+    for index, entry in enumerate(entries, start=1):
+        for key in ('token', 'chat_id'):
+            if key not in entry:
+                raise KeyError(
+                    BAD_SUBSCRIPTION.format(index=index, path=path, key=key)
+                )
+        subscription = Subscription(
+            token=entry['token'],
+            chat_id=str(entry['chat_id']),
+            name=entry.get('name', ''),
+            locale=entry.get('locale', ''),
+        )
+        if subscription.key in keys:
+            raise ValueError(DUPLICATE_SUBSCRIPTION.format(
+                index=index, path=path, key=subscription.key
+            ))
+        keys.add(subscription.key)
+        subscriptions.append(subscription)
+    return subscriptions
@@ -0,0 +1,141 @@
+import logging
+import multiprocessing
+import time
+from collections import deque
+
+from metrics import REGISTRY
+from sharding import HashRing
+
+logger = logging.getLogger('bot.supervisor')
+
+WORKER_STARTED = 'Воркер {node} запущен, подписок: {count}'
+WORKER_EXITED = 'Воркер {node} завершился с кодом {code}'
+WORKER_RETIRED = (
+    'Воркер {node} падает слишком часто, его подписки переданы '
+    'остальным воркерам'
+)
+NO_WORKERS = 'Не осталось ни одного работающего воркера'
+
+WORKER_RESTARTS = REGISTRY.counter(
+    'supervisor_worker_restarts_total', 'Перезапуски упавших воркеров'
+)
+WORKERS_ALIVE = REGISTRY.gauge(
+    'supervisor_workers', 'Воркеры, которые сейчас опрашивают подписки'
+)
+
+
+class Supervisor:
+    """Распределяет подписки по процессам-воркерам и следит за ними.
+
+    Подписки раскладываются по воркерам консистентным хешированием.
+    Упавший воркер перезапускается с тем же шардом. Если он падает
+    `max_restarts` раз за `restart_window` секунд, его узел убирается
+    с кольца, а перезапускаются только воркеры, получившие его
+    подписки.
+    """
+
+    def __init__(self, subscriptions, workers, target, spawn=None,
+                 max_restarts=5, restart_window=60, clock=time.monotonic):
+        """Сохраняет подписки и функцию воркера `target(node, shard)`."""
+        self.subscriptions = subscriptions
+        self.target = target
+        self.spawn = spawn or self.spawn_process
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.clock = clock
+        self.ring = HashRing(range(workers))
+        self.shards = self.ring.assign(subscriptions)
+        self.processes = {}
+        self.exits = {}
+
+    def spawn_process(self, node, shard):
+        """Создаёт процесс воркера.
+
+        Процесс запускается методом `spawn`: воркер импортирует бота
+        заново и не наследует потоки и соединения супервизора.
+        """
+        return multiprocessing.get_context('spawn').Process(
+            target=self.target, args=(node, shard),
+            name=f'worker-{node}', daemon=True,
+        )
+
+    def start(self, node):
+        """Запускает воркер узла, если у него есть подписки."""
+        shard = self.shards.get(node)
+        if not shard:
+            return
+        process = self.spawn(node, shard)
+        process.start()
+        self.processes[node] = process
+        logger.info(WORKER_STARTED.format(node=node, count=len(shard)))
+
+    def stop(self, node):
+        """Останавливает воркер узла."""
+        process = self.processes.pop(node, None)
+        if process is not None:
+            process.terminate()
+            process.join()
+
+    def start_all(self):
+        """Запускает воркеры всех узлов."""
+        for node in sorted(self.ring.nodes):
+            self.start(node)
+        WORKERS_ALIVE.set(len(self.processes))
+
+    def stop_all(self):
+        """Останавливает все воркеры."""
+        for node in list(self.processes):
+            self.stop(node)
+        WORKERS_ALIVE.set(0)
+
+    def crashed_too_often(self, node):
+        """Запоминает падение и решает, пора ли убрать узел с кольца."""
+        now = self.clock()
+        exits = self.exits.setdefault(node, deque())
+        exits.append(now)
+        while exits and now - exits[0] > self.restart_window:
+            exits.popleft()
+        return len(exits) >= self.max_restarts
+
+    def retire(self, node):
+        """Убирает узел с кольца и перезапускает воркеры с новыми шардами."""
+        logger.error(WORKER_RETIRED.format(node=node))
+        self.ring.remove(node)
+        if not self.ring.nodes:
+            raise RuntimeError(NO_WORKERS)
+        shards = self.ring.assign(self.subscriptions)
+        changed = [
+            other for other in sorted(shards)
+            if shards[other] != self.shards.get(other)
+        ]
+        self.shards = shards
+        for other in changed:
+            self.stop(other)
+            self.start(other)
+
+    def check(self):
+        """Перезапускает завершившиеся воркеры."""
+        for node, process in list(self.processes.items()):
+            # Воркер мог быть перезапущен при перебалансировке выше.
+            if self.processes.get(node) is not process or process.is_alive():
+                continue
+            del self.processes[node]
+            logger.warning(
+                WORKER_EXITED.format(node=node, code=process.exitcode)
+            )
+            WORKER_RESTARTS.inc()
+            if self.crashed_too_often(node):
+                self.retire(node)
+            else:
+                self.start(node)
+        WORKERS_ALIVE.set(len(self.processes))
+
+    def run(self, interval=1):
+        """Запускает воркеры и следит за ними до остановки процесса."""
+        self.start_all()
+        try:
+            while True:
+                time.sleep(interval)
+                self.check()
+        finally:
+            self.stop_all()
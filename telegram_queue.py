@@ -0,0 +1,230 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import REGISTRY
+
+logger = logging.getLogger('bot.telegram_queue')
+
+SEND_ERROR = 'Боту не удалось отправить сообщение. Ошибка: {error}'
+FLOOD_WAIT = (
+    'Telegram просит подождать {retry_after} с '
+    'перед отправкой в чат {chat_id}'
+)
+
+SEND_RETRIES = REGISTRY.counter(
+    'telegram_send_retries_total', 'Повторы отправки после ответа 429'
+)
+
+
+class TokenBucket:
+    """Ограничитель частоты: `rate` действий в секунду, запас `capacity`."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'clock')
+
+    def __init__(self, rate, capacity, clock):
+        """Создаёт полную корзину."""
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def refill(self):
+        """Пополняет корзину за прошедшее время."""
+        now = self.clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def wait_time(self):
+        """Сколько секунд ждать до появления токена."""
+        self.refill()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        """Забирает один токен."""
+        self.tokens -= 1
+
+    def pause(self, seconds):
+        """Не выдаёт токены ближайшие `seconds` секунд."""
+        self.refill()
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class ChatBatch:
+    """Сообщения, ожидающие отправки в один чат."""
+
+    __slots__ = ('messages', 'callbacks', 'errbacks')
+
+    def __init__(self):
+        """Создаёт пустую пачку."""
+        self.messages = []
+        self.callbacks = []
+        self.errbacks = []
+
+
+class OutboundQueue:
+    """Очередь исходящих сообщений с отдельным потоком-отправителем.
+
+    Частота отправки ограничена общей корзиной на `global_rate`
+    сообщений в секунду и корзиной каждого чата на `chat_rate`.
+    Сообщения, накопившиеся для одного чата, уходят одним сообщением
+    (через `combine`). На ответ 429 отправитель откладывает этот чат на
+    `retry_after` секунд и возвращает пачку в начало очереди. После
+    успешной отправки вызываются колбэки `on_sent`, переданные в
+    `put`, а если пачку отправить не удалось — колбэки `on_failed`.
+    """
+
+    def __init__(self, send, combine, global_rate, chat_rate,
+                 clock=time.monotonic):
+        """Сохраняет функцию отправки `send(message, chat_id)` и лимиты."""
+        self.send = send
+        self.combine = combine
+        self.chat_rate = chat_rate
+        self.clock = clock
+        self.global_bucket = TokenBucket(global_rate, global_rate, clock)
+        self.chat_buckets = {}
+        self.pending = OrderedDict()
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.thread = None
+
+    def put(self, chat_id, messages, on_sent=None, on_failed=None):
+        """Ставит сообщения в очередь чата, не дожидаясь отправки.
+
+        Повтор уже ожидающего сообщения не добавляется. Если сообщений
+        нет, `on_sent` вызывается сразу.
+        """
+        if not messages:
+            if on_sent is not None:
+                on_sent()
+            return
+        with self.condition:
+            batch = self.pending.get(chat_id)
+            if batch is None:
+                batch = self.pending[chat_id] = ChatBatch()
+            for message in messages:
+                if message not in batch.messages:
+                    batch.messages.append(message)
+            if on_sent is not None:
+                batch.callbacks.append(on_sent)
+            if on_failed is not None:
+                batch.errbacks.append(on_failed)
+            self.condition.notify()
+
+    def depth(self):
+        """Число чатов, ожидающих отправки."""
+        with self.condition:
+            return len(self.pending)
+
+    def chat_bucket(self, chat_id):
+        """Возвращает корзину чата, создавая её при первом обращении."""
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, 1, self.clock)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def take(self):
+        """Забирает пачку, которую можно отправить прямо сейчас.
+
+        Возвращает `(chat_id, batch)` или `(None, wait)`, где `wait` —
+        время до появления готовой пачки (None, если очередь пуста).
+        """
+        wait = self.global_bucket.wait_time()
+        if wait or not self.pending:
+            return None, wait if self.pending else None
+        for chat_id in self.pending:
+            bucket = self.chat_bucket(chat_id)
+            chat_wait = bucket.wait_time()
+            if chat_wait == 0:
+                bucket.consume()
+                self.global_bucket.consume()
+                return chat_id, self.pending.pop(chat_id)
+            wait = chat_wait if not wait else min(wait, chat_wait)
+        return None, wait
+
+    def requeue(self, chat_id, batch):
+        """Возвращает пачку в начало очереди, дополнив новыми сообщениями."""
+        newer = self.pending.pop(chat_id, None)
+        if newer is not None:
+            batch.messages.extend(
+                message for message in newer.messages
+                if message not in batch.messages
+            )
+            batch.callbacks.extend(newer.callbacks)
+            batch.errbacks.extend(newer.errbacks)
+        self.pending[chat_id] = batch
+        self.pending.move_to_end(chat_id, last=False)
+
+    def deliver(self, chat_id, batch):
+        """Отправляет пачку одним сообщением и вызывает колбэки."""
+        try:
+            for message in self.combine(batch.messages):
+                self.send(message, chat_id)
+        except Exception as error:
+            retry_after = getattr(error, 'retry_after', None)
+            if retry_after is None:
+                logger.error(SEND_ERROR.format(error=error))
+                self.run_callbacks(batch.errbacks)
+                return
+            logger.warning(
+                FLOOD_WAIT.format(retry_after=retry_after, chat_id=chat_id)
+            )
+            SEND_RETRIES.inc()
+            with self.condition:
+                self.chat_bucket(chat_id).pause(retry_after)
+                self.requeue(chat_id, batch)
+            return
+        self.run_callbacks(batch.callbacks)
+
+    def run_callbacks(self, callbacks):
+        """Вызывает колбэки пачки; ошибка одного не мешает остальным."""
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as error:
+                logger.exception(error)
+
+    def deliver_ready(self):
+        """Отправляет все пачки, для которых сейчас не превышены лимиты."""
+        while True:
+            with self.condition:
+                chat_id, batch = self.take()
+            if chat_id is None:
+                return batch
+            self.deliver(chat_id, batch)
+
+    def run(self):
+        """Цикл потока-отправителя."""
+        while True:
+            with self.condition:
+                while not self.stopped:
+                    chat_id, batch = self.take()
+                    if chat_id is not None:
+                        break
+                    self.condition.wait(batch)
+                else:
+                    return
+            self.deliver(chat_id, batch)
+
+    def start(self):
+        """Запускает поток-отправитель."""
+        self.thread = threading.Thread(
+            target=self.run, name='telegram-sender', daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает поток-отправитель."""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
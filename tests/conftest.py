@@ -1,9 +1,64 @@
+import itertools
 import sys
+import threading
 from os.path import abspath, dirname
 
+import pytest
+
 root_dir = dirname(dirname(abspath(__file__)))
 sys.path.append(root_dir)
 
 pytest_plugins = [
     'tests.fixtures.fixture_data'
 ]
+
+
+@pytest.fixture
+def local_api(request, monkeypatch):
+    """Локальный API Практикума с обработчиком из параметра фикстуры.
+
+    Обработчик передаётся через `indirect`-параметризацию. Фикстура
+    возвращает его подкласс, поэтому состояние, которое обработчик и
+    тест записывают в атрибуты класса, не переходит между тестами.
+    """
+    from http.server import ThreadingHTTPServer
+
+    import bot
+    import http_client
+
+    handler = type(request.param.__name__, (request.param,), {})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(
+        bot, 'ENDPOINT', f'http://127.0.0.1:{server.server_port}/'
+    )
+    bot.response_cache.clear()
+    http_client.close_session()
+    yield handler
+    http_client.close_session()
+    bot.response_cache.clear()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def create_queue():
+    """Фабрика очередей исходящих без ограничений частоты.
+
+    Отправленные сообщения складываются в `sent` парами
+    (chat_id, message); `send` заменяет отправку целиком.
+    """
+    import bot
+    from telegram_queue import OutboundQueue
+
+    def create(sent=None, send=None):
+        def collect(message, chat_id):
+            if sent is not None:
+                sent.append((chat_id, message))
+
+        return OutboundQueue(
+            send or collect, bot.combine_messages, 1000, 1000,
+            clock=itertools.count().__next__
+        )
+
+    return create
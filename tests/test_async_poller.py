@@ -0,0 +1,105 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bot
+from async_poller import AsyncPoller
+from fairness import FairLimiter
+from state_store import StateStore
+from subscriptions import Subscription
+
+
+class TestAsyncPoller:
+
+    def test_concurrency_is_bounded(self, monkeypatch, create_queue):
+        lock = threading.Lock()
+        in_flight = [0, 0]
+
+        def slow_answer(timestamp, token):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            return {
+                'homeworks': [{'homework_name': token, 'status': 'approved'}],
+                'current_date': timestamp + 1,
+            }
+
+        sent = []
+        monkeypatch.setattr(bot, 'get_api_answer', slow_answer)
+        queue = create_queue(sent)
+        subscriptions = [
+            Subscription(token=f'OAuth {index}', chat_id=str(index))
+            for index in range(20)
+        ]
+        store = StateStore(':memory:')
+        poller = AsyncPoller(queue, subscriptions, store, None, 3)
+
+        async def poll_all():
+            poller.limiter = FairLimiter(poller.concurrency)
+            poller.executor = ThreadPoolExecutor(poller.concurrency)
+            await asyncio.gather(*(
+                poller.poll_subscription(subscription)
+                for subscription in subscriptions
+            ))
+
+        for subscription in subscriptions:
+            store.set_cursor(subscription.key, 100)
+        asyncio.run(poll_all())
+        queue.deliver_ready()
+        timestamps = [store.get_cursor(s.key, None) for s in subscriptions]
+
+        assert in_flight[1] <= 3, (
+            'Убедитесь, что одновременно выполняется не больше '
+            '`concurrency` запросов'
+        )
+        assert timestamps == [101] * 20, (
+            'Проверьте, что каждая подписка получает свою метку времени'
+        )
+        assert sorted(chat_id for chat_id, _ in sent) == sorted(
+            s.chat_id for s in subscriptions
+        ), (
+            'Проверьте, что сообщение уходит в чат своей подписки'
+        )
+
+    def test_store_error_is_poll_failure(self, monkeypatch, create_queue):
+        monkeypatch.setattr(
+            bot, 'get_api_answer',
+            lambda timestamp, token: {
+                'homeworks': [], 'current_date': timestamp + 1
+            }
+        )
+        subscriptions = [
+            Subscription(token='first', chat_id='1'),
+            Subscription(token='second', chat_id='2'),
+        ]
+        store = StateStore(':memory:')
+        get_cursor = store.get_cursor
+
+        def locked_cursor(key, default):
+            if key == subscriptions[0].key:
+                raise sqlite3.OperationalError('database is locked')
+            return get_cursor(key, default)
+
+        monkeypatch.setattr(store, 'get_cursor', locked_cursor)
+        poller = AsyncPoller(create_queue(), subscriptions, store, None, 2)
+
+        async def poll_all():
+            poller.limiter = FairLimiter(poller.concurrency)
+            poller.executor = ThreadPoolExecutor(poller.concurrency)
+            return await asyncio.gather(*(
+                poller.poll_subscription(subscription)
+                for subscription in subscriptions
+            ))
+
+        results = asyncio.run(poll_all())
+
+        assert isinstance(results[0], sqlite3.OperationalError), (
+            'Сбой хранилища должен возвращаться как результат опроса, '
+            'а не завершать общий `gather`'
+        )
+        assert results[1] == []
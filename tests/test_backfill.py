@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+
+import bot
+from backfill import Backfill
+from state_store import StateStore
+from subscriptions import Subscription
+
+SINCE = 1633046400
+
+
+def answer(status, current_date=SINCE + 100):
+    return {
+        'homeworks': [{'homework_name': 'hw', 'status': status}],
+        'current_date': current_date,
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return StateStore(str(tmp_path / 'state.sqlite3'))
+
+
+class TestBackfill:
+
+    def test_concurrency_is_bounded(self):
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def fetch(since, token):
+            with lock:
+                running.append(token)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.remove(token)
+            return answer('approved')
+
+        subscriptions = [
+            Subscription(token=f'token{index}', chat_id='1')
+            for index in range(20)
+        ]
+        results = Backfill(fetch, lambda subscription, answer: 1, 4).run(
+            subscriptions, SINCE
+        )
+        assert list(results.values()) == [1] * 20
+        assert 1 < max(peak) <= 4, (
+            'Одновременно должно выполняться не больше concurrency запросов'
+        )
+
+    def test_retries(self):
+        attempts = []
+        delays = []
+
+        def fetch(since, token):
+            attempts.append(since)
+            if len(attempts) < 3:
+                raise bot.ServerError('Сбой API')
+            return answer('approved')
+
+        backfill = Backfill(
+            fetch, lambda subscription, answer: 1, 1,
+            retry_on=(bot.ServerError,), sleep=delays.append
+        )
+        subscription = Subscription(token='token', chat_id='1')
+        assert backfill.run([subscription], SINCE) == {subscription: 1}
+        assert delays == [1, 2]
+        backfill.retries = 0
+        attempts.clear()
+        result = backfill.run([subscription], SINCE)[subscription]
+        assert isinstance(result, bot.ServerError)
+
+    def test_history_is_not_sent(self, monkeypatch, store, create_queue):
+        subscription = Subscription(token='token', chat_id='1')
+        store.set_cursor(subscription.key, SINCE + 1000)
+        Backfill(
+            lambda since, token: answer('approved'),
+            lambda subscription, answer: bot.seed_state(
+                store, subscription, answer
+            ),
+            2,
+        ).run([subscription], SINCE)
+        assert store.get_status(subscription.key, 'hw') == 'approved'
+        assert store.get_cursor(subscription.key, None) == SINCE + 1000, (
+            'Загрузка истории не должна отодвигать курсор назад'
+        )
+        monkeypatch.setattr(
+            bot, 'get_api_answer',
+            lambda timestamp, token: answer('approved', timestamp)
+        )
+        sent = []
+        queue = create_queue(sent)
+        bot.poll_cycle(queue, [subscription], store)
+        queue.deliver_ready()
+        assert sent == [], 'О загруженных статусах не нужно уведомлять'
+
+    def test_command(self, monkeypatch, tmp_path):
+        subscriptions = [
+            Subscription(token=f'token{index}', chat_id='1')
+            for index in range(3)
+        ]
+        requested = []
+
+        def get_api_answer(timestamp, token):
+            requested.append(timestamp)
+            return answer('reviewing')
+
+        monkeypatch.setattr(bot, 'get_api_answer', get_api_answer)
+        monkeypatch.setattr(bot, 'get_subscriptions', lambda: subscriptions)
+        monkeypatch.setattr(bot, 'configure_logging', lambda suffix: None)
+        path = str(tmp_path / 'state.sqlite3')
+        monkeypatch.setattr(bot, 'STATE_DB', path)
+        assert bot.main(['backfill', '--since', '2021-10-01']) == 0
+        assert requested == [SINCE] * 3
+        store = StateStore(path)
+        assert [
+            store.get_status(subscription.key, 'hw')
+            for subscription in subscriptions
+        ] == ['reviewing'] * 3
@@ -176,7 +176,7 @@ class TestHomework:
         monkeypatch.setattr(telegram, "Bot", mock_telegram_bot)
 
         import homework
-        utils.check_function(homework, 'send_message', 2)
+        utils.check_function(homework, 'send_message', 3)
 
     def test_get_api_answers(self, monkeypatch, random_timestamp,
                              current_timestamp, api_url):
@@ -191,7 +191,7 @@ class TestHomework:
         import homework
 
         func_name = 'get_api_answer'
-        utils.check_function(homework, func_name, 1)
+        utils.check_function(homework, func_name, 2)
 
         result = homework.get_api_answer(current_timestamp)
         assert type(result) == dict, (
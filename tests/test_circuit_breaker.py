@@ -0,0 +1,174 @@
+import json
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+import bot
+from circuit_breaker import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker,
+                             CircuitOpenError)
+from state_store import StateStore
+from subscriptions import Subscription
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail():
+    raise ConnectionError('API недоступен')
+
+
+def succeed():
+    return 'ok'
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(3, 60, (ConnectionError,), clock=clock)
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_threshold(self, breaker):
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                breaker.call(fail)
+
+        assert breaker.state == OPEN, (
+            'Проверьте, что после серии сбоев предохранитель открывается'
+        )
+        with pytest.raises(CircuitOpenError) as error:
+            breaker.call(succeed)
+        assert error.value.retry_after == 60
+
+    def test_success_resets_failures(self, breaker):
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                breaker.call(fail)
+        breaker.call(succeed)
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                breaker.call(fail)
+
+        assert breaker.state == CLOSED, (
+            'Убедитесь, что считаются только сбои подряд'
+        )
+
+    def test_half_open_allows_single_probe(self, breaker, clock):
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                breaker.call(fail)
+        clock.now = 61
+
+        assert breaker.allow(), (
+            'Проверьте, что после таймаута пропускается пробный запрос'
+        )
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow(), (
+            'Убедитесь, что в половинчатом состоянии пробный запрос один'
+        )
+        breaker.record_success()
+        assert breaker.state == CLOSED
+
+    def test_failed_probe_reopens(self, breaker, clock):
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                breaker.call(fail)
+        clock.now = 61
+
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+
+        assert breaker.state == OPEN, (
+            'Проверьте, что неудачный пробный запрос снова открывает '
+            'предохранитель'
+        )
+        assert breaker.retry_after() == 60
+
+    def test_other_errors_are_not_failures(self, breaker):
+        def broken():
+            raise KeyError('homeworks')
+
+        for _ in range(5):
+            with pytest.raises(KeyError):
+                breaker.call(broken)
+
+        assert breaker.state == CLOSED
+
+
+class TokenApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    down = False
+
+    def do_GET(self):
+        if type(self).down:
+            status, body = 500, {'message': 'Internal Server Error'}
+        elif self.headers['Authorization'].startswith('OAuth bad'):
+            status, body = 401, {'code': 'not_authenticated'}
+        else:
+            status, body = 200, {'homeworks': [], 'current_date': 1}
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def token_api(local_api, monkeypatch):
+    monkeypatch.setattr(bot, 'circuit_breaker', CircuitBreaker(
+        3, 60, bot.circuit_breaker.failures
+    ))
+    return local_api
+
+
+@pytest.mark.parametrize('local_api', [TokenApiHandler], indirect=True)
+class TestApiCircuitBreaker:
+
+    def poll(self, queue, tokens):
+        subscriptions = [
+            Subscription(token=token, chat_id=str(index))
+            for index, token in enumerate(tokens)
+        ]
+        return list(bot.poll_cycle(
+            queue, subscriptions, StateStore(':memory:')
+        ).values())
+
+    def test_bad_tokens_do_not_open(self, token_api, create_queue):
+        tokens = [f'OAuth bad{index}' for index in range(5)] + ['OAuth good']
+        results = self.poll(create_queue(), tokens)
+
+        assert all(
+            isinstance(result, bot.ServerError) for result in results[:5]
+        )
+        assert results[5] == [], (
+            'Неверные токены одних подписок не должны останавливать опрос '
+            'остальных'
+        )
+        assert bot.circuit_breaker.state == CLOSED
+
+    def test_server_errors_open(self, token_api, create_queue):
+        token_api.down = True
+        results = self.poll(
+            create_queue(), [f'OAuth good{index}' for index in range(4)]
+        )
+
+        assert all(
+            isinstance(result, bot.UnavailableError) for result in results[:3]
+        )
+        assert isinstance(results[3], CircuitOpenError), (
+            'Проверьте, что ответы 5xx открывают общий предохранитель'
+        )
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+import bot
+from decoding import DECODERS, get_decoder
+
+BODY = json.dumps({
+    'homeworks': [
+        {'homework_name': 'Проект 2', 'status': 'reviewing'},
+        {'homework_name': 'Проект 1', 'status': 'approved'},
+        {'homework_name': 'Проект 2', 'status': 'rejected'},
+    ],
+    'current_date': 1000,
+}, ensure_ascii=False).encode('utf-8')
+
+
+class TestDecoding:
+
+    @pytest.mark.parametrize('name', sorted(DECODERS))
+    def test_decoders_read_raw_bytes(self, name):
+        assert get_decoder(name)(BODY) == json.loads(BODY)
+
+    def test_auto_prefers_orjson(self):
+        expected = DECODERS.get('orjson', DECODERS['json'])
+        assert get_decoder('auto') is expected
+
+    def test_unknown_decoder(self):
+        with pytest.raises(ValueError):
+            get_decoder('yaml')
+
+    @pytest.mark.parametrize('name', sorted(DECODERS))
+    def test_invalid_body_raises_value_error(self, name):
+        with pytest.raises(ValueError):
+            get_decoder(name)(b'{"homeworks": [')
+
+
+class TestParseHomeworks:
+
+    def test_single_pass_keeps_latest_record(self):
+        records = bot.parse_homeworks(json.loads(BODY))
+        assert list(records) == [
+            {'homework_name': 'Проект 2', 'status': 'reviewing'},
+            {'homework_name': 'Проект 1', 'status': 'approved'},
+        ], 'Для повторяющейся работы должна остаться первая запись'
+
+    def test_records_are_kept_in_answer(self):
+        answer = bot.ApiAnswer(json.loads(BODY))
+        records = bot.parse_homeworks(answer)
+        assert answer['homeworks'] is records, (
+            'Проверенный ответ должен хранить работы в компактном виде'
+        )
+        assert bot.parse_homeworks(answer) is records, (
+            'Ответ из кеша не должен проверяться повторно'
+        )
+        assert bot.check_response(answer) == {
+            'homework_name': 'Проект 2', 'status': 'reviewing'
+        }
+
+    @pytest.mark.parametrize('answer, error', [
+        ([], TypeError),
+        ({}, KeyError),
+        ({'homeworks': {}}, TypeError),
+        ({'homeworks': [{'homework_name': 'hw'}]}, KeyError),
+        ({'homeworks': [{'status': 'approved'}]}, KeyError),
+        ({'homeworks': [{'homework_name': 'hw', 'status': 'x'}]}, ValueError),
+    ])
+    def test_invalid_answers(self, answer, error):
+        with pytest.raises(error):
+            bot.parse_homeworks(answer)
@@ -0,0 +1,69 @@
+from error_throttle import ErrorThrottle, fingerprint
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestErrorThrottle:
+
+    def test_repeats_are_suppressed(self):
+        clock = FakeClock()
+        throttle = ErrorThrottle(ttl=3600, summary_interval=600, clock=clock)
+
+        counts = []
+        for minute in range(0, 25, 5):
+            clock.now = minute * 60
+            counts.append(throttle.observe(
+                'student', ConnectionError(f'timeout at {clock.now}')
+            ))
+
+        assert counts == [1, None, 3, None, 5], (
+            'Убедитесь, что о повторах ошибки приходит только '
+            'периодическая сводка'
+        )
+
+    def test_new_error_is_reported(self):
+        throttle = ErrorThrottle(ttl=3600, summary_interval=600,
+                                 clock=FakeClock())
+
+        assert throttle.observe('student', ConnectionError('down')) == 1
+        assert throttle.observe('student', KeyError('homeworks')) == 1, (
+            'Проверьте, что ошибка другого класса отправляется сразу'
+        )
+        assert throttle.observe('other', ConnectionError('down')) == 1
+
+    def test_fingerprint_expires(self):
+        clock = FakeClock()
+        throttle = ErrorThrottle(ttl=3600, summary_interval=600, clock=clock)
+
+        throttle.observe('student', ConnectionError('down'))
+        clock.now = 3601
+
+        assert throttle.observe('student', ConnectionError('down')) == 1, (
+            'Проверьте, что отпечаток забывается через `ttl`'
+        )
+
+    def test_single_recovery_notice(self):
+        throttle = ErrorThrottle(ttl=3600, summary_interval=600,
+                                 clock=FakeClock())
+        throttle.observe('student', ConnectionError('down'))
+        throttle.observe('student', ConnectionError('down'))
+
+        assert throttle.recover('student') == 2, (
+            'Проверьте, что после восстановления приходит сводка сбоев'
+        )
+        assert throttle.recover('student') == 0, (
+            'Убедитесь, что сообщение о восстановлении отправляется один раз'
+        )
+
+    def test_fingerprint_ignores_numbers(self):
+        assert (
+            fingerprint(ValueError('code 500 at 1633024800'))
+            == fingerprint(ValueError('code 502 at 1633025400'))
+        )
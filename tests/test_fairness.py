@@ -0,0 +1,170 @@
+import asyncio
+
+import pytest
+
+import bot
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from fairness import BudgetExceededError, FairLimiter, RequestBudget
+from state_store import StateStore
+from subscriptions import Subscription
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRequestBudget:
+
+    def test_limit(self):
+        clock = FakeClock()
+        budget = RequestBudget(2, 60, clock)
+        budget.check('a')
+        budget.check('a')
+        with pytest.raises(BudgetExceededError) as error:
+            budget.check('a')
+        assert error.value.retry_after == pytest.approx(30), (
+            'Бюджет должен пополняться равномерно за окно'
+        )
+        budget.check('b')
+        clock.now = 30
+        budget.check('a')
+
+
+class TestFairLimiter:
+
+    def test_free_slot_is_granted_at_once(self):
+        async def run():
+            limiter = FairLimiter(2)
+            await limiter.acquire('a')
+            await limiter.acquire('a')
+            return limiter.free
+
+        assert asyncio.run(run()) == 0, (
+            'Пока есть свободные слоты, запрос не должен ждать'
+        )
+
+    def test_slow_key_waits_behind_fast(self):
+        async def run():
+            limiter = FairLimiter(1, slow_after=100)
+            limiter.costs['slow'] = 30
+            order = []
+
+            async def request(key):
+                await limiter.acquire(key)
+                order.append(key)
+                await asyncio.sleep(0)
+                limiter.release(key, False)
+
+            await limiter.acquire('other')
+            tasks = [
+                asyncio.ensure_future(request(key))
+                for key in ['slow', 'slow', 'fast', 'fast', 'fast']
+            ]
+            await asyncio.sleep(0)
+            limiter.release('other', False)
+            await asyncio.gather(*tasks)
+            return order
+
+        assert asyncio.run(run()) == [
+            'slow', 'fast', 'fast', 'fast', 'slow'
+        ], 'Второй запрос медленной подписки должен пропустить быстрые'
+
+    def test_slow_lane_is_capped(self):
+        async def run():
+            limiter = FairLimiter(4, slow_after=5, slow_share=0.25)
+            for key in ['x', 'y']:
+                limiter.costs[key] = 10
+            assert await limiter.acquire('x')
+            waiting = asyncio.ensure_future(limiter.acquire('y'))
+            await asyncio.sleep(0)
+            assert not waiting.done(), (
+                'Медленные подписки должны занимать не больше своей доли'
+            )
+            assert not await limiter.acquire('fast')
+            limiter.release('x', True)
+            assert await waiting
+            return limiter.free
+
+        assert asyncio.run(run()) == 2
+
+    def test_cancelled_request_releases_slot(self):
+        async def run():
+            limiter = FairLimiter(1)
+            await limiter.acquire('a')
+            waiting = asyncio.ensure_future(limiter.acquire('b'))
+            await asyncio.sleep(0)
+            waiting.cancel()
+            await asyncio.sleep(0)
+            limiter.release('a', False)
+            return limiter.free
+
+        assert asyncio.run(run()) == 1, (
+            'Отменённый запрос не должен занимать слот'
+        )
+
+    def test_cost_follows_duration(self):
+        async def run():
+            clock = FakeClock()
+            limiter = FairLimiter(1, clock=clock)
+
+            async def call():
+                clock.now += 8
+                return 'ok'
+
+            assert await limiter.run('a', call) == 'ok'
+            return limiter
+
+        limiter = asyncio.run(run())
+        assert limiter.cost('a') == 8
+        assert limiter.is_slow('a') and limiter.free == 1
+
+
+class TestBudgetInPoll:
+
+    def poll(self, queue, subscriptions):
+        return list(bot.poll_cycle(
+            queue, subscriptions, StateStore(':memory:')
+        ).values())
+
+    @pytest.fixture
+    def api(self, monkeypatch):
+        requests = []
+        monkeypatch.setattr(
+            bot, 'get_api_answer',
+            lambda timestamp, token: requests.append(token) or {
+                'homeworks': [], 'current_date': timestamp
+            }
+        )
+        monkeypatch.setattr(bot, 'budget', RequestBudget(1, 3600))
+        monkeypatch.setattr(bot, 'circuit_breaker', CircuitBreaker(
+            1, 60, bot.circuit_breaker.failures
+        ))
+        return requests
+
+    def test_open_circuit_keeps_budget(self, api, create_queue):
+        bot.circuit_breaker.record_failure()
+        subscription = Subscription(token='OAuth token', chat_id='1')
+        assert isinstance(
+            self.poll(create_queue(), [subscription])[0], CircuitOpenError
+        )
+        bot.circuit_breaker.record_success()
+        assert self.poll(create_queue(), [subscription]) == [[]], (
+            'Пока предохранитель открыт, бюджет не должен тратиться'
+        )
+        assert api == ['OAuth token']
+
+    def test_budget_is_per_token(self, api, create_queue):
+        results = self.poll(create_queue(), [
+            Subscription(token='OAuth token', chat_id='1', name='first'),
+            Subscription(token='OAuth token', chat_id='2', name='second'),
+        ])
+        assert results[0] == []
+        assert isinstance(results[1], BudgetExceededError), (
+            'Подписки с одним токеном должны делить один бюджет'
+        )
+        assert len(api) == 1
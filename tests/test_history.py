@@ -0,0 +1,109 @@
+
+import pytest
+
+import bot
+from history import EventLog, bucket_bound, bucket_of
+from outbox import Outbox
+from state_store import StateStore
+from subscriptions import Subscription
+
+DAY = 24 * 60 * 60
+# 1 октября 2021 года, UTC.
+OCTOBER = 1633046400
+
+
+@pytest.fixture
+def log(tmp_path):
+    log = EventLog(str(tmp_path / 'history.sqlite3'))
+    yield log
+    log.close()
+
+
+def review(log, key, name, started, seconds, verdict='approved'):
+    log.append(key, [(name, 'reviewing', started, None)])
+    log.append(key, [(name, verdict, started + seconds, 'Комментарий')])
+
+
+class TestEventLog:
+
+    @pytest.mark.parametrize('seconds', [1, 59, 3600, 3 * DAY, 40 * DAY])
+    def test_bucket_error(self, seconds):
+        bound = bucket_bound(bucket_of(seconds))
+        assert seconds <= bound <= seconds * 1.05 + 1, (
+            'Граница корзины должна отличаться от времени не больше чем на 5%'
+        )
+
+    def test_turnaround_percentiles(self, log):
+        for index in range(100):
+            review(log, f'student{index}', 'hw1', OCTOBER, (index + 1) * 60)
+        stats = log.turnaround('hw1')
+        assert stats['count'] == 100
+        for key, expected in (('p50', 3000), ('p90', 5400), ('p99', 5940)):
+            assert expected <= stats[key] <= expected * 1.05, key
+        assert log.turnaround('hw2') == {
+            'count': 0, 'p50': None, 'p90': None, 'p99': None
+        }
+
+    def test_turnaround_by_homework_and_period(self, log):
+        review(log, 'student', 'hw1', OCTOBER, DAY)
+        review(log, 'student', 'hw2', OCTOBER + 31 * DAY, 2 * DAY, 'rejected')
+        by_homework = log.turnaround_by('homework_name', quantiles=(0.5,))
+        assert set(by_homework) == {'hw1', 'hw2'}
+        assert by_homework['hw1']['count'] == 1
+        assert set(log.turnaround_by('period')) == {'2021-10', '2021-11'}
+        assert log.turnaround(period='2021-11')['count'] == 1
+        with pytest.raises(ValueError):
+            log.turnaround_by('subscription')
+
+    def test_repeated_reviewing_keeps_start(self, log):
+        log.append('student', [('hw1', 'reviewing', OCTOBER, None)])
+        log.append('student', [('hw1', 'reviewing', OCTOBER + DAY, None)])
+        log.append('student', [('hw1', 'approved', OCTOBER + 2 * DAY, None)])
+        log.append('student', [('hw1', 'approved', OCTOBER + 3 * DAY, None)])
+        stats = log.turnaround('hw1', quantiles=(0.5,))
+        assert stats['count'] == 1, 'Одна проверка должна учитываться один раз'
+        assert 2 * DAY <= stats['p50'] <= 2 * DAY * 1.05
+
+    @pytest.mark.parametrize('with_outbox', [False, True])
+    def test_poll_records_history_once(
+        self, log, monkeypatch, tmp_path, with_outbox, create_queue
+    ):
+        monkeypatch.setattr(bot, 'history', log)
+        monkeypatch.setattr(
+            bot, 'get_api_answer',
+            lambda timestamp, token: bot.ApiAnswer({
+                'homeworks': [{
+                    'homework_name': 'hw1', 'status': 'approved',
+                    'reviewer_comment': 'Всё нравится',
+                }],
+                'current_date': OCTOBER,
+            })
+        )
+        down = [True]
+
+        def send(message, chat_id):
+            if down[0]:
+                raise ConnectionError('Telegram недоступен')
+
+        queue = create_queue(send=send)
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        outbox = Outbox(store, queue) if with_outbox else None
+        monkeypatch.setattr(bot, 'outbox', outbox)
+        subscription = Subscription(token='OAuth token', chat_id='1')
+        for _ in range(3):
+            bot.poll_cycle(queue, [subscription], store)
+            if with_outbox:
+                outbox.flush()
+            queue.deliver_ready()
+        down[0] = False
+        bot.poll_cycle(queue, [subscription], store)
+        if with_outbox:
+            outbox.flush()
+        queue.deliver_ready()
+        rows = log.connection.execute(
+            'SELECT subscription, homework_name, status, "current_date", '
+            'comment FROM events'
+        ).fetchall()
+        assert rows == [
+            (subscription.key, 'hw1', 1, OCTOBER, 'Всё нравится')
+        ], 'Изменение должно попадать в журнал один раз, когда сохранено'
@@ -0,0 +1,29 @@
+import sys
+
+from homework_state import STATUS_CODES, HomeworkStates, Status
+
+
+class TestHomeworkStates:
+
+    def test_codes_match_api_statuses(self):
+        assert set(STATUS_CODES) == {'approved', 'reviewing', 'rejected'}
+        assert STATUS_CODES['reviewing'] is Status.REVIEWING
+
+    def test_compact_storage(self):
+        name = ''.join(['student__hw01', '.zip'])
+        states = HomeworkStates(
+            [name, 'student__hw02.zip'],
+            [Status.APPROVED, Status.REJECTED]
+        )
+        assert len(states) == 2
+        assert states.names[0] is sys.intern(name), (
+            'Названия работ должны интернироваться'
+        )
+        assert isinstance(states.codes, bytes)
+        assert list(states.items()) == [
+            ('student__hw01.zip', Status.APPROVED),
+            ('student__hw02.zip', Status.REJECTED),
+        ]
+        assert states[1] == {
+            'homework_name': 'student__hw02.zip', 'status': 'rejected'
+        }
@@ -0,0 +1,49 @@
+import json
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+import bot
+import http_client
+
+
+class CountingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_GET(self):
+        body = json.dumps({'homeworks': [], 'current_date': 1}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHttpClient:
+
+    @pytest.mark.parametrize('local_api', [CountingHandler], indirect=True)
+    def test_connection_is_reused(self, local_api):
+        for timestamp in range(5):
+            answer = bot.get_api_answer(timestamp, 'OAuth token')
+            assert answer['current_date'] == 1
+
+        assert local_api.connections == 1, (
+            'Убедитесь, что запросы к API переиспользуют одно соединение'
+        )
+
+    def test_session_is_shared(self):
+        http_client.close_session()
+        try:
+            assert http_client.get_session(2) is http_client.get_session(2), (
+                'Убедитесь, что сессия создаётся один раз на процесс'
+            )
+        finally:
+            http_client.close_session()
@@ -0,0 +1,190 @@
+import json
+from functools import partial
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+import bot
+from ingestion import FileFollower, start_ingest_server
+from leases import NotOwnedError
+from outbox import Outbox
+from state_store import StateStore
+from subscriptions import Subscription
+
+SUBSCRIPTION = Subscription(token='OAuth token', chat_id='1', name='student')
+
+
+def event(status, key='student', updated=None):
+    homework = {'homework_name': 'hw', 'status': status}
+    if updated is not None:
+        homework['date_updated'] = updated
+    return {'subscription': key, 'homeworks': [homework]}
+
+
+@pytest.fixture
+def pipeline(tmp_path, create_queue):
+    sent = []
+    queue = create_queue(sent)
+    store = StateStore(str(tmp_path / 'state.sqlite3'))
+    store.set_cursor(SUBSCRIPTION.key, 100)
+    sink = partial(bot.ingest, queue, {SUBSCRIPTION.key: SUBSCRIPTION}, store)
+    return sink, queue, store, sent
+
+
+@pytest.fixture
+def server(pipeline):
+    sink = pipeline[0]
+    server = start_ingest_server(
+        '127.0.0.1', 0, sink, 'secret', (NotOwnedError,)
+    )
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, data, secret='secret'):
+    request = Request(
+        f'{url}/events', data=json.dumps(data).encode(),
+        headers={'X-Ingest-Secret': secret}, method='POST'
+    )
+    with urlopen(request) as response:
+        return json.loads(response.read())
+
+
+class ForeignShards:
+
+    def check(self, key):
+        raise NotOwnedError(f'Подписку {key} ведёт другой экземпляр', 30)
+
+
+class TestIngestion:
+
+    def test_event_goes_through_pipeline(self, pipeline, server):
+        _, queue, store, sent = pipeline
+        assert post(server, event('reviewing')) == {'transitions': 1}
+        queue.deliver_ready()
+        assert sent == [('1', bot.renderer.status_message('hw', 'reviewing'))]
+        assert post(server, event('reviewing')) == {'transitions': 0}, (
+            'Повторное событие не должно отправлять сообщение снова'
+        )
+        assert store.get_cursor(SUBSCRIPTION.key, None) == 100, (
+            'Событие не должно сдвигать курсор опроса'
+        )
+
+    @pytest.mark.parametrize('with_outbox', [False, True])
+    def test_event_keeps_newer_cursor(
+        self, monkeypatch, pipeline, with_outbox
+    ):
+        sink, queue, store, sent = pipeline
+        outbox = Outbox(store, queue) if with_outbox else None
+        monkeypatch.setattr(bot, 'outbox', outbox)
+        if with_outbox:
+            outbox.add(SUBSCRIPTION, [], 200)
+            sink(event('reviewing'))
+            outbox.flush()
+        else:
+            sink(event('reviewing'))
+            store.set_cursor(SUBSCRIPTION.key, 200)
+        queue.deliver_ready()
+        assert len(sent) == 1
+        assert store.get_cursor(SUBSCRIPTION.key, None) == 200, (
+            'Событие не должно возвращать курсор, сдвинутый опросом'
+        )
+
+    def test_secret_is_required(self, server):
+        with pytest.raises(HTTPError) as error:
+            post(server, event('approved'), secret='wrong')
+        assert error.value.code == 403
+
+    @pytest.mark.parametrize('data', [
+        [], event('approved', key='other'), event('unknown'),
+    ])
+    def test_bad_event(self, server, data):
+        with pytest.raises(HTTPError) as error:
+            post(server, data)
+        assert error.value.code == 400
+
+    def test_file_follower(self, pipeline, tmp_path):
+        sink, queue, _, sent = pipeline
+        path = tmp_path / 'events.jsonl'
+        follower = FileFollower(str(path), partial(sink, strict=False))
+        follower.poll()
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps(event('approved', key='other')) + '\n')
+            file.write(json.dumps(event('reviewing')) + '\n')
+            file.write(json.dumps(event('approved'))[:10])
+        follower.poll()
+        queue.deliver_ready()
+        assert len(sent) == 1, 'Недописанная строка не должна читаться'
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(event('approved'))[10:] + '\n')
+        follower.poll()
+        queue.deliver_ready()
+        assert [message for _, message in sent] == [
+            bot.renderer.status_message('hw', 'reviewing'),
+            bot.renderer.status_message('hw', 'approved'),
+        ]
+
+    def test_file_follower_resumes(self, pipeline, tmp_path):
+        sink, queue, store, sent = pipeline
+        path = tmp_path / 'events.jsonl'
+        path.write_text(
+            json.dumps(event('reviewing')) + '\n', encoding='utf-8'
+        )
+        FileFollower(
+            str(path), partial(sink, strict=False), store=store
+        ).poll()
+        queue.deliver_ready()
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(event('approved')) + '\n')
+        # Повторно прочитанная первая строка дала бы новое сообщение.
+        store.set_status(SUBSCRIPTION.key, 'hw', 'rejected')
+
+        FileFollower(
+            str(path), partial(sink, strict=False), store=store
+        ).poll()
+        queue.deliver_ready()
+        assert [message for _, message in sent] == [
+            bot.renderer.status_message('hw', 'reviewing'),
+            bot.renderer.status_message('hw', 'approved'),
+        ], 'После перезапуска файл должен читаться с сохранённого места'
+
+    def test_stale_event_is_dropped(self, pipeline):
+        sink, queue, store, sent = pipeline
+        assert len(sink(event('approved', updated='2024-05-02T10:00:00Z')))
+        queue.deliver_ready()
+        older = event('reviewing', updated='2024-05-01T10:00:00Z')
+        assert sink(older) == [], (
+            'Событие старше уже полученного не должно отправлять сообщение'
+        )
+        queue.deliver_ready()
+        assert len(sent) == 1
+        assert store.get_status(SUBSCRIPTION.key, 'hw') == 'approved', (
+            'Устаревшее событие не должно откатывать статус'
+        )
+
+    def test_event_before_cursor_is_dropped(self, pipeline):
+        sink, queue, _, sent = pipeline
+        stale = {**event('reviewing'), 'current_date': 50}
+        assert sink(stale) == [], (
+            'Событие старше курсора опроса опрос уже учёл'
+        )
+        assert sink({**event('reviewing'), 'current_date': 150})
+
+    def test_foreign_subscription_is_skipped(
+        self, monkeypatch, pipeline, server
+    ):
+        sink, queue, store, sent = pipeline
+        monkeypatch.setattr(bot, 'ownership', ForeignShards())
+        assert sink(event('approved'), strict=False) == [], (
+            'Файл читают все экземпляры: чужие подписки пропускаются'
+        )
+        with pytest.raises(HTTPError) as error:
+            post(server, event('approved'))
+        assert error.value.code == 409, (
+            'HTTP-событие чужой подписки должно отклоняться с кодом 409'
+        )
+        queue.deliver_ready()
+        assert sent == []
+        assert store.get_status(SUBSCRIPTION.key, 'hw') is None
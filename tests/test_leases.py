@@ -0,0 +1,194 @@
+import pytest
+
+import bot
+from leases import NotOwnedError, ShardOwnership, SqliteLeaseStore
+from outbox import Outbox
+from subscriptions import Subscription
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    store = SqliteLeaseStore(str(tmp_path / 'leases.sqlite3'), clock=clock)
+    yield store
+    store.close()
+
+
+def ownership(store, clock, owner):
+    return ShardOwnership(store, owner, 8, 30, 'bot', clock=clock)
+
+
+class TestSqliteLeaseStore:
+
+    def test_lease_is_exclusive_until_expired(self, store, clock):
+        assert store.acquire('bot/0', 'a', 30)
+        assert not store.acquire('bot/0', 'b', 30), (
+            'Чужая действующая аренда не должна перехватываться'
+        )
+        assert store.acquire('bot/0', 'a', 30), 'Владелец продлевает аренду'
+        clock.now += 31
+        assert store.acquire('bot/0', 'b', 30), (
+            'Просроченную аренду должен забрать другой экземпляр'
+        )
+        assert not store.acquire('bot/0', 'a', 30)
+
+    def test_release(self, store):
+        store.acquire('bot/0', 'a', 30)
+        store.release('bot/0', 'b')
+        assert not store.acquire('bot/0', 'b', 30)
+        store.release('bot/0', 'a')
+        assert store.acquire('bot/0', 'b', 30)
+
+
+class TestShardOwnership:
+
+    def test_instances_split_shards(self, store, clock):
+        first = ownership(store, clock, 'a')
+        first.refresh()
+        assert len(first.owned) == 8
+        second = ownership(store, clock, 'b')
+        second.refresh()
+        assert not second.owned, 'Занятые шарды не должны перехватываться'
+        first.refresh()
+        second.refresh()
+        assert len(first.owned) == len(second.owned) == 4, (
+            'Экземпляры должны поделить шарды поровну'
+        )
+        assert not first.owned & second.owned
+
+    def test_takes_over_expired_shards(self, store, clock):
+        first = ownership(store, clock, 'a')
+        second = ownership(store, clock, 'b')
+        first.refresh()
+        second.refresh()
+        first.refresh()
+        second.refresh()
+        clock.now += 31
+        second.refresh()
+        assert len(second.owned) == 8, (
+            'Шарды упавшего экземпляра должны перейти к живому'
+        )
+        assert not first.owns('any'), (
+            'Экземпляр без продлённых аренд не должен опрашивать подписки'
+        )
+
+    def test_stop_releases_shards(self, store, clock):
+        first = ownership(store, clock, 'a')
+        first.refresh()
+        first.stop()
+        second = ownership(store, clock, 'b')
+        second.refresh()
+        assert len(second.owned) == 8
+
+    def test_poll_cycle_skips_foreign_shards(
+        self, monkeypatch, store, clock, tmp_path, create_queue
+    ):
+        subscriptions = [
+            Subscription(token=f'token-{index}', chat_id=str(index))
+            for index in range(20)
+        ]
+        first = ownership(store, clock, 'a')
+        second = ownership(store, clock, 'b')
+        for current in (first, second, first, second):
+            current.refresh()
+        polled = []
+        monkeypatch.setattr(
+            bot, 'get_api_answer',
+            lambda timestamp, token: polled.append(token) or {
+                'homeworks': [], 'current_date': timestamp
+            }
+        )
+        monkeypatch.setattr(bot, 'ownership', first)
+        queue = create_queue()
+        state = bot.StateStore(str(tmp_path / 'state.sqlite3'))
+
+        results = bot.poll_cycle(queue, subscriptions, state)
+
+        owned = [
+            subscription for subscription in subscriptions
+            if first.owns(subscription.key)
+        ]
+        assert 0 < len(owned) < len(subscriptions)
+        assert polled == [subscription.token for subscription in owned]
+        for subscription in subscriptions:
+            if subscription not in owned:
+                assert isinstance(results[subscription], NotOwnedError)
+        assert queue.depth() == 0, (
+            'О пропуске чужих подписок не нужно сообщать пользователю'
+        )
+
+    def test_warns_if_state_is_not_shared(
+        self, monkeypatch, tmp_path, caplog
+    ):
+        monkeypatch.setattr(bot, 'LEASE_DB', str(tmp_path / 'leases.db'))
+        monkeypatch.setattr(bot, 'STATE_DB', str(tmp_path / 'state.db'))
+        monkeypatch.setattr(bot, 'ownership', None)
+        bot.start_ownership()
+        bot.ownership.stop()
+        assert 'STATE_DB' in caplog.text, (
+            'При отдельной базе состояния нужно предупредить, что курсоры '
+            'не переходят вместе с шардами'
+        )
+        caplog.clear()
+        monkeypatch.setattr(bot, 'STATE_DB', bot.LEASE_DB)
+        bot.start_ownership()
+        bot.ownership.stop()
+        assert 'STATE_DB' not in caplog.text
+
+    def test_outbox_replays_only_owned_shards(
+        self, monkeypatch, store, clock, tmp_path, create_queue
+    ):
+        subscriptions = [
+            Subscription(token=f'token-{index}', chat_id=str(index))
+            for index in range(20)
+        ]
+        state = bot.StateStore(str(tmp_path / 'state.sqlite3'))
+        writer = Outbox(state, create_queue())
+        for subscription in subscriptions:
+            writer.add(subscription, [('hw', 'reviewing', 'на проверке')])
+        writer.flush()
+        first = ownership(store, clock, 'a')
+        second = ownership(store, clock, 'b')
+        for current in (first, second, first, second):
+            current.refresh()
+        sent = []
+        queue = create_queue(sent)
+        monkeypatch.setattr(bot, 'OUTBOX', True)
+        monkeypatch.setattr(bot, 'ownership', first)
+        monkeypatch.setattr(bot, 'outbox', None)
+        bot.start_outbox(queue, subscriptions, state)
+        bot.outbox.stop()
+        queue.deliver_ready()
+        owned = {
+            subscription.chat_id for subscription in subscriptions
+            if first.owns(subscription.key)
+        }
+        assert 0 < len(owned) < len(subscriptions)
+        assert sorted(chat_id for chat_id, _ in sent) == sorted(owned), (
+            'При запуске повторяются только уведомления своих шардов'
+        )
+
+        bot.outbox.flush()
+        sent.clear()
+        clock.now += 20
+        first.refresh()
+        clock.now += 11
+        first.refresh()
+        queue.deliver_ready()
+        assert sorted(chat_id for chat_id, _ in sent) == sorted(
+            subscription.chat_id for subscription in subscriptions
+            if subscription.chat_id not in owned
+        ), 'Уведомления полученного шарда должны отправиться при получении'
@@ -0,0 +1,45 @@
+import atexit
+import json
+import logging
+
+from log_config import setup_logging
+
+
+def read_lines(path):
+    return path.read_text(encoding='utf-8').splitlines()
+
+
+class TestLogConfig:
+
+    def test_queued_json_lines(self, tmp_path):
+        logger = logging.getLogger('test.queued')
+        path = tmp_path / 'bot.log'
+        listener = setup_logging(
+            logger, path, queued=True, json_format=True
+        )
+
+        logger.info('Бот отправил сообщение: %s', 'привет')
+        listener.stop()
+        atexit.unregister(listener.stop)
+
+        entry = json.loads(read_lines(path)[0])
+        assert entry['message'] == 'Бот отправил сообщение: привет', (
+            'Проверьте, что запись через очередь попадает в файл'
+        )
+        assert entry['level'] == 'INFO'
+
+    def test_info_sampling(self, tmp_path):
+        logger = logging.getLogger('test.sampled')
+        path = tmp_path / 'bot.log'
+        setup_logging(logger, path, info_sample_rate=10)
+
+        for index in range(30):
+            logger.info('опрос %s', index)
+        logger.error('сбой')
+
+        lines = read_lines(path)
+        assert len(lines) == 4, (
+            'Убедитесь, что частые INFO-записи выбираются, а ошибки '
+            'пишутся всегда'
+        )
+        assert lines[-1].endswith('сбой')
@@ -0,0 +1,61 @@
+import pytest
+
+import bot
+from messages import Renderer, Template
+
+
+@pytest.fixture
+def renderer():
+    return Renderer(bot.MESSAGE_BUNDLES, 'ru', 2)
+
+
+class TestRenderer:
+
+    def test_default_locale_matches_constants(self, renderer):
+        assert renderer.status_message('hw', 'approved') == (
+            bot.NEW_STATUS.format(
+                homework_name='hw', verdict=bot.VERDICTS['approved']
+            )
+        )
+        assert renderer.render('error', '', error='сбой') == (
+            bot.ERROR_MESSAGE.format(error='сбой')
+        )
+
+    def test_locale_bundle(self, renderer):
+        assert renderer.status_message('hw', 'rejected', 'en') == (
+            'Review status of "hw" changed. '
+            'The reviewer has comments on the work.'
+        )
+
+    def test_unknown_locale_falls_back(self, renderer):
+        assert renderer.render('recovered', 'de', count=2) == (
+            bot.RECOVERED.format(count=2)
+        )
+
+    def test_status_messages_are_shared(self, renderer):
+        first = renderer.status_message('hw', 'approved', 'ru')
+        assert renderer.status_message('hw', 'approved') is first, (
+            'Одинаковые сообщения должны браться из кеша'
+        )
+        renderer.status_message('hw', 'reviewing')
+        renderer.status_message('hw', 'rejected')
+        assert len(renderer.cache) == 2, 'Размер кеша должен быть ограничен'
+        assert ('hw', 'approved', 'ru') not in renderer.cache
+
+    def test_template_rejects_format_specs(self):
+        with pytest.raises(ValueError):
+            Template('bad', 'Повтор через {retry_after:.0f} с')
+
+    def test_unknown_default_locale(self):
+        with pytest.raises(ValueError):
+            Renderer(bot.MESSAGE_BUNDLES, 'de', 10)
+
+    def test_subscription_locale(self, monkeypatch, tmp_path):
+        subscription = bot.Subscription(
+            token='OAuth token', chat_id='1', locale='en'
+        )
+        answer = {'homeworks': [{'homework_name': 'hw', 'status': 'approved'}]}
+        store = bot.StateStore(str(tmp_path / 'state.sqlite3'))
+        [(_, _, message)] = bot.find_transitions(subscription, answer, store)
+        assert message == bot.renderer.status_message('hw', 'approved', 'en')
+        assert message.startswith('Review status')
@@ -0,0 +1,59 @@
+from urllib.request import urlopen
+
+import pytest
+
+import bot
+import metrics
+
+
+class TestMetrics:
+
+    def test_counter_render(self):
+        counter = metrics.Counter('errors_total', 'Ошибки', ['error'])
+        counter.inc('KeyError')
+        counter.inc('KeyError')
+
+        assert counter.render() == [
+            '# HELP errors_total Ошибки',
+            '# TYPE errors_total counter',
+            'errors_total{error="KeyError"} 2',
+        ]
+
+    def test_histogram_render(self):
+        histogram = metrics.Histogram(
+            'latency_seconds', 'Задержка', ['outcome'],
+            buckets=(0.1, 1, float('inf'))
+        )
+        histogram.observe(0.05, 'ok')
+        histogram.observe(0.5, 'ok')
+
+        lines = histogram.render()
+
+        assert 'latency_seconds_bucket{outcome="ok",le="0.1"} 1' in lines
+        assert 'latency_seconds_bucket{outcome="ok",le="+Inf"} 2' in lines
+        assert 'latency_seconds_count{outcome="ok"} 2' in lines
+        assert 'latency_seconds_sum{outcome="ok"} 0.55' in lines
+
+    def test_parse_status_errors_are_counted(self):
+        before = bot.PARSE_ERRORS.values.get(('ValueError',), 0)
+
+        with pytest.raises(ValueError):
+            bot.parse_status({'homework_name': 'hw', 'status': 'unknown'})
+
+        assert bot.PARSE_ERRORS.values[('ValueError',)] == before + 1, (
+            'Проверьте, что ошибки parse_status попадают в метрики'
+        )
+
+    def test_metrics_endpoint(self):
+        server = metrics.start_metrics_server('127.0.0.1', 0)
+        try:
+            port = server.server_port
+            with urlopen(f'http://127.0.0.1:{port}/metrics') as response:
+                body = response.read().decode('utf-8')
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert '# TYPE practicum_request_seconds histogram' in body, (
+            'Убедитесь, что метрики бота доступны по адресу /metrics'
+        )
@@ -0,0 +1,173 @@
+import pytest
+
+import bot
+from outbox import Outbox
+from state_store import StateStore
+from subscriptions import Subscription
+
+SUBSCRIPTION = Subscription(token='OAuth token', chat_id='1', name='student')
+TRANSITIONS = [('hw1', 'reviewing', 'hw1 на проверке')]
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingStore(StateStore):
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.commits = 0
+
+    def commit_outbox(self, entries, cursors):
+        self.commits += 1
+        return super().commit_outbox(entries, cursors)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'state.sqlite3')
+
+
+def fail(message, chat_id):
+    raise ConnectionError('Telegram недоступен')
+
+
+class TestOutbox:
+
+    def test_group_commit(self, path, create_queue):
+        sent = []
+        queue = create_queue(sent)
+        store = CountingStore(path)
+        outbox = Outbox(store, queue)
+        other = Subscription(token='other', chat_id='2', name='other')
+        outbox.add(SUBSCRIPTION, TRANSITIONS, 200)
+        outbox.add(other, [('hw2', 'approved', 'hw2 принята')], 300)
+        outbox.flush()
+        assert store.commits == 1, (
+            'Изменения нескольких подписок должны фиксироваться вместе'
+        )
+        assert store.get_status(SUBSCRIPTION.key, 'hw1') == 'reviewing'
+        assert store.get_cursor(other.key, None) == 300
+        queue.deliver_ready()
+        assert sorted(sent) == [('1', 'hw1 на проверке'), ('2', 'hw2 принята')]
+        outbox.flush()
+        assert store.read_outbox(0, 10) == [], (
+            'Отправленные уведомления должны удаляться из журнала'
+        )
+
+    def test_chats_sharing_token(self, path, create_queue, monkeypatch):
+        sent = []
+        queue = create_queue(sent)
+        store = StateStore(path)
+        monkeypatch.setattr(bot, 'outbox', Outbox(store, queue))
+        monkeypatch.setattr(
+            bot, 'get_api_answer',
+            lambda timestamp, token: {
+                'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+                'current_date': timestamp + 1,
+            }
+        )
+        subscriptions = [
+            Subscription(token='OAuth shared', chat_id='1', name='student'),
+            Subscription(token='OAuth shared', chat_id='2', name='mentor'),
+        ]
+        bot.poll_cycle(queue, subscriptions, store)
+        bot.outbox.flush()
+        queue.deliver_ready()
+        assert sorted(chat_id for chat_id, _ in sent) == ['1', '2'], (
+            'Каждый чат с тем же токеном должен получить уведомление'
+        )
+
+    def test_duplicate_is_not_added(self, path, create_queue):
+        queue = create_queue(send=fail)
+        outbox = Outbox(StateStore(path), queue)
+        outbox.add(SUBSCRIPTION, TRANSITIONS)
+        outbox.add(SUBSCRIPTION, TRANSITIONS)
+        outbox.flush()
+        outbox.add(SUBSCRIPTION, TRANSITIONS)
+        outbox.flush()
+        assert len(outbox.store.read_outbox(0, 10)) == 1, (
+            'Одно изменение статуса должно попадать в журнал один раз'
+        )
+
+    def test_replay_after_crash(self, path, create_queue):
+        failed = Outbox(StateStore(path), create_queue(send=fail))
+        failed.add(SUBSCRIPTION, TRANSITIONS, 200)
+        failed.flush()
+        failed.queue.deliver_ready()
+        failed.store.close()
+
+        sent = []
+        store = StateStore(path)
+        outbox = Outbox(store, create_queue(sent))
+        assert outbox.replay(chunk=1) == 1
+        outbox.queue.deliver_ready()
+        outbox.flush()
+        assert sent == [('1', 'hw1 на проверке')]
+        assert store.read_outbox(0, 10) == []
+        assert Outbox(store, create_queue(sent)).replay() == 0, (
+            'Подтверждённое уведомление не должно отправляться повторно'
+        )
+
+    def test_replay_only_own_subscriptions(self, path, create_queue):
+        store = StateStore(path)
+        writer = Outbox(store, create_queue(send=fail))
+        writer.add(SUBSCRIPTION, TRANSITIONS)
+        writer.flush()
+        outbox = Outbox(store, create_queue(), keys={'other'})
+        assert outbox.replay() == 0
+
+    def test_replay_skips_queued(self, path, create_queue):
+        store = StateStore(path)
+        queue = create_queue(send=fail)
+        outbox = Outbox(store, queue, owns=lambda key: key == 'student')
+        outbox.add(SUBSCRIPTION, TRANSITIONS)
+        other = Subscription(token='other', chat_id='2', name='other')
+        outbox.add(other, TRANSITIONS)
+        outbox.flush()
+        assert queue.depth() == 2
+        assert outbox.replay() == 0, (
+            'Уведомление, которое уже в очереди, не должно ставиться снова'
+        )
+        outbox.inflight.clear()
+        assert outbox.replay() == 1, (
+            'Повторяются только уведомления подписок, которыми владеет '
+            'экземпляр'
+        )
+
+    def test_failed_is_resent(self, path, create_queue):
+        clock = FakeClock()
+        queue = create_queue(send=fail)
+        outbox = Outbox(StateStore(path), queue, retry_after=10, clock=clock)
+        outbox.add(SUBSCRIPTION, TRANSITIONS)
+        outbox.flush()
+        clock.now = 20
+        outbox.resend_failed()
+        assert queue.depth() == 1, (
+            'Уведомление в очереди не должно ставиться повторно'
+        )
+        queue.deliver_ready()
+        clock.now = 25
+        outbox.resend_failed()
+        assert queue.depth() == 0
+        clock.now = 30
+        outbox.resend_failed()
+        assert queue.depth() == 1, (
+            'Неотправленное уведомление должно снова встать в очередь'
+        )
+
+    def test_newer_status_replaces_unsent(self, path, create_queue):
+        outbox = Outbox(StateStore(path), create_queue(send=fail))
+        outbox.add(SUBSCRIPTION, TRANSITIONS)
+        outbox.flush()
+        outbox.add(SUBSCRIPTION, [('hw1', 'approved', 'hw1 принята')])
+        outbox.flush()
+        assert outbox.store.read_outbox(0, 10) == [
+            (2, SUBSCRIPTION.key, '1', 'hw1 принята')
+        ], 'Устаревшее уведомление не должно отправляться после нового'
@@ -0,0 +1,104 @@
+import json
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+import bot
+from state_store import StateStore
+from subscriptions import Subscription
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    etag = None
+    current_date = 0
+
+    def do_GET(self):
+        handler = type(self)
+        if handler.etag and self.headers.get('If-None-Match') == handler.etag:
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        handler.current_date += 1
+        body = json.dumps({
+            'homeworks': [{'homework_name': 'hw', 'status': 'reviewing'}],
+            'current_date': handler.current_date,
+        }).encode()
+        self.send_response(200)
+        if handler.etag:
+            self.send_header('ETag', handler.etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def json_calls(monkeypatch):
+    calls = []
+    original = bot.decode
+
+    def counting_decode(content):
+        calls.append(content)
+        return original(content)
+
+    monkeypatch.setattr(bot, 'decode', counting_decode)
+    return calls
+
+
+@pytest.mark.parametrize('local_api', [ApiHandler], indirect=True)
+class TestResponseCache:
+
+    def test_etag_not_modified(self, local_api, json_calls):
+        local_api.etag = '"v1"'
+
+        first = bot.get_api_answer(100, 'OAuth token')
+        second = bot.get_api_answer(100, 'OAuth token')
+
+        assert second is first, (
+            'Проверьте, что при ответе 304 возвращается сохранённый ответ'
+        )
+        assert len(json_calls) == 1, (
+            'Убедитесь, что ответ 304 не разбирается повторно'
+        )
+
+    def test_identical_body_is_not_parsed(self, local_api, json_calls):
+        first = bot.get_api_answer(100, 'OAuth token')
+        second = bot.get_api_answer(100, 'OAuth token')
+
+        assert len(json_calls) == 1, (
+            'Убедитесь, что тело с тем же хешем не разбирается повторно'
+        )
+        assert second['current_date'] == 2, (
+            'Проверьте, что `current_date` берётся из нового ответа'
+        )
+        assert second['homeworks'] == first['homeworks']
+
+    def test_key_is_token(self, local_api, json_calls):
+        bot.get_api_answer(100, 'OAuth token')
+        bot.get_api_answer(200, 'OAuth token')
+        bot.get_api_answer(100, 'OAuth other')
+
+        assert len(json_calls) == 2, (
+            'Проверьте, что ключ кеша — токен, а `from_date` в него не входит'
+        )
+
+    def test_poll_cycle_hits_cache(self, local_api, json_calls, create_queue):
+        subscription = Subscription(token='OAuth token', chat_id='1')
+        store = StateStore(':memory:')
+        store.set_cursor(subscription.key, 100)
+        queue = create_queue()
+        for _ in range(4):
+            bot.poll_cycle(queue, [subscription], store)
+            queue.deliver_ready()
+
+        assert store.get_cursor(subscription.key, None) == 4, (
+            'Курсор должен сдвигаться после каждого опроса'
+        )
+        assert len(json_calls) == 1, (
+            'Убедитесь, что неизменившееся тело не разбирается при каждом '
+            'опросе, хотя `from_date` каждый раз новый'
+        )
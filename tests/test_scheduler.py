@@ -0,0 +1,103 @@
+from scheduler import AdaptiveScheduler, parse_retry_after
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def create_scheduler(clock, jitter=0.0, random=lambda: 0.5):
+    return AdaptiveScheduler(
+        base_delay=600, reviewing_delay=120, max_delay=3600,
+        idle_after=3 * 3600, jitter=jitter, clock=clock, random=random
+    )
+
+
+class TestAdaptiveScheduler:
+
+    def test_reviewing_is_polled_more_often(self):
+        scheduler = create_scheduler(FakeClock())
+
+        delay = scheduler.next_delay('student', [('hw', 'reviewing', '')])
+        assert delay == 120, (
+            'Проверьте, что работа на проверке опрашивается чаще'
+        )
+        delay = scheduler.next_delay('student', [('hw', 'approved', '')])
+        assert delay == 600, (
+            'Проверьте, что после проверки интервал возвращается к базовому'
+        )
+
+    def test_idle_backoff(self):
+        clock = FakeClock()
+        scheduler = create_scheduler(clock)
+        scheduler.timer('student')
+
+        assert scheduler.next_delay('student', []) == 600
+        clock.now = 3 * 3600
+        delays = [scheduler.next_delay('student', []) for _ in range(4)]
+
+        assert delays == [1200, 2400, 3600, 3600], (
+            'Убедитесь, что без изменений интервал растёт до максимума'
+        )
+        assert scheduler.next_delay('student', [('hw', 'approved', '')]) == 600
+
+    def test_retry_after(self):
+        scheduler = create_scheduler(FakeClock())
+        error = Exception()
+        error.retry_after = 1800
+
+        assert scheduler.next_delay('student', error) == 1800, (
+            'Проверьте, что опрос откладывается на время из `Retry-After`'
+        )
+        assert scheduler.next_delay('other', Exception()) == 600
+
+    def test_jitter(self):
+        low = create_scheduler(FakeClock(), jitter=0.1, random=lambda: 0.0)
+        high = create_scheduler(FakeClock(), jitter=0.1, random=lambda: 1.0)
+
+        assert low.next_delay('student', []) == 540
+        assert high.next_delay('student', []) == 660
+
+    def test_queue_order(self):
+        clock = FakeClock()
+        scheduler = create_scheduler(clock)
+        scheduler.add('late', 10)
+        scheduler.add('early', 5)
+
+        assert scheduler.pop_due() == []
+        assert scheduler.seconds_until_next() == 5
+        clock.now = 10
+        assert scheduler.pop_due() == ['early', 'late']
+
+    def test_parse_retry_after(self):
+        assert parse_retry_after('120') == 120
+        assert parse_retry_after(None) is None
+        assert parse_retry_after('nonsense') is None
+        assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+
+    def test_error_backoff_per_class(self):
+        scheduler = AdaptiveScheduler(
+            base_delay=600, reviewing_delay=120, max_delay=3600,
+            idle_after=3 * 3600, jitter=0.0,
+            error_delays={ConnectionError: 30, KeyError: 60},
+            clock=FakeClock(), random=lambda: 0.5
+        )
+
+        delays = [
+            scheduler.next_delay('student', ConnectionError())
+            for _ in range(3)
+        ]
+        assert delays == [30, 60, 120], (
+            'Проверьте, что интервал после сбоев растёт экспоненциально'
+        )
+        assert scheduler.next_delay('student', KeyError()) == 60, (
+            'Убедитесь, что счётчик сбоев ведётся по классу исключения'
+        )
+        scheduler.next_delay('student', [])
+        assert scheduler.next_delay('student', ConnectionError()) == 30, (
+            'Проверьте, что успешный опрос сбрасывает счётчик сбоев'
+        )
@@ -0,0 +1,55 @@
+from sharding import HashRing
+from subscriptions import Subscription
+
+
+def make_subscriptions(size):
+    return [
+        Subscription(token=f'token-{index}', chat_id=str(index))
+        for index in range(size)
+    ]
+
+
+def owners(ring, subscriptions):
+    return {
+        subscription: ring.node_for(subscription.key)
+        for subscription in subscriptions
+    }
+
+
+class TestHashRing:
+
+    def test_assign_covers_every_subscription(self):
+        subscriptions = make_subscriptions(1000)
+        shards = HashRing(range(4)).assign(subscriptions)
+        assert sorted(shards) == [0, 1, 2, 3]
+        assert sum(len(shard) for shard in shards.values()) == 1000
+        assert min(len(shard) for shard in shards.values()) > 150, (
+            'Подписки должны распределяться между узлами примерно поровну'
+        )
+
+    def test_adding_node_moves_only_its_share(self):
+        subscriptions = make_subscriptions(2000)
+        ring = HashRing(range(4))
+        before = owners(ring, subscriptions)
+        ring.add(4)
+        after = owners(ring, subscriptions)
+        moved = [key for key in before if before[key] != after[key]]
+        assert all(after[key] == 4 for key in moved), (
+            'При добавлении узла подписки должны переезжать только на него'
+        )
+        assert len(moved) < 2000 * 0.3
+
+    def test_removing_node_keeps_other_assignments(self):
+        subscriptions = make_subscriptions(1000)
+        ring = HashRing(range(4))
+        before = owners(ring, subscriptions)
+        ring.remove(2)
+        after = owners(ring, subscriptions)
+        for key, node in before.items():
+            if node != 2:
+                assert after[key] == node
+            else:
+                assert after[key] != 2
+
+    def test_empty_ring(self):
+        assert HashRing().node_for('key') is None
@@ -0,0 +1,31 @@
+import json
+import subprocess
+import sys
+from os.path import abspath, dirname
+
+ROOT_DIR = dirname(dirname(abspath(__file__)))
+HEAVY_MODULES = ('telegram', 'requests', 'asyncio', 'dotenv', 'http.server')
+
+
+class TestStartup:
+
+    def test_import_is_lazy(self, tmp_path):
+        code = (
+            'import json, sys; import bot; '
+            f'print(json.dumps([name for name in {HEAVY_MODULES!r} '
+            'if name in sys.modules]))'
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=tmp_path,
+            env={'PYTHONPATH': ROOT_DIR},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert json.loads(result.stdout) == [], (
+            'Импорт `bot` не должен загружать тяжёлые зависимости'
+        )
+        assert list(tmp_path.iterdir()) == [], (
+            'Импорт `bot` не должен создавать файлы журнала'
+        )
@@ -0,0 +1,144 @@
+import sqlite3
+
+import pytest
+
+import bot
+from state_store import StateStore
+from subscriptions import Subscription
+
+
+class LockedStore(StateStore):
+
+    def __init__(self, locked):
+        super().__init__(':memory:')
+        self.locked = locked
+
+    def get_cursor(self, subscription, default):
+        if subscription == self.locked:
+            raise sqlite3.OperationalError('database is locked')
+        return super().get_cursor(subscription, default)
+
+
+def locked_notify(*args):
+    raise sqlite3.OperationalError('database is locked')
+
+
+class TestStateStore:
+
+    def test_only_transitions_are_sent(
+        self, monkeypatch, tmp_path, create_queue
+    ):
+        statuses = iter(['reviewing', 'reviewing', 'approved'])
+        monkeypatch.setattr(
+            bot, 'get_api_answer',
+            lambda timestamp, token: {
+                'homeworks': [
+                    {'homework_name': 'hw', 'status': next(statuses)}
+                ],
+                'current_date': timestamp + 1,
+            }
+        )
+        sent = []
+        queue = create_queue(sent)
+        subscription = Subscription(token='OAuth token', chat_id='1')
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        store.set_cursor(subscription.key, 100)
+
+        for _ in range(3):
+            bot.poll_cycle(queue, [subscription], store)
+            queue.deliver_ready()
+
+        assert len(sent) == 2, (
+            'Убедитесь, что сообщение отправляется только при смене статуса'
+        )
+        assert store.get_cursor(subscription.key, None) == 103
+
+    def test_state_survives_restart(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path)
+        store.set_cursor('student', 12345)
+        store.set_status('student', 'hw', 'reviewing')
+        store.close()
+
+        store = StateStore(path)
+
+        assert store.get_cursor('student', 0) == 12345, (
+            'Проверьте, что курсор восстанавливается после перезапуска'
+        )
+        assert store.get_status('student', 'hw') == 'reviewing'
+        assert store.get_status('student', 'other') is None
+
+    def test_batch_sends_one_message_per_chat(self, monkeypatch, create_queue):
+        monkeypatch.setattr(
+            bot, 'get_api_answer',
+            lambda timestamp, token: {
+                'homeworks': [
+                    {'homework_name': f'{token}-1', 'status': 'approved'},
+                    {'homework_name': f'{token}-2', 'status': 'rejected'},
+                ],
+                'current_date': timestamp + 1,
+            }
+        )
+        sent = []
+        queue = create_queue(sent)
+        subscriptions = [
+            Subscription(token='first', chat_id='1'),
+            Subscription(token='second', chat_id='1'),
+            Subscription(token='third', chat_id='2'),
+        ]
+        store = StateStore(':memory:')
+
+        bot.poll_cycle(queue, subscriptions, store)
+        queue.deliver_ready()
+
+        assert [chat_id for chat_id, _ in sent] == ['1', '2'], (
+            'Убедитесь, что в каждый чат уходит одно сообщение за цикл'
+        )
+        assert all(
+            f'"{token}-{index}"' in sent[0][1]
+            for token in ('first', 'second') for index in (1, 2)
+        ), (
+            'Проверьте, что сообщение содержит все изменившиеся работы'
+        )
+        key = subscriptions[2].key
+        assert store.get_statuses(key, ['third-1', 'third-2']) == {
+            'third-1': 'approved', 'third-2': 'rejected'
+        }
+
+    @pytest.mark.parametrize('stage', ['cursor', 'notify'])
+    def test_store_error_is_poll_failure(
+        self, monkeypatch, create_queue, stage
+    ):
+        monkeypatch.setattr(
+            bot, 'get_api_answer',
+            lambda timestamp, token: {
+                'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+                'current_date': timestamp + 1,
+            }
+        )
+        subscriptions = [
+            Subscription(token='first', chat_id='1'),
+            Subscription(token='second', chat_id='2'),
+        ]
+        store = LockedStore(subscriptions[0].key)
+        if stage == 'notify':
+            store.locked = None
+            monkeypatch.setattr(bot, 'notify_transitions', locked_notify)
+        reported = []
+        monkeypatch.setattr(
+            bot, 'report_error',
+            lambda queue, subscription, error: reported.append(subscription)
+        )
+
+        results = bot.poll_cycle(create_queue(), subscriptions, store)
+
+        assert isinstance(
+            results[subscriptions[0]], sqlite3.OperationalError
+        ), 'Сбой хранилища должен возвращаться как результат опроса'
+        assert subscriptions[0] in reported, (
+            'О сбое хранилища нужно сообщать как о сбое опроса'
+        )
+        if stage == 'cursor':
+            assert len(results[subscriptions[1]]) == 1, (
+                'Сбой одной подписки не должен останавливать опрос остальных'
+            )
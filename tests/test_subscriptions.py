@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from subscriptions import Subscription, load_subscriptions
+
+
+class TestSubscriptions:
+
+    def test_load_subscriptions(self, tmp_path):
+        path = tmp_path / 'subscriptions.json'
+        path.write_text(json.dumps([
+            {'token': 'OAuth first', 'chat_id': 1, 'name': 'first'},
+            {'token': 'OAuth second', 'chat_id': '2'},
+        ]), encoding='utf-8')
+
+        subscriptions = load_subscriptions(path)
+
+        assert subscriptions == [
+            Subscription(token='OAuth first', chat_id='1', name='first'),
+            Subscription(token='OAuth second', chat_id='2'),
+        ], (
+            'Проверьте, что подписки загружаются из файла в исходном порядке'
+        )
+
+    def test_key_hides_token(self):
+        subscription = Subscription(token='OAuth secret', chat_id='1')
+
+        assert subscription.key, (
+            'Проверьте, что у подписки без имени есть идентификатор'
+        )
+        assert 'secret' not in subscription.key, (
+            'Убедитесь, что идентификатор подписки не раскрывает токен'
+        )
+
+    def test_missing_key(self, tmp_path):
+        path = tmp_path / 'subscriptions.json'
+        path.write_text(json.dumps([{'token': 'OAuth x'}]), encoding='utf-8')
+
+        with pytest.raises(KeyError):
+            load_subscriptions(path)
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / 'subscriptions.json'
+        path.write_text('[]', encoding='utf-8')
+
+        with pytest.raises(ValueError):
+            load_subscriptions(path)
+
+    @pytest.mark.parametrize('names', [('', ''), ('same', 'same')])
+    def test_duplicate_key(self, tmp_path, names):
+        path = tmp_path / 'subscriptions.json'
+        path.write_text(json.dumps([
+            {'token': 'OAuth shared', 'chat_id': 1, 'name': names[0]},
+            {'token': 'OAuth shared', 'chat_id': 2, 'name': names[1]},
+        ]), encoding='utf-8')
+
+        with pytest.raises(ValueError):
+            load_subscriptions(path)
@@ -0,0 +1,114 @@
+import pytest
+
+from subscriptions import Subscription
+from supervisor import Supervisor
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeProcess:
+
+    def __init__(self, node, shard):
+        self.node = node
+        self.shard = shard
+        self.alive = False
+        self.exitcode = None
+
+    def start(self):
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+    def crash(self):
+        self.alive = False
+        self.exitcode = 1
+
+    def terminate(self):
+        self.alive = False
+        self.exitcode = -15
+
+    def join(self):
+        pass
+
+
+@pytest.fixture
+def supervisor():
+    subscriptions = [
+        Subscription(token=f'token-{index}', chat_id=str(index))
+        for index in range(200)
+    ]
+    spawned = []
+
+    def spawn(node, shard):
+        process = FakeProcess(node, shard)
+        spawned.append(process)
+        return process
+
+    supervisor = Supervisor(
+        subscriptions, 3, None, spawn=spawn,
+        max_restarts=3, restart_window=60, clock=FakeClock()
+    )
+    supervisor.spawned = spawned
+    supervisor.start_all()
+    return supervisor
+
+
+class TestSupervisor:
+
+    def test_starts_worker_per_shard(self, supervisor):
+        assert sorted(supervisor.processes) == [0, 1, 2]
+        assert sum(
+            len(process.shard) for process in supervisor.spawned
+        ) == 200
+
+    def test_restarts_crashed_worker_with_same_shard(self, supervisor):
+        crashed = supervisor.processes[1]
+        crashed.crash()
+        supervisor.check()
+        restarted = supervisor.processes[1]
+        assert restarted is not crashed
+        assert restarted.is_alive()
+        assert restarted.shard == crashed.shard
+        assert len(supervisor.spawned) == 4, (
+            'Остальные воркеры не должны перезапускаться'
+        )
+
+    def test_retires_crash_looping_worker(self, supervisor):
+        untouched = {
+            node: process for node, process in supervisor.processes.items()
+        }
+        for _ in range(3):
+            supervisor.processes[2].crash()
+            supervisor.check()
+        assert 2 not in supervisor.processes
+        assert sorted(supervisor.ring.nodes) == [0, 1]
+        shards = [process.shard for process in supervisor.processes.values()]
+        assert sum(len(shard) for shard in shards) == 200, (
+            'Подписки упавшего воркера должны перейти к остальным'
+        )
+        for node, process in supervisor.processes.items():
+            assert process is not untouched[node]
+
+    def test_crashes_outside_window_are_forgotten(self, supervisor):
+        for _ in range(5):
+            supervisor.clock.now += 61
+            supervisor.processes[0].crash()
+            supervisor.check()
+        assert 0 in supervisor.processes
+
+    def test_no_workers_left(self, supervisor):
+        supervisor.max_restarts = 1
+        for node in (0, 1):
+            supervisor.processes[node].crash()
+            supervisor.check()
+        supervisor.processes[2].crash()
+        with pytest.raises(RuntimeError):
+            supervisor.check()
@@ -0,0 +1,144 @@
+import pytest
+
+from telegram_queue import OutboundQueue, TokenBucket
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RetryAfter(Exception):
+
+    def __init__(self, retry_after):
+        super().__init__(f'Flood control exceeded. Retry in {retry_after}')
+        self.retry_after = retry_after
+
+
+def join(messages):
+    yield '\n\n'.join(messages)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class TestOutboundQueue:
+
+    def test_messages_for_chat_are_coalesced(self, clock):
+        sent = []
+        queue = OutboundQueue(
+            lambda message, chat_id: sent.append((chat_id, message)),
+            join, 30, 1, clock=clock
+        )
+        delivered = []
+
+        queue.put('1', ['первое'], lambda: delivered.append(1))
+        queue.put('1', ['второе', 'первое'], lambda: delivered.append(2))
+        queue.put('2', ['третье'])
+        queue.deliver_ready()
+
+        assert sent == [('1', 'первое\n\nвторое'), ('2', 'третье')], (
+            'Убедитесь, что сообщения одного чата уходят одним сообщением '
+            'без повторов'
+        )
+        assert delivered == [1, 2], (
+            'Проверьте, что колбэки вызываются после отправки'
+        )
+
+    def test_chat_rate_limit(self, clock):
+        sent = []
+        queue = OutboundQueue(
+            lambda message, chat_id: sent.append(message), join, 30, 1,
+            clock=clock
+        )
+
+        queue.put('1', ['первое'])
+        queue.deliver_ready()
+        queue.put('1', ['второе'])
+        wait = queue.deliver_ready()
+
+        assert sent == ['первое'], (
+            'Убедитесь, что чат не получает сообщения чаще лимита'
+        )
+        assert wait == pytest.approx(1)
+        clock.now = 1
+        queue.deliver_ready()
+        assert sent == ['первое', 'второе']
+
+    def test_global_rate_limit(self, clock):
+        sent = []
+        queue = OutboundQueue(
+            lambda message, chat_id: sent.append(chat_id), join, 2, 1,
+            clock=clock
+        )
+
+        for chat_id in '123':
+            queue.put(chat_id, ['сообщение'])
+        queue.deliver_ready()
+
+        assert sent == ['1', '2'], (
+            'Убедитесь, что общая частота отправки ограничена'
+        )
+        assert queue.depth() == 1
+
+    def test_retry_after(self, clock):
+        attempts = []
+        delivered = []
+
+        def send(message, chat_id):
+            attempts.append(message)
+            if len(attempts) == 1:
+                raise RetryAfter(5)
+
+        queue = OutboundQueue(send, join, 30, 1, clock=clock)
+        queue.put('1', ['первое'], lambda: delivered.append(True))
+        queue.deliver_ready()
+        queue.put('1', ['второе'])
+
+        clock.now = 4
+        queue.deliver_ready()
+        assert attempts == ['первое'], (
+            'Проверьте, что после 429 чат ждёт `retry_after` секунд'
+        )
+        clock.now = 5
+        queue.deliver_ready()
+        assert attempts == ['первое', 'первое\n\nвторое']
+        assert delivered == [True]
+
+    def test_failed_send_skips_callbacks(self, clock):
+        def send(message, chat_id):
+            raise ConnectionError('Telegram недоступен')
+
+        delivered = []
+        failed = []
+        queue = OutboundQueue(send, join, 30, 1, clock=clock)
+        queue.put(
+            '1', ['сообщение'], lambda: delivered.append(True),
+            lambda: failed.append(True)
+        )
+        queue.deliver_ready()
+
+        assert delivered == [], (
+            'Убедитесь, что при ошибке отправки колбэк не вызывается'
+        )
+        assert failed == [True], (
+            'При ошибке отправки должен вызываться колбэк on_failed'
+        )
+
+
+class TestTokenBucket:
+
+    def test_refill(self, clock):
+        bucket = TokenBucket(2, 2, clock)
+        bucket.consume()
+        bucket.consume()
+
+        assert bucket.wait_time() == pytest.approx(0.5)
+        clock.now = 0.5
+        assert bucket.wait_time() == 0